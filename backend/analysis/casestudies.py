@@ -3,20 +3,38 @@ Analyzes individual case study projects using screenshot + scraping + Gemini
 """
 import os
 import json
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
 from datetime import datetime
 
-from analysis.screenshot import capture_screenshot
+from analysis.screenshot import (
+    capture_screenshot,
+    capture_screenshot_two_phase,
+    capture_viewports,
+    SCREENSHOT_TWO_PHASE,
+    SCREENSHOT_VIEWPORTS,
+)
 from scrapers.scraper import scrape_project_page
+from scrapers.tiered_fetch import fetch_project_page
+from scrapers import site_builders
 from utils.gemini_api import analyze_content
-from utils.gcs_utils import upload_file_to_gcs
+from utils.gcs_utils import DEBUG_LOCAL_COPIES
+from utils.upload_queue import enqueue_json
+from utils.fetch_scheduler import host_slot
+from utils.simhash import simhash, NearDuplicateIndex
+from utils.reanalysis import text_hash, reused_from
+from utils import render_client
 from utils.firebase_db import save_project_json, save_screenshot_record
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
+from scrapers.dom_extract import extract_dom, dom_to_project_scrape
 try:
     from playwright.sync_api import sync_playwright
 except ImportError:
     sync_playwright = None
 
+# Longest the end of analyze_projects waits for outstanding background captures
+SCREENSHOT_FULL_WAIT_SECONDS = float(os.environ.get("SCREENSHOT_FULL_WAIT_SECONDS", "600"))
+
 
 def create_project_slug(url):
     """Create a safe filename from URL."""
@@ -25,6 +43,92 @@ def create_project_slug(url):
     return slug[:150]
 
 
+def _record_screenshot(report_id, link, screenshot_url, user_id):
+    """Save the screenshot record to DB (best effort)."""
+    if not report_id:
+        return
+    try:
+        filename = urlparse(screenshot_url).path.split('/')[-1]
+        save_screenshot_record(report_id, link, screenshot_url, filename, user_id)
+    except Exception:
+        pass
+
+
+def _finalize_full_captures(pending, gcs_folder, manifest, report_id, user_id, block=False, checkpoint=None):
+    """
+    Swap finished full-page captures into their reports.
+
+    Re-uploads the report (same object path), patches the manifest entry,
+    refreshes the project checkpoint (`checkpoint(report)`) and returns the
+    captures that are still running.
+    """
+    still_running = []
+    deadline = time.monotonic() + SCREENSHOT_FULL_WAIT_SECONDS
+    for shot, report, gcs_path, project_timing in pending:
+        if not block and not (shot.full.done() and (shot.viewports is None or shot.viewports.done())):
+            still_running.append((shot, report, gcs_path, project_timing))
+            continue
+        try:
+            full_url = shot.full.result(timeout=max(0, deadline - time.monotonic()))
+            viewports = (shot.viewports.result(timeout=max(0, deadline - time.monotonic()))
+                         if shot.viewports is not None else {}) or {}
+        except FutureTimeout:
+            print(f"  ⚠️ Gave up waiting for the full-page capture of {shot.url} (keeping the preview)")
+            continue
+        project_timing['full_capture_seconds'] = shot.metrics.get('full_capture_seconds')
+        if report is None or not (full_url or any(viewports.values())):
+            continue
+
+        link = report["url"]
+        report["screenshots_by_viewport"] = {"desktop": full_url or report["screenshot"], **viewports}
+        if full_url:
+            report["screenshot"] = full_url
+            report["screenshot_overview"] = shot.metrics.get('overview_url')
+            report["screenshot_variants"] = shot.metrics.get('variants')
+        full_url = report["screenshot"]
+        gcs_url = enqueue_json(report, gcs_path, job=gcs_folder, coalesce=True)
+        print(f"  [DEBUG] Full-page screenshot ready for: {link} ({project_timing['full_capture_seconds']}s)")
+
+        if manifest is not None:
+            manifest.update_case_study(
+                link,
+                screenshot=full_url,
+                screenshot_variants=report["screenshot_variants"],
+                screenshots_by_viewport=report["screenshots_by_viewport"],
+            )
+        _record_screenshot(report_id, link, full_url, user_id)
+        if report_id:
+            try:
+                save_project_json(report_id, link, report, gcs_url, full_url, user_id)
+            except Exception:
+                pass
+        if checkpoint is not None:
+            checkpoint(report)
+    return still_running
+
+
+def _attach_alias(original, link, gcs_folder, manifest, report_id, user_id, checkpoint=None):
+    """
+    Record `link` as another URL of an already analysed case study.
+
+    The original report is re-uploaded (same object path) and its manifest
+    entry and DB record refreshed with the extra alias.
+    """
+    report = original["report"]
+    if link not in report["aliases"]:
+        report["aliases"].append(link)
+    gcs_url = enqueue_json(report, original["gcs_path"], job=gcs_folder, coalesce=True)
+    if manifest is not None:
+        manifest.update_case_study(report["url"], aliases=report["aliases"])
+    if report_id:
+        try:
+            save_project_json(report_id, report["url"], report, gcs_url, report["screenshot"], user_id)
+        except Exception:
+            pass
+    if checkpoint is not None:
+        checkpoint(report)
+
+
 def scrape_designfolio_with_context(project_url, portfolio_url):
     """Scrape Designfolio project page by first loading portfolio for context"""
     print(f"  📱 Scraping Designfolio project with context: {project_url}")
@@ -40,7 +144,8 @@ def scrape_designfolio_with_context(project_url, portfolio_url):
             
             # First, load the portfolio page to establish context/session
             print(f"  [DEBUG] Loading portfolio context: {portfolio_url}")
-            page.goto(portfolio_url, wait_until="networkidle", timeout=60000)
+            with host_slot(portfolio_url):
+                page.goto(portfolio_url, wait_until="networkidle", timeout=60000)
             
             # Scroll to simulate user interaction
             for _ in range(5):
@@ -51,7 +156,8 @@ def scrape_designfolio_with_context(project_url, portfolio_url):
             
             # Now navigate to the project page (with context established)
             print(f"  [DEBUG] Navigating to project page with context: {project_url}")
-            page.goto(project_url, wait_until="networkidle", timeout=60000)
+            with host_slot(project_url):
+                page.goto(project_url, wait_until="networkidle", timeout=60000)
             
             # Wait for page to fully load
             page.wait_for_timeout(3000)
@@ -63,45 +169,11 @@ def scrape_designfolio_with_context(project_url, portfolio_url):
             
             page.wait_for_timeout(2000)  # Final wait
             
-            # Get page content
-            html_content = page.content()
+            # Extract in-page with a single evaluate
+            dom = extract_dom(page)
             browser.close()
             
-            # Parse with BeautifulSoup
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            title = ""
-            if soup.find('title'):
-                title = soup.find('title').get_text(strip=True)
-            elif soup.find('h1'):
-                title = soup.find('h1').get_text(strip=True)
-            
-            meta_desc = ""
-            meta_tag = soup.find('meta', attrs={'name': 'description'})
-            if meta_tag and meta_tag.get('content'):
-                meta_desc = meta_tag['content']
-            
-            headings = []
-            for tag in ['h1', 'h2', 'h3', 'h4']:
-                for heading in soup.find_all(tag):
-                    headings.append({'level': tag, 'text': heading.get_text(strip=True)})
-            
-            for element in soup(['script', 'style', 'nav', 'footer', 'header']):
-                element.decompose()
-            
-            text_content = soup.get_text(separator=' ', strip=True)
-            images = soup.find_all('img')
-            image_count = len(images)
-            
-            return {
-                'url': project_url,
-                'title': title,
-                'meta_description': meta_desc,
-                'headings': headings,
-                'text_content': text_content,
-                'full_text_length': len(text_content),
-                'total_images': image_count
-            }
+            return dom_to_project_scrape(project_url, dom)
     
     except Exception as e:
         print(f"  ❌ Designfolio context scraping failed: {str(e)}")
@@ -116,12 +188,33 @@ def scrape_designfolio_with_context(project_url, portfolio_url):
         }
 
 
-def analyze_projects(project_links, parent_url, gcs_folder, report_id=None, user_id=None):
+def analyze_projects(project_links, parent_url, gcs_folder, report_id=None, user_id=None, manifest=None, platform=None,
+                     aliases=None, checkpoints=None, run_index=None):
     """
     Analyzes each project page using:
       - HTML scraping
       - Screenshot capture
       - Gemini case-study scoring prompt
+
+    When a ReportManifest is given, each finished project is added to it.
+    For site-builder platforms (Framer, Webflow, Wix, Squarespace) pages are
+    read through the builder fast path before any browser is considered.
+
+    With SCREENSHOT_TWO_PHASE, Gemini scores against the viewport preview and
+    each report is re-uploaded with the full-page screenshot once it is ready.
+
+    `aliases` maps a link to other spellings of the same URL. A page whose
+    scraped text is a near duplicate (SimHash) of one already analysed is
+    not screenshotted or scored again; it is added to that report's aliases.
+
+    With `checkpoints` (utils.checkpoints.JobCheckpoints) every finished
+    project is checkpointed, and projects finished by an interrupted earlier
+    run of the job are restored (report re-queued, manifest entry re-added)
+    instead of being scraped and scored again.
+
+    With a `run_index` (utils.reanalysis.RunIndex) each report's text and
+    screenshot hashes are recorded; a project whose text is unchanged since the
+    previous run keeps that run's analysis instead of going to Gemini.
     
     Returns:
         tuple: (count, project_timings) where project_timings is a list of timing dicts
@@ -142,8 +235,37 @@ def analyze_projects(project_links, parent_url, gcs_folder, report_id=None, user
 
     # Use provided GCS folder
     gcs_project_folder = gcs_folder + "projects/"
+    # (TwoPhaseCapture, report, report gcs path, project_timing) awaiting the full page
+    pending_captures = []
+    # SimHash of each analysed project's text -> {"report", "gcs_path"}
+    near_duplicates = NearDuplicateIndex()
+    # link -> {"report", "gcs_path", "fingerprint", "timing"}: checkpoint of each finished project
+    finished = {}
+
+    def checkpoint(report):
+        if checkpoints is not None:
+            checkpoints.save(f"project:{report['url']}", finished[report['url']], after_uploads=gcs_folder)
 
     for idx, link in enumerate(project_links, 1):
+        if checkpoints is not None:
+            checkpoints.write_uploaded()
+            restored = checkpoints.restore(f"project:{link}")
+            if restored:
+                print(f"\n  ♻️ [{idx}/{len(project_links)}] Restored from checkpoint: {link}")
+                project_timings.append({**restored["timing"], "index": idx, "restored": True})
+                if "report" in restored:
+                    report = restored["report"]
+                    gcs_url = enqueue_json(report, restored["gcs_path"], job=gcs_folder, coalesce=True)
+                    if manifest is not None:
+                        manifest.add_case_study(report, report_url=gcs_url)
+                    finished[link] = restored
+                    near_duplicates.add(restored["fingerprint"], restored)
+                    if run_index is not None:
+                        run_index.record(link, restored.get("text_hash"), restored.get("screenshot_scored"),
+                                         report, gcs_url, reused_from=report.get("reused_from"))
+                    count += 1
+                continue
+
         print(f"\n  [DEBUG] [{idx}/{len(project_links)}] Analyzing project: {link}")
         project_start_time = time.perf_counter()
         project_timing = {
@@ -151,20 +273,30 @@ def analyze_projects(project_links, parent_url, gcs_folder, report_id=None, user
             "project_name": link.split('/')[-1] or link,
             "index": idx
         }
+        shot = None
         
         try:
             # Scraping - use context-aware scraping for Designfolio
             print(f"  [DEBUG] Scraping project page: {link}")
             scrape_start = time.perf_counter()
             
-            # Detect Designfolio project and use context-aware scraper
-            if 'designfolio.me/project/' in link:
-                scraped_data = scrape_designfolio_with_context(link, parent_url)
+            # Static HTML first; escalate to a browser only for JS-rendered pages.
+            # Designfolio projects render with the portfolio loaded for context
+            # (custom domains are only known as Designfolio from the probe).
+            if 'designfolio.me/project/' in link or (
+                    platform == "designfolio" and '/project/' in urlparse(link).path):
+                render = lambda u: render_client.run("designfolio_project", u, parent_url)
+            else:
+                render = None
+            builder = site_builders.builder_for_url(link) or (platform if platform in site_builders.BUILDERS else None)
+            scraped_data = site_builders.extract_project(link, builder) if builder else None
+            if scraped_data:
+                project_timing['fetch_tier'] = f"{builder}-static"
             else:
-                scraped_data = scrape_project_page(link)
+                scraped_data = fetch_project_page(link, render=render, timing=project_timing)
             
             project_timing['scraping_seconds'] = round(time.perf_counter() - scrape_start, 2)
-            print(f"  [DEBUG] Scraping complete for: {link} ({project_timing['scraping_seconds']:.2f}s)")
+            print(f"  [DEBUG] Scraping complete for: {link} ({project_timing['scraping_seconds']:.2f}s, {project_timing.get('fetch_tier')})")
             
             # Update project_name with actual title from scraped data
             # Special handling: Framer sites often have a generic site title.
@@ -193,24 +325,57 @@ def analyze_projects(project_links, parent_url, gcs_folder, report_id=None, user
                     if len(lines) > 1 and len(lines[1]) > 5:
                         project_timing['project_name'] = lines[1]
 
+            # Mirrored case studies (same text under another URL) are analysed once
+            fingerprint = simhash(scraped_data.get('text_content') or scraped_data.get('content') or '')
+            text_digest = text_hash(scraped_data)
+            duplicate = near_duplicates.find(fingerprint)
+            if duplicate:
+                original, distance = duplicate
+                print(f"  ♊ Near-duplicate of {original['report']['url']} (SimHash distance {distance}), skipping analysis")
+                _attach_alias(original, link, gcs_folder, manifest, report_id, user_id, checkpoint=checkpoint)
+                project_timing['status'] = 'duplicate'
+                project_timing['duplicate_of'] = original['report']['url']
+                project_timing['simhash_distance'] = distance
+                project_timing['total_seconds'] = round(time.perf_counter() - project_start_time, 2)
+                project_timings.append(project_timing)
+                if checkpoints is not None:
+                    checkpoints.save(f"project:{link}", {"timing": project_timing}, after_uploads=gcs_folder)
+                continue
+
             # Screenshot
             print(f"  [DEBUG] Capturing screenshot for: {link}")
             screenshot_start = time.perf_counter()
             # Pass the gcs_folder to capture_screenshot so it saves in the correct GCS path
             try:
-              screenshot_path = capture_screenshot(link, gcs_folder_prefix=gcs_folder)
+              if SCREENSHOT_TWO_PHASE:
+                # Score against the viewport preview; the full page finishes in the background
+                shot = capture_screenshot_two_phase(link, upload_job=gcs_folder)
+                project_timing['screenshot_metrics'] = shot.metrics
+                screenshot_path = shot.preview_url
+              else:
+                screenshot_metrics = {}
+                project_timing['screenshot_metrics'] = screenshot_metrics
+                extra_viewports = [v for v in SCREENSHOT_VIEWPORTS if v != "desktop"]
+                if extra_viewports:
+                  # Desktop is one of the profiles of the shared browser context
+                  viewport_metrics = {}
+                  by_viewport = capture_viewports(link, ["desktop", *extra_viewports], upload_job=gcs_folder,
+                                                  metrics=viewport_metrics)
+                  screenshot_metrics.update(viewport_metrics.pop("desktop", {}))
+                  screenshot_metrics['viewports'] = viewport_metrics
+                  screenshot_path = by_viewport.get("desktop")
+                  project_timing['screenshots_by_viewport'] = by_viewport
+                else:
+                  screenshot_path = capture_screenshot(
+                    link,
+                    gcs_folder_prefix=gcs_folder,
+                    upload_job=gcs_folder,
+                    metrics=screenshot_metrics,
+                  )
               if screenshot_path:
-                print(f"  [DEBUG] Screenshot saved at: {screenshot_path} ({project_timing.get('screenshot_seconds', 0):.2f}s)")
-                # Save screenshot record to DB
-                if report_id:
-                  try:
-                    # try to derive filename from URL
-                    import urllib.parse as _u
-                    _parsed = _u.urlparse(screenshot_path)
-                    filename = _parsed.path.split('/')[-1]
-                    save_screenshot_record(report_id, link, screenshot_path, filename, user_id)
-                  except Exception as _:
-                    pass
+                print(f"  [DEBUG] Screenshot saved at: {screenshot_path} ({time.perf_counter() - screenshot_start:.2f}s)")
+                if shot is None:
+                  _record_screenshot(report_id, link, screenshot_path, user_id)
               else:
                 print(f"  ⚠️ Screenshot skipped/failed for: {link} (continuing analysis)")
                 screenshot_path = None
@@ -510,20 +675,32 @@ Use EXACTLY this structure:
             # RUN GEMINI MODEL
             # --------------------------------------
 
+            # Re-analysis: the score comes from the text, so same text as last run -> same score
+            previous = run_index.reusable(link, text_digest, screenshot_path) if run_index is not None else None
             try:
-                print(f"  [DEBUG] Sending to Gemini for analysis: {link}")
-                gemini_start = time.perf_counter()
-                analysis = analyze_content(prompt, {
-                    "scraped_data": scraped_data,
-                    "screenshot": screenshot_path
-                })
-                project_timing['gemini_seconds'] = round(time.perf_counter() - gemini_start, 2)
-                print(f"  [DEBUG] Gemini analysis complete for: {link} ({project_timing['gemini_seconds']:.2f}s)")
+                if previous:
+                    print(f"  ♻️ Unchanged since report {previous.get('report_id')}, reusing its analysis: {link}")
+                    analysis = previous["analysis"]
+                    project_timing['gemini_seconds'] = 0
+                    project_timing['reused'] = True
+                    project_timing['screenshot_changed'] = previous['screenshot_changed']
+                else:
+                    print(f"  [DEBUG] Sending to Gemini for analysis: {link}")
+                    gemini_start = time.perf_counter()
+                    analysis = analyze_content(prompt, {
+                        "scraped_data": scraped_data,
+                        "screenshot": screenshot_path
+                    })
+                    project_timing['gemini_seconds'] = round(time.perf_counter() - gemini_start, 2)
+                    print(f"  [DEBUG] Gemini analysis complete for: {link} ({project_timing['gemini_seconds']:.2f}s)")
             except Exception as e:
                 print(f"    ❌ Gemini failed: {e}")
                 project_timing['error'] = str(e)
                 project_timing['status'] = 'failed'
                 project_timings.append(project_timing)
+                if shot is not None:
+                    pending_captures.append((shot, None, None, project_timing))
+                    shot = None
                 continue
 
             # --------------------------------------
@@ -531,7 +708,6 @@ Use EXACTLY this structure:
             # --------------------------------------
             save_start = time.perf_counter()
             slug = create_project_slug(link)
-            report_path = f"backend/reports/{slug}.json"
 
             report = {
                 "generated_at": datetime.now().isoformat(),
@@ -539,29 +715,37 @@ Use EXACTLY this structure:
                 "project_name": project_timing.get('project_name', scraped_data.get('title', link.split('/')[-1])),
                 "parent_portfolio": parent_url,
                 "screenshot": screenshot_path,
+                "screenshot_overview": (project_timing.get('screenshot_metrics') or {}).get('overview_url'),
+                "screenshot_variants": (project_timing.get('screenshot_metrics') or {}).get('variants'),
+                "screenshots_by_viewport": project_timing.get('screenshots_by_viewport') or {"desktop": screenshot_path},
+                "aliases": list((aliases or {}).get(link, [])),
+                "reused": bool(previous),
+                "reused_from": reused_from(previous) if previous else None,
                 "scraped_data": scraped_data,
                 "analysis": analysis  # <-- NEW DIRECT STRUCTURE
             }
 
-            print(f"  [DEBUG] Writing report to: {report_path}")
-            with open(report_path, "w", encoding="utf-8") as f:
-              json.dump(report, f, indent=2, ensure_ascii=False)
-            
-            # Print the case study JSON
-            print(f"\n{'='*80}")
-            print(f"📊 CASE STUDY ANALYSIS JSON [{idx}/{len(project_links)}]")
-            print(f"{'='*80}")
-            print(json.dumps(report, indent=2, ensure_ascii=False))
-            print(f"{'='*80}\n")
-
-            # Upload to GCS
-            gcs_path = gcs_project_folder + os.path.basename(report_path)
-            gcs_url = upload_file_to_gcs(report_path, gcs_path)
+            # Print the case study JSON (debug mode only, it can be very large)
+            if DEBUG_LOCAL_COPIES:
+                print(f"\n{'='*80}")
+                print(f"📊 CASE STUDY ANALYSIS JSON [{idx}/{len(project_links)}]")
+                print(f"{'='*80}")
+                print(json.dumps(report, indent=2, ensure_ascii=False))
+                print(f"{'='*80}\n")
+
+            # Upload to GCS in the background (retried off the critical path)
+            gcs_path = gcs_project_folder + f"{slug}.json"
+            print(f"  [DEBUG] Queueing report upload: {gcs_path}")
+            # Rewritten when the full-page capture lands: serialise same-path uploads
+            gcs_url = enqueue_json(report, gcs_path, job=gcs_folder, coalesce=True)
             project_timing['save_upload_seconds'] = round(time.perf_counter() - save_start, 2)
             project_timing['total_seconds'] = round(time.perf_counter() - project_start_time, 2)
             project_timing['status'] = 'success'
             project_timing['report_url'] = gcs_url
-            print(f"    ✅ Uploaded project report to GCS: {gcs_url} (Total: {project_timing['total_seconds']:.2f}s)")
+            print(f"    ✅ Queued project report for GCS: {gcs_url} (Total: {project_timing['total_seconds']:.2f}s)")
+
+            if manifest is not None:
+                manifest.add_case_study(report, report_url=gcs_url)
 
             # Save project JSON in DB
             if report_id:
@@ -572,6 +756,22 @@ Use EXACTLY this structure:
             
             project_timings.append(project_timing)
             count += 1
+            if run_index is not None:
+                run_index.record(link, text_digest, screenshot_path, report, gcs_url, reused_from=report["reused_from"])
+            finished[link] = {
+                "report": report, "gcs_path": gcs_path, "fingerprint": fingerprint, "timing": project_timing,
+                "text_hash": text_digest, "screenshot_scored": screenshot_path,
+            }
+            near_duplicates.add(fingerprint, finished[link])
+            checkpoint(report)
+
+            if shot is not None:
+                report["screenshot_preview"] = screenshot_path
+                pending_captures.append((shot, report, gcs_path, project_timing))
+                shot = None
+            pending_captures = _finalize_full_captures(
+                pending_captures, gcs_folder, manifest, report_id, user_id, block=False, checkpoint=checkpoint
+            )
             
             # Update status if available
             if update_status and report_id:
@@ -593,7 +793,17 @@ Use EXACTLY this structure:
             project_timing['status'] = 'failed'
             project_timing['total_seconds'] = round(time.perf_counter() - project_start_time, 2)
             project_timings.append(project_timing)
+            if shot is not None:
+                # Still wait for it so its uploads land before the job is flushed
+                pending_captures.append((shot, None, None, project_timing))
             continue
 
+    # Wait for full-page captures still running in the background
+    wait_start = time.perf_counter()
+    _finalize_full_captures(pending_captures, gcs_folder, manifest, report_id, user_id, block=True,
+                            checkpoint=checkpoint)
+    if SCREENSHOT_TWO_PHASE and project_links:
+        print(f"[DEBUG] Full-page captures finished (+{time.perf_counter() - wait_start:.2f}s after last project)")
+
     print(f"[DEBUG] Finished analyzing all project links. Total successful: {count}")
     return count, project_timings
@@ -0,0 +1,284 @@
+"""
+In-memory screenshot compression engine
+
+Works from the raw capture bytes: the JPEG decoder downscales while decoding
+(draft mode), and the output quality is binary-searched against the size
+target instead of re-encoding at every step. Supports JPEG, WebP and AVIF.
+
+Encoding runs in a small process pool so it doesn't hold the GIL while other
+analysis work runs in threads.
+"""
+import io
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image, features
+
+SCREENSHOT_FORMAT = os.environ.get("SCREENSHOT_FORMAT", "jpeg").lower()
+SCREENSHOT_TARGET_BYTES = int(os.environ.get("SCREENSHOT_TARGET_BYTES", str(3 * 1024 * 1024)))
+COMPRESSION_WORKERS = int(os.environ.get("COMPRESSION_WORKERS", "2"))
+
+# format name -> (PIL format, file extension, content type)
+FORMATS = {
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+    "webp": ("WEBP", "webp", "image/webp"),
+    "avif": ("AVIF", "avif", "image/avif"),
+}
+
+MIN_QUALITY = 40
+MAX_QUALITY = 85
+
+
+def _avif_available():
+    try:
+        if features.check("avif"):
+            return True
+    except Exception:
+        pass
+    try:
+        import pillow_avif  # noqa: F401  (registers the AVIF plugin)
+        return True
+    except ImportError:
+        return False
+
+
+def resolve_format(fmt=None):
+    """Return a supported format name, falling back AVIF → WebP → JPEG."""
+    fmt = (fmt or SCREENSHOT_FORMAT).lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt == "avif" and not _avif_available():
+        fmt = "webp"
+    if fmt == "webp" and not features.check("webp"):
+        fmt = "jpeg"
+    return fmt if fmt in FORMATS else "jpeg"
+
+
+def format_info(fmt):
+    """(extension, content type) for a resolved format name."""
+    _, ext, content_type = FORMATS[fmt]
+    return ext, content_type
+
+
+def _encode(img, fmt, quality):
+    buffer = io.BytesIO()
+    pil_format = FORMATS[fmt][0]
+    if fmt == "jpeg":
+        img.save(buffer, format=pil_format, quality=quality, optimize=True)
+    elif fmt == "webp":
+        img.save(buffer, format=pil_format, quality=quality, method=4)
+    else:
+        img.save(buffer, format=pil_format, quality=quality, speed=8)
+    return buffer.getvalue()
+
+
+def load_scaled(raw, scale=0.5):
+    """Decode capture bytes at `scale`; JPEG input is downscaled during decode."""
+    img = Image.open(io.BytesIO(raw))
+    w, h = img.size
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    if img.format == "JPEG":
+        img.draft("RGB", size)
+    img = img.convert("RGB")
+    if img.size != size:
+        img = img.resize(size, Image.Resampling.LANCZOS)
+    return img
+
+
+def encode_to_target(img, fmt, target_size=SCREENSHOT_TARGET_BYTES):
+    """Highest quality in [MIN_QUALITY, MAX_QUALITY] that fits target_size.
+
+    Returns (data, quality, encodes).
+    """
+    data = _encode(img, fmt, MAX_QUALITY)
+    encodes = 1
+    if len(data) <= target_size:
+        return data, MAX_QUALITY, encodes
+
+    best, best_quality = None, MIN_QUALITY
+    lo, hi = MIN_QUALITY, MAX_QUALITY - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        candidate = _encode(img, fmt, mid)
+        encodes += 1
+        if len(candidate) <= target_size:
+            best, best_quality = candidate, mid
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    if best is None:
+        # Nothing fits: the search ended on MIN_QUALITY, ship that encode
+        best = candidate
+    return best, best_quality, encodes
+
+
+def compress_bytes(raw, fmt="jpeg", target_size=SCREENSHOT_TARGET_BYTES, scale=0.5):
+    """Pool worker: raw capture bytes -> (compressed bytes, stats dict)."""
+    start = time.perf_counter()
+    img = load_scaled(raw, scale=scale)
+    data, quality, encodes = encode_to_target(img, fmt, target_size)
+    stats = {
+        "format": fmt,
+        "quality": quality,
+        "encodes": encodes,
+        "width": img.width,
+        "height": img.height,
+        "bytes_before": len(raw),
+        "bytes_after": len(data),
+        "bytes_saved": len(raw) - len(data),
+        "encode_seconds": round(time.perf_counter() - start, 3),
+    }
+    return data, stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: never fork a process that hosts Playwright/gRPC threads
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, COMPRESSION_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _in_pool(fn, *args):
+    """Run fn(*args) in the compression pool, in-process if the pool is broken."""
+    global _pool
+    try:
+        return _get_pool().submit(fn, *args).result()
+    except (BrokenProcessPool, OSError) as e:
+        print(f"⚠️ Compression pool unavailable ({e}), compressing in-process.")
+        _pool = None
+        return fn(*args)
+
+
+def compress_screenshot(raw, fmt=None, target_size=SCREENSHOT_TARGET_BYTES, scale=0.5):
+    """
+    Compress capture bytes in the process pool (downscaled by `scale`).
+
+    Returns (data, stats) where stats also carries the output extension
+    and content type.
+    """
+    fmt = resolve_format(fmt)
+    data, stats = _in_pool(compress_bytes, raw, fmt, target_size, scale)
+
+    stats["extension"], stats["content_type"] = format_info(fmt)
+    print(
+        f"🖼️ Screenshot {stats['bytes_before'] / 1024 / 1024:.2f} MB → "
+        f"{stats['bytes_after'] / 1024 / 1024:.2f} MB ({fmt}, q={stats['quality']}, "
+        f"{stats['encodes']} encodes, {stats['encode_seconds']:.2f}s)"
+    )
+    return data, stats
+
+
+class TileStitcher:
+    """
+    Incrementally stitch viewport-height capture tiles.
+
+    Each tile is decoded at the output scale as soon as it arrives and pasted
+    into a scaled canvas plus a low-res overview, so the full-resolution page
+    bitmap never exists in memory.
+    """
+
+    def __init__(self, width, height, scale=0.5, overview_width=240):
+        self.scale = scale
+        self.width = width
+        self.height = height
+        self.canvas = Image.new("RGB", (max(1, int(width * scale)), max(1, int(height * scale))), "white")
+        self.overview_ratio = overview_width / width
+        self.overview = Image.new("RGB", (overview_width, max(1, int(height * self.overview_ratio))), "white")
+        self.tiles = 0
+        self.bytes_in = 0
+
+    def add_tile(self, raw, top, skip=0):
+        """Paste a tile captured at page offset `top`, dropping its first `skip` rows."""
+        tile = load_scaled(raw, scale=self.scale)
+        skip_px = int(skip * self.scale)
+        if skip_px:
+            tile = tile.crop((0, skip_px, tile.width, tile.height))
+        page_y = top + skip
+        self.canvas.paste(tile, (0, int(page_y * self.scale)))
+
+        ow = self.overview.width
+        oh = max(1, int(tile.height * ow / tile.width))
+        self.overview.paste(
+            tile.resize((ow, oh), Image.Resampling.BILINEAR),
+            (0, int(page_y * self.overview_ratio)),
+        )
+        self.tiles += 1
+        self.bytes_in += len(raw)
+
+    def finish(self, fmt=None, target_size=SCREENSHOT_TARGET_BYTES):
+        """Encode the stitched page and the overview in the process pool; returns (data, overview, stats)."""
+        start = time.perf_counter()
+        fmt = resolve_format(fmt)
+        data, quality, encodes, overview = _in_pool(encode_stitched, self.canvas, self.overview, fmt, target_size)
+        stats = {
+            "format": fmt,
+            "quality": quality,
+            "encodes": encodes,
+            "tiles": self.tiles,
+            "width": self.canvas.width,
+            "height": self.canvas.height,
+            "bytes_before": self.bytes_in,
+            "bytes_after": len(data),
+            "bytes_saved": self.bytes_in - len(data),
+            "encode_seconds": round(time.perf_counter() - start, 3),
+        }
+        stats["extension"], stats["content_type"] = format_info(fmt)
+        self.canvas = self.overview = None
+        return data, overview, stats
+
+
+def encode_stitched(canvas, overview, fmt, target_size):
+    """Pool worker: stitched canvas + overview -> (data, quality, encodes, overview bytes)."""
+    data, quality, encodes = encode_to_target(canvas, fmt, target_size)
+    return data, quality, encodes, _encode(overview, fmt, 70)
+
+
+# ---------------------------
+# Responsive variants
+# ---------------------------
+
+# name -> target width. The "detail" variant is the stored original itself
+# (captures are 960px wide after the 0.5 scale), so only smaller ones are encoded.
+VARIANT_WIDTHS = {"thumb": 320, "card": 640}
+VARIANT_QUALITY = 75
+
+
+def dominant_color(img):
+    """Average colour as #rrggbb (cheap placeholder while the image loads)."""
+    r, g, b = img.convert("RGB").resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def build_variants(data, fmt="jpeg"):
+    """Pool worker: compressed screenshot -> ([(name, width, bytes)], dominant colour, source width).
+
+    Variants at or above the source width are skipped; the original serves them.
+    """
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+
+    variants = []
+    for name, width in sorted(VARIANT_WIDTHS.items(), key=lambda kv: kv[1]):
+        if width >= img.width:
+            continue
+        height = max(1, int(img.height * width / img.width))
+        variant = img.resize((width, height), Image.Resampling.LANCZOS)
+        variants.append((name, width, _encode(variant, fmt, VARIANT_QUALITY)))
+    return variants, dominant_color(img), img.width
+
+
+def generate_variants(data, fmt):
+    """Build responsive variants in the process pool (in-process fallback)."""
+    return _in_pool(build_variants, data, fmt)
@@ -1,11 +1,25 @@
 import os
-import io
+import json
+import base64
 import hashlib
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from PIL import Image
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
 
-from utils.gcs_utils import upload_file_to_gcs, download_file_from_gcs, get_bucket
+from utils.gcs_utils import get_bucket, public_url, dumps_compact, save_debug_copy
+from analysis.image_compression import (
+    compress_screenshot,
+    generate_variants,
+    TileStitcher,
+    VARIANT_WIDTHS,
+    SCREENSHOT_TARGET_BYTES,
+)
+from utils.helpers import process_tree_rss_bytes
+from utils import fetch_scheduler, render_client
+from utils.upload_queue import enqueue_upload, flush_uploads
 
 
 # ---------------------------
@@ -24,42 +38,330 @@ def safe_filename(url: str) -> str:
     )
 
 
-def file_hash(path):
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            h.update(chunk)
-    return h.hexdigest()
+# ---------------------------
+# Content-addressed store
+# ---------------------------
+# Screenshots live under screenshots/cas/<sha256>.<ext>, shared by all jobs.
+# A per-URL index (screenshots/index/<sha1(url)>.json) records the latest hash
+# captured for each page, so re-analysis can tell what changed.
 
+CAS_PREFIX = "screenshots/cas/"
+INDEX_PREFIX = "screenshots/index/"
+
+
+def screenshot_object_path(digest: str, ext: str = "jpg") -> str:
+    return f"{CAS_PREFIX}{digest}.{ext}"
+
+
+def url_index_path(url: str) -> str:
+    return f"{INDEX_PREFIX}{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+
+
+def get_latest_screenshot(url: str):
+    """Return the index entry ({"sha256", "path", ...}) for a page, or None."""
+    try:
+        blob = get_bucket().blob(url_index_path(url))
+        return json.loads(blob.download_as_bytes())
+    except Exception:
+        return None
+
+
+def store_screenshot(data: bytes, url: str, content_type: str, ext: str, upload_job: str = None):
+    """
+    Store screenshot bytes by content hash.
+
+    Deduplication compares the local MD5 against the stored object's metadata
+    (one metadata request, no download). Returns (public_url, info).
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    md5_b64 = base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+    gcs_path = screenshot_object_path(digest, ext)
+
+    existing = get_bucket().get_blob(gcs_path)
+    reused = existing is not None and existing.md5_hash == md5_b64
+
+    if reused:
+        public = public_url(gcs_path)
+        print("🟡 Screenshot unchanged — reused existing.")
+    else:
+        public = enqueue_upload(data, gcs_path, content_type=content_type, job=upload_job)
+        print(f"✅ Screenshot queued for GCS: {public}")
+
+    info = {
+        "url": url,
+        "sha256": digest,
+        "md5": md5_b64,
+        "path": gcs_path,
+        "bytes": len(data),
+        "reused": reused,
+        "updated_at": datetime.now().isoformat(),
+    }
+    enqueue_upload(
+        dumps_compact(info),
+        url_index_path(url),
+        content_type="application/json; charset=utf-8",
+        job=upload_job,
+        coalesce=True,
+    )
+    return public, info
+
+
+def variant_object_path(digest: str, ext: str, width: int) -> str:
+    return f"{CAS_PREFIX}{digest}_w{width}.{ext}"
 
-def compress_image(
-    path: str,
-    target_size: int = 3 * 1024 * 1024,  # 3 MB
-):
-    """Compress image and print before/after sizes."""
-    before = os.path.getsize(path)
-    print(f"🖼️ Screenshot size BEFORE compression: {before / 1024 / 1024:.2f} MB")
 
-    img = Image.open(path).convert("RGB")
-    w, h = img.size
-    img = img.resize((w // 2, h // 2), Image.Resampling.LANCZOS)
+def variants_sidecar_path(digest: str) -> str:
+    return f"{CAS_PREFIX}{digest}.variants.json"
 
-    quality = 85
-    buffer = io.BytesIO()
 
-    while quality >= 40:
-        buffer.seek(0)
-        buffer.truncate()
-        img.save(buffer, format="JPEG", quality=quality)
-        if buffer.tell() <= target_size:
-            break
-        quality -= 5
+def variant_path_for_width(digest: str, ext: str, width: int):
+    """Smallest stored variant at least `width` wide; None means the original."""
+    for candidate in sorted(VARIANT_WIDTHS.values()):
+        if candidate >= width:
+            return variant_object_path(digest, ext, candidate)
+    return None
 
-    with open(path, "wb") as f:
-        f.write(buffer.getvalue())
 
-    after = os.path.getsize(path)
-    print(f"🖼️ Screenshot size AFTER compression: {after / 1024 / 1024:.2f} MB")
+def store_variants(data: bytes, info: dict, fmt: str, content_type: str, ext: str, upload_job: str = None):
+    """
+    Generate thumb/card width variants plus a dominant colour; the original
+    doubles as the detail variant.
+
+    Variants are keyed by the original's hash; when the original was reused
+    they already exist, so only the small sidecar JSON is read back.
+    """
+    digest = info["sha256"]
+    if info.get("reused"):
+        try:
+            return json.loads(get_bucket().blob(variants_sidecar_path(digest)).download_as_bytes())
+        except Exception:
+            pass
+
+    variants, color, source_width = generate_variants(data, fmt)
+    result = {
+        "dominant_color": color,
+        "original": public_url(info["path"]),
+        "widths": {
+            "detail": {"width": source_width, "bytes": len(data), "url": public_url(info["path"])},
+        },
+    }
+    for name, width, variant_data in variants:
+        result["widths"][name] = {
+            "width": width,
+            "bytes": len(variant_data),
+            "url": enqueue_upload(
+                variant_data,
+                variant_object_path(digest, ext, width),
+                content_type=content_type,
+                job=upload_job,
+            ),
+        }
+    enqueue_upload(
+        dumps_compact(result),
+        variants_sidecar_path(digest),
+        content_type="application/json; charset=utf-8",
+        job=upload_job,
+    )
+    return result
+
+
+# ---------------------------
+# Capture modes
+# ---------------------------
+
+VIEWPORT_WIDTH = 1920
+RSS_SAMPLE_INTERVAL = 0.25
+# The sampler outlives a capture that failed before reporting its metrics by at most this
+RSS_SAMPLER_MAX_SECONDS = 300
+VIEWPORT_HEIGHT = 1080
+MAX_PAGE_HEIGHT = 20000
+# Pages taller than this are captured as viewport-height tiles
+TILED_CAPTURE_THRESHOLD = int(os.environ.get("SCREENSHOT_TILE_THRESHOLD", "4000"))
+OVERVIEW_WIDTH = 240
+
+HIDE_FIXED_JS = """
+() => {
+    for (const el of document.querySelectorAll('body *')) {
+        const pos = getComputedStyle(el).position;
+        if (pos === 'fixed' || pos === 'sticky') {
+            el.style.setProperty('visibility', 'hidden', 'important');
+        }
+    }
+}
+"""
+
+
+class _RssTracker:
+    """
+    Peak RSS of this process and its children (Chromium, compression pool)
+    during a capture: sampled at checkpoints and by a background thread, so
+    peaks inside a child between checkpoints are not missed.
+    """
+
+    def __init__(self):
+        self.baseline = self.peak = process_tree_rss_bytes()
+        self._stop = threading.Event()
+        threading.Thread(target=self._sampler, name="screenshot-rss", daemon=True).start()
+
+    def _sampler(self):
+        deadline = time.monotonic() + RSS_SAMPLER_MAX_SECONDS
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL) and time.monotonic() < deadline:
+            self.sample()
+
+    def sample(self):
+        self.peak = max(self.peak, process_tree_rss_bytes())
+
+    def stop(self):
+        self._stop.set()
+
+    def as_metrics(self):
+        self.stop()
+        self.sample()
+        return {
+            "peak_rss_mb": round(self.peak / 1024 / 1024, 1),
+            "peak_rss_delta_mb": round((self.peak - self.baseline) / 1024 / 1024, 1),
+        }
+
+
+def _capture_single(page, page_height):
+    """One full_page screenshot (short pages)."""
+    page.set_viewport_size({"width": VIEWPORT_WIDTH, "height": page_height})
+    try:
+        return page.screenshot(
+            type="jpeg",
+            quality=90,   # intentionally high before compression
+            full_page=True,
+            timeout=20000,
+        )
+    except PlaywrightTimeout:
+        print("⚠️ Full-page failed — fallback to tall viewport.")
+        return page.screenshot(
+            type="jpeg",
+            quality=85,
+            full_page=False,
+        )
+
+
+def _capture_tiled(page, page_height, rss):
+    """Viewport-height slices streamed into a TileStitcher (tall pages)."""
+    stitcher = TileStitcher(VIEWPORT_WIDTH, page_height, scale=0.5, overview_width=OVERVIEW_WIDTH)
+    y = 0
+    while y < page_height:
+        target = min(y, max(0, page_height - VIEWPORT_HEIGHT))
+        top = page.evaluate("y => { window.scrollTo(0, y); return window.scrollY; }", target)
+        page.wait_for_timeout(150)
+        tile = page.screenshot(type="jpeg", quality=90, full_page=False)
+        stitcher.add_tile(tile, top=top, skip=max(0, y - top))
+        del tile
+        rss.sample()
+        if y == 0:
+            # Fixed headers/cookie bars would otherwise repeat in every tile
+            page.evaluate(HIDE_FIXED_JS)
+        y += VIEWPORT_HEIGHT
+    return stitcher
+
+
+# ---------------------------
+# Capture pipeline pieces
+# ---------------------------
+
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0 Safari/537.36"
+)
+
+
+def _open_page(p, url):
+    """Launch Chromium and navigate; returns (browser, page)."""
+    browser = p.chromium.launch(
+        headless=True,
+        args=["--disable-dev-shm-usage", "--no-sandbox", "--disable-gpu"],
+    )
+
+    page = browser.new_page(
+        viewport={"width": VIEWPORT_WIDTH, "height": VIEWPORT_HEIGHT},
+        user_agent=USER_AGENT,
+    )
+
+    try:
+        with fetch_scheduler.host_slot(url):
+            page.goto(url, wait_until="domcontentloaded", timeout=30000)
+    except PlaywrightTimeout:
+        print("⚠️ Navigation timeout — continuing.")
+    return browser, page
+
+
+def _render_full_page(page, rss):
+    """Scroll to trigger lazy content, then capture (single shot or tiles)."""
+    # Controlled scrolling
+    for _ in range(10):
+        page.mouse.wheel(0, 3000)
+        page.wait_for_timeout(600)
+
+    page.wait_for_timeout(1000)
+
+    # Cap page height (critical)
+    page_height = page.evaluate(
+        f"() => Math.min(document.body.scrollHeight, {MAX_PAGE_HEIGHT})"
+    )
+
+    if page_height > TILED_CAPTURE_THRESHOLD:
+        return "tiled", _capture_tiled(page, page_height, rss), page_height
+    return "single", _capture_single(page, page_height), page_height
+
+
+def _store_full_capture(url, rendered, upload_job, metrics, rss):
+    """Compress a rendered capture, store it with its variants; returns the URL."""
+    mode, capture, page_height = rendered
+    overview = None
+    debug_filename = f"{safe_filename(url)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    # ---- Compression (bytes in, bytes out) ----
+    if mode == "tiled":
+        data, overview, stats = capture.finish()
+        print(
+            f"🧩 Tiled capture: {stats['tiles']} tiles → "
+            f"{stats['bytes_after'] / 1024 / 1024:.2f} MB ({stats['encode_seconds']:.2f}s)"
+        )
+    else:
+        # Process pool; the child does the decode/encode work
+        data, stats = compress_screenshot(capture)
+    del capture
+    rss.sample()
+
+    metrics["compression"] = stats
+    metrics["capture_mode"] = mode
+    metrics["page_height"] = page_height
+    metrics.update(rss.as_metrics())
+    save_debug_copy(f"{debug_filename}.{stats['extension']}", data)
+
+    # ---- Content-addressed store (dedup without download) ----
+    public, info = store_screenshot(
+        data, url,
+        content_type=stats["content_type"],
+        ext=stats["extension"],
+        upload_job=upload_job,
+    )
+    if overview is not None:
+        metrics["overview_url"], _ = store_screenshot(
+            overview, url + "#overview",
+            content_type=stats["content_type"],
+            ext=stats["extension"],
+            upload_job=upload_job,
+        )
+
+    # ---- Responsive variants for list/detail views ----
+    metrics["variants"] = store_variants(
+        data, info,
+        fmt=stats["format"],
+        content_type=stats["content_type"],
+        ext=stats["extension"],
+        upload_job=upload_job,
+    )
+    metrics["sha256"] = info["sha256"]
+    metrics["reused"] = info["reused"]
+    return public
 
 
 # ---------------------------
@@ -70,100 +372,440 @@ def capture_screenshot(
     url: str,
     output_dir: str = "backend/reports/screenshots",
     gcs_folder_prefix: str = "",
+    upload_job: str = None,
+    metrics: dict = None,
 ):
     """
     FULL-PAGE screenshot with size logging and safe compression.
-    Runtime: 10–20s max.
+    Runtime: 10–20s max. The upload runs in the background under `upload_job`.
+
+    Pages taller than TILED_CAPTURE_THRESHOLD are captured in viewport-height
+    tiles and stitched at output resolution, which bounds peak memory.
+
+    Screenshots are content-addressed (see store_screenshot) and compressed
+    in memory, so output_dir and gcs_folder_prefix are only kept for
+    backwards compatibility. If a `metrics` dict is given it is filled with
+    compression stats, capture mode and peak RSS.
+
+    Runs in the render service when one is configured.
     """
+    metrics = {} if metrics is None else metrics
+    try:
+        public, shot_metrics = render_client.run("screenshot", url, upload_job)
+    except render_client.RenderError as e:
+        print(f"❌ Screenshot failed safely: {e}")
+        return None
+    metrics.update(shot_metrics)
+    return public
 
-    os.makedirs(output_dir, exist_ok=True)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{safe_filename(url)}_{timestamp}.jpg"
-    screenshot_path = os.path.join(output_dir, filename)
+def _flush_in_render_worker(upload_job):
+    # A render-service worker's upload queue is not the job's; finish before replying
+    if render_client.IN_RENDER_WORKER:
+        flush_uploads(upload_job)
+
+
+def screenshot_op(url, upload_job=None):
+    """Render op: full-page capture; returns (public URL or None, metrics)."""
+    metrics = {}
+    public = _capture_full_local(url, upload_job, metrics)
+    _flush_in_render_worker(upload_job)
+    return public, metrics
 
-    gcs_path = (
-        f"{gcs_folder_prefix}screenshots/{filename}"
-        if gcs_folder_prefix
-        else f"screenshots/{filename}"
-    )
+
+def _capture_full_local(url, upload_job, metrics):
+    rss = _RssTracker()
 
     try:
         with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=True,
-                args=["--disable-dev-shm-usage", "--no-sandbox", "--disable-gpu"],
-            )
+            browser, page = _open_page(p, url)
+            rendered = _render_full_page(page, rss)
+            browser.close()
 
-            page = browser.new_page(
-                viewport={"width": 1920, "height": 1080},
-                user_agent=(
-                    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/120.0 Safari/537.36"
-                ),
-            )
+        return _store_full_capture(url, rendered, upload_job, metrics, rss)
+
+    except Exception as e:
+        print(f"❌ Screenshot failed safely: {e}")
+        return None
+
+
+# ---------------------------
+# Two-phase capture
+# ---------------------------
+# Phase 1 grabs the viewport as soon as the page settles, so scoring and UI
+# previews can start; it never waits for other captures. Phase 2 (scroll +
+# full page) continues in the same browser session when a background slot is
+# free, otherwise the browser is released and the full page is captured later
+# on the bounded background pool. Either way it replaces the preview when done.
+# With extra SCREENSHOT_VIEWPORTS, phase 2 is one multi-viewport session in
+# which desktop (the full page) is one of the profiles.
+
+SCREENSHOT_TWO_PHASE = os.environ.get("SCREENSHOT_TWO_PHASE", "1").lower() in ("1", "true", "yes")
+PREVIEW_TARGET_BYTES = 512 * 1024
+SCREENSHOT_BACKGROUND_SLOTS = int(os.environ.get("SCREENSHOT_BACKGROUND_SLOTS", "2"))
+# Bounds how many Chromium instances background captures may hold at once
+_background_slots = threading.BoundedSemaphore(SCREENSHOT_BACKGROUND_SLOTS)
+# Queued background captures wait here, not on one thread each
+_background_pool = ThreadPoolExecutor(
+    max_workers=max(1, SCREENSHOT_BACKGROUND_SLOTS), thread_name_prefix="screenshot-background"
+)
+
+
+def _run_in_background(future, fn, *args):
+    """Run fn(*args) under a background slot; `future` always resolves (None on error)."""
+    def _task():
+        result = None
+        try:
+            with _background_slots:
+                result = fn(*args)
+        except Exception as e:
+            print(f"❌ Background capture failed safely: {e}")
+        finally:
+            future.set_result(result)
+
+    _background_pool.submit(_task)
+    return future
+
+
+class TwoPhaseCapture:
+    """Handle returned by capture_screenshot_two_phase()."""
+
+    def __init__(self, url, extra=()):
+        self.url = url
+        self.extra = list(extra)   # viewport profiles besides desktop
+        self.preview_url = None
+        self.preview_ready = threading.Event()
+        self.full = Future()       # resolves to the full-page URL (or None)
+        # Future of {profile: url} for the extra viewports, when there are any
+        self.viewports = Future() if self.extra else None
+        self.metrics = {}
+
+    def wait_preview(self, timeout=None):
+        self.preview_ready.wait(timeout)
+        return self.preview_url
+
+
+def _store_preview(page, url, upload_job):
+    """Above-the-fold capture of an open page; returns its public URL."""
+    raw = page.screenshot(type="jpeg", quality=90, full_page=False)
+    data, stats = compress_screenshot(raw, target_size=PREVIEW_TARGET_BYTES)
+    preview_url, _ = store_screenshot(
+        data, url + "#preview",
+        content_type=stats["content_type"],
+        ext=stats["extension"],
+        upload_job=upload_job,
+    )
+    return preview_url
 
+
+def preview_op(url, upload_job=None):
+    """Render op: viewport preview only; returns (public URL or None, metrics)."""
+    started = time.perf_counter()
+    preview_url = None
+    try:
+        with sync_playwright() as p:
+            browser, page = _open_page(p, url)
             try:
-                page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                page.wait_for_load_state("load", timeout=5000)
             except PlaywrightTimeout:
-                print("⚠️ Navigation timeout — continuing.")
+                pass
+            preview_url = _store_preview(page, url, upload_job)
+            browser.close()
+    except Exception as e:
+        print(f"⚠️ Preview capture failed: {e}")
+    _flush_in_render_worker(upload_job)
+    return preview_url, {"preview_seconds": round(time.perf_counter() - started, 2)}
 
-            # Controlled scrolling
-            for _ in range(10):
-                page.mouse.wheel(0, 3000)
-                page.wait_for_timeout(600)
 
-            page.wait_for_timeout(1000)
+def _background_full_capture(capture, upload_job):
+    """Full page in a fresh session (render service when configured)."""
+    started = time.perf_counter()
+    public = capture_screenshot(capture.url, upload_job=upload_job, metrics=capture.metrics)
+    capture.metrics["full_capture_seconds"] = round(time.perf_counter() - started, 2)
+    return public
+
+
+def _background_all_viewports(capture, upload_job):
+    """Desktop full page plus the extra viewports in one shared browser context."""
+    started = time.perf_counter()
+    viewport_metrics = {}
+    by_viewport = capture_viewports(
+        capture.url, ["desktop", *capture.extra], upload_job=upload_job, metrics=viewport_metrics
+    )
+    capture.metrics.update(viewport_metrics.pop("desktop", {}))
+    capture.metrics["viewports"] = viewport_metrics
+    capture.metrics["full_capture_seconds"] = round(time.perf_counter() - started, 2)
+    return by_viewport
 
-            # Cap page height (critical)
-            page_height = page.evaluate(
-                "() => Math.min(document.body.scrollHeight, 20000)"
-            )
-            page.set_viewport_size({"width": 1920, "height": page_height})
 
+def _start_phase_two(capture, upload_job):
+    """Queue phase 2 on the background pool; resolves `full` (and `viewports`)."""
+    if not capture.extra:
+        _run_in_background(capture.full, _background_full_capture, capture, upload_job)
+        return
+
+    def _resolve(done):
+        by_viewport = done.result() or {}
+        capture.viewports.set_result({name: by_viewport.get(name) for name in capture.extra})
+        capture.full.set_result(by_viewport.get("desktop"))
+
+    _run_in_background(Future(), _background_all_viewports, capture, upload_job).add_done_callback(_resolve)
+
+
+def _start_remote_two_phase(capture, upload_job):
+    """
+    Two-phase capture through the render service: the preview op runs first
+    (scoring waits on it), then phase 2 runs as one op in the background.
+    False when the service is unavailable.
+    """
+    try:
+        capture.preview_url, preview_metrics = render_client.call("screenshot_preview", capture.url, upload_job)
+        capture.metrics.update(preview_metrics)
+    except render_client.RenderServiceUnavailable:
+        return False
+    except render_client.RenderError as e:
+        print(f"⚠️ Preview capture failed: {e}")
+    capture.preview_ready.set()
+    _start_phase_two(capture, upload_job)
+    return True
+
+
+def _two_phase_worker(capture, upload_job):
+    url = capture.url
+    started = time.perf_counter()
+    has_slot = False
+    deferred = False
+    public = None
+    try:
+        with sync_playwright() as p:
+            browser, page = _open_page(p, url)
             try:
-                page.screenshot(
-                    path=screenshot_path,
-                    type="jpeg",
-                    quality=90,   # intentionally high before compression
-                    full_page=True,
-                    timeout=20000,
-                )
+                page.wait_for_load_state("load", timeout=5000)
             except PlaywrightTimeout:
-                print("⚠️ Full-page failed — fallback to tall viewport.")
-                page.screenshot(
-                    path=screenshot_path,
-                    type="jpeg",
-                    quality=85,
-                    full_page=False,
-                )
+                pass
 
+            # ---- Phase 1: above-the-fold preview ----
+            try:
+                capture.preview_url = _store_preview(page, url, upload_job)
+                capture.metrics["preview_seconds"] = round(time.perf_counter() - started, 2)
+            except Exception as e:
+                print(f"⚠️ Preview capture failed: {e}")
+            finally:
+                capture.preview_ready.set()
+
+            # ---- Phase 2: full page, in this session only if a slot is free now ----
+            # (extra viewports need the multi-viewport session instead)
+            has_slot = not capture.extra and _background_slots.acquire(blocking=False)
+            if has_slot:
+                rss = _RssTracker()
+                rendered = _render_full_page(page, rss)
             browser.close()
 
-        # ---- Compression + size logs ----
-        compress_image(screenshot_path)
+        if has_slot:
+            public = _store_full_capture(url, rendered, upload_job, capture.metrics, rss)
+            capture.metrics["full_capture_seconds"] = round(time.perf_counter() - started, 2)
+        else:
+            _start_phase_two(capture, upload_job)
+            deferred = True
+    except Exception as e:
+        print(f"❌ Screenshot failed safely: {e}")
+    finally:
+        if has_slot:
+            _background_slots.release()
+        capture.preview_ready.set()
+        if not deferred:
+            capture.full.set_result(public)
+            if capture.viewports is not None:
+                capture.viewports.set_result({})
 
-        # ---- GCS deduplication ----
-        bucket = get_bucket()
-        blob = bucket.blob(gcs_path)
 
-        if blob.exists():
-            tmp_old = screenshot_path + ".old"
-            download_file_from_gcs(gcs_path, tmp_old)
+def capture_screenshot_two_phase(url: str, upload_job: str = None):
+    """
+    Start a two-phase capture and return once the preview is available.
 
-            if file_hash(tmp_old) == file_hash(screenshot_path):
-                os.remove(screenshot_path)
-                os.remove(tmp_old)
-                print("🟡 Screenshot unchanged — reused existing.")
-                return blob.public_url
-            else:
-                os.remove(tmp_old)
+    The returned TwoPhaseCapture carries preview_url immediately and a
+    `full` future for the full-page URL. Extra SCREENSHOT_VIEWPORTS
+    (e.g. mobile) are captured in the same browser context as the desktop
+    full page, into the `viewports` future.
+    """
+    capture = TwoPhaseCapture(url, extra=[name for name in SCREENSHOT_VIEWPORTS if name != "desktop"])
+    if render_client.service_enabled() and _start_remote_two_phase(capture, upload_job):
+        return capture
+    threading.Thread(
+        target=_two_phase_worker,
+        args=(capture, upload_job),
+        name="screenshot-two-phase",
+        daemon=True,
+    ).start()
+    capture.wait_preview(timeout=60)
+    return capture
 
-        url = upload_file_to_gcs(screenshot_path, gcs_path)
-        print(f"✅ Screenshot uploaded to GCS: {url}")
-        return url
 
+# ---------------------------
+# Multi-viewport capture
+# ---------------------------
+# All profiles render as parallel pages inside ONE browser context (one
+# Chromium per project), sharing its HTTP cache: an asset already cached by
+# one page is served from cache to the others. Pages load concurrently, so
+# assets they request at the same moment, or that are uncacheable, can still
+# be fetched once per page. Desktop is one of the profiles and is stored as
+# the page's main screenshot (overview, variants), like capture_screenshot.
+# Device emulation (is_mobile, device scale factor) is per-context in
+# Chromium, so profiles differ by viewport size and User-Agent header only;
+# responsive CSS keys off the viewport width, which is what reviewers look at.
+
+MOBILE_USER_AGENT = (
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) "
+    "AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/17.0 Mobile/15E148 Safari/604.1"
+)
+
+# name -> viewport, output scale, optional height cap and User-Agent override
+VIEWPORT_PROFILES = {
+    "desktop": {"width": VIEWPORT_WIDTH, "height": VIEWPORT_HEIGHT, "scale": 0.5, "max_height": MAX_PAGE_HEIGHT},
+    "tablet": {"width": 820, "height": 1180, "scale": 0.75, "user_agent": MOBILE_USER_AGENT},
+    "mobile": {"width": 390, "height": 844, "scale": 1.0, "user_agent": MOBILE_USER_AGENT},
+}
+SCREENSHOT_VIEWPORTS = [
+    name.strip()
+    for name in os.environ.get("SCREENSHOT_VIEWPORTS", "desktop,mobile").split(",")
+    if name.strip() in VIEWPORT_PROFILES
+]
+VIEWPORT_MAX_PAGE_HEIGHT = 12000
+
+
+async def _render_viewport(context, url, name, profile, upload_job, metrics, rss):
+    from playwright.async_api import TimeoutError as AsyncPlaywrightTimeout
+
+    started = time.perf_counter()
+    page = await context.new_page()
+    try:
+        await page.set_viewport_size({"width": profile["width"], "height": profile["height"]})
+        if profile.get("user_agent"):
+            await page.set_extra_http_headers({"User-Agent": profile["user_agent"]})
+        # The scheduler is thread-based; wait for the host slot off the event loop
+        await asyncio.to_thread(fetch_scheduler.acquire, url)
+        try:
+            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        except AsyncPlaywrightTimeout:
+            print(f"⚠️ [{name}] Navigation timeout — continuing.")
+        finally:
+            fetch_scheduler.release(url)
+
+        for _ in range(6):
+            await page.mouse.wheel(0, 3000)
+            await page.wait_for_timeout(400)
+        await page.wait_for_timeout(600)
+
+        page_height = await page.evaluate(
+            f"() => Math.min(document.body.scrollHeight, {profile.get('max_height', VIEWPORT_MAX_PAGE_HEIGHT)})"
+        )
+        page_height = max(profile["height"], page_height)
+        # Profile-height tiles stitched at output scale: no full-height bitmap
+        stitcher = TileStitcher(profile["width"], page_height, scale=profile["scale"], overview_width=OVERVIEW_WIDTH)
+        y = 0
+        while y < page_height:
+            target = min(y, max(0, page_height - profile["height"]))
+            top = await page.evaluate("y => { window.scrollTo(0, y); return window.scrollY; }", target)
+            await page.wait_for_timeout(150)
+            tile = await page.screenshot(type="jpeg", quality=90, full_page=False, timeout=20000)
+            # Decoding is CPU-bound; keep the event loop free for the other pages
+            await asyncio.to_thread(stitcher.add_tile, tile, top, max(0, y - top))
+            del tile
+            if y == 0:
+                await page.evaluate(HIDE_FIXED_JS)
+            y += profile["height"]
+    finally:
+        await page.close()
+
+    if name == "desktop":
+        # The page's main screenshot: stored exactly like a single-session capture
+        desktop_metrics = {}
+        public = await asyncio.to_thread(
+            _store_full_capture, url, ("tiled", stitcher, page_height), upload_job, desktop_metrics, rss
+        )
+        metrics[name] = {**desktop_metrics, "seconds": round(time.perf_counter() - started, 2)}
+        return public
+
+    data, _, stats = await asyncio.to_thread(stitcher.finish, None, SCREENSHOT_TARGET_BYTES)
+    public, info = await asyncio.to_thread(
+        store_screenshot,
+        data, f"{url}#viewport={name}",
+        stats["content_type"], stats["extension"], upload_job,
+    )
+    metrics[name] = {
+        "page_height": page_height,
+        "bytes": stats["bytes_after"],
+        "tiles": stats["tiles"],
+        "sha256": info["sha256"],
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    return public
+
+
+async def _capture_viewports_async(url, profiles, upload_job, metrics):
+    from playwright.async_api import async_playwright
+
+    rss = _RssTracker() if "desktop" in profiles else None
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(
+            headless=True,
+            args=["--disable-dev-shm-usage", "--no-sandbox", "--disable-gpu"],
+        )
+        try:
+            context = await browser.new_context(user_agent=USER_AGENT)
+            results = await asyncio.gather(
+                *[
+                    _render_viewport(context, url, name, VIEWPORT_PROFILES[name], upload_job, metrics, rss)
+                    for name in profiles
+                ],
+                return_exceptions=True,
+            )
+        finally:
+            await browser.close()
+            if rss is not None:
+                rss.stop()
+
+    by_viewport = {}
+    for name, result in zip(profiles, results):
+        if isinstance(result, Exception):
+            print(f"⚠️ [{name}] Viewport capture failed: {result}")
+            by_viewport[name] = None
+        else:
+            by_viewport[name] = result
+    return by_viewport
+
+
+def capture_viewports(url: str, profiles=None, upload_job: str = None, metrics: dict = None):
+    """
+    Capture `url` at several viewport profiles in one browser session.
+
+    Returns {profile name: public screenshot URL or None}. Per-profile
+    timings and sizes are written into `metrics` when given; for "desktop"
+    that is the full capture_screenshot metrics (overview_url, variants...).
+    """
+    profiles = [name for name in (profiles or SCREENSHOT_VIEWPORTS) if name in VIEWPORT_PROFILES]
+    metrics = {} if metrics is None else metrics
+    if not profiles:
+        return {}
+    try:
+        by_viewport, viewport_metrics = render_client.run("viewports", url, profiles, upload_job)
+    except render_client.RenderError as e:
+        print(f"❌ Viewport capture failed safely: {e}")
+        return {name: None for name in profiles}
+    metrics.update(viewport_metrics)
+    return by_viewport
+
+
+def viewports_op(url, profiles, upload_job=None):
+    """Render op: multi-viewport capture; returns ({profile: URL or None}, metrics)."""
+    metrics = {}
+    try:
+        # Runs its own event loop; callers are worker threads, never a running loop
+        by_viewport = asyncio.run(_capture_viewports_async(url, profiles, upload_job, metrics))
     except Exception as e:
-        print(f"❌ Screenshot failed safely: {e}")
-        return None
+        print(f"❌ Viewport capture failed safely: {e}")
+        by_viewport = {name: None for name in profiles}
+    _flush_in_render_worker(upload_job)
+    return by_viewport, metrics
+
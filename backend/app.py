@@ -1,16 +1,21 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, redirect, request, jsonify, send_file
 from flask_cors import CORS
 import os
 import json
 import uuid
-import io
+import mimetypes
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 from google.cloud import storage
-from PIL import Image
 
 from main import run_analysis_from_flask
-import threading
-from utils.gcs_utils import upload_file_to_gcs
+from utils.gcs_utils import upload_file_to_gcs, generate_signed_url, SigningUnavailable
+from utils.disk_cache import DiskCache
+from analysis.screenshot import screenshot_object_path, variant_path_for_width
+from utils.upload_queue import flush_uploads
+from utils.job_queue import JobQueue, QueueFull
+from utils.report_manifest import load_manifest, normalize_case_study, MANIFEST_NAME
 from utils.resume_parser import parse_resume
 from utils.firebase_db import (
     save_user_profile,
@@ -36,6 +41,19 @@ os.makedirs(REPORT_FOLDER, exist_ok=True)
 BUCKET_NAME = "portfolio-reports-confi360"
 _storage_client = None
 
+# Screenshot delivery: "proxy" streams from GCS, "redirect" sends a signed URL
+SCREENSHOT_DELIVERY = os.environ.get("SCREENSHOT_DELIVERY", "proxy").lower()
+SCREENSHOT_CACHE_DIR = os.environ.get("SCREENSHOT_CACHE_DIR", os.path.join(BACKEND_DIR, "cache", "screenshots"))
+SCREENSHOT_CACHE_MAX_BYTES = int(os.environ.get("SCREENSHOT_CACHE_MAX_MB", "128")) * 1024 * 1024
+SCREENSHOT_CHUNK_SIZE = 256 * 1024
+SCREENSHOT_MAX_AGE = 365 * 24 * 3600
+SIGNED_URL_TTL_SECONDS = 3600
+CAS_FILENAME_RE = re.compile(r"^[0-9a-f]{64}\.(jpg|webp|avif)$")
+# Redirect mode: screenshot objects already seen in GCS (they are never deleted)
+SCREENSHOT_KNOWN_OBJECTS_MAX = 4096
+_screenshot_cache = None
+_known_screenshot_objects = set()
+
 def get_storage_client():
     global _storage_client
     if _storage_client is None:
@@ -67,6 +85,80 @@ def _extract_display_name(resume_data, user_name):
             return str(candidate).strip()
     return "Designer"
 
+# ---------------------------------------
+# ANALYSIS JOBS
+# ---------------------------------------
+
+def run_analysis_job(report_id, job):
+    """Run one queued analysis job (a JobQueue handler; payload written by /analyze)."""
+    gcs_folder = job["gcs_folder"]
+    try:
+        update_analysis_status(
+            report_id,
+            status="processing",
+            progress=5,
+            message="Starting analysis...",
+        )
+        result = run_analysis_from_flask(
+            job["portfolio_url"],
+            resume_path=job.get("resume_path"),
+            report_id=report_id,
+            user_id=job.get("user_id"),
+            reanalyze=job.get("reanalyze", False),
+        )
+
+        projects_found = len(result.get("project_links", []) or [])
+        projects_analyzed = result.get("project_reports_count", 0)
+
+        # The job's only barrier: every artifact (pipeline and time report)
+        # must be in GCS before the frontend is told the job is complete.
+        upload_stats = flush_uploads(result.get("upload_job") or gcs_folder)
+
+        update_analysis_status(
+            report_id,
+            status="completed",
+            progress=100,
+            message="Analysis complete",
+            result_data={
+                "resume_pdf_url": job.get("gcs_pdf_url"),
+                "projects_found": projects_found,
+                "projects_analyzed": projects_analyzed,
+                "projects_reused": len(result.get("reused_projects", []) or []),
+                "time_report_url": result.get("time_report_url"),
+                "upload_failures": upload_stats.get("failed", 0),
+            },
+        )
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        update_analysis_status(
+            report_id,
+            status="failed",
+            progress=0,
+            message=str(e),
+        )
+        raise
+
+
+def report_abandoned_job(report_id, error):
+    """Mark a job the queue gave up on (its worker kept dying) as failed for the frontend."""
+    update_analysis_status(report_id, status="failed", progress=0, message=error)
+
+
+# Fixed worker pool over a persistent queue; orphaned jobs resume when it
+# starts. Started per worker process (gunicorn.conf.py post_fork, or below
+# for `python app.py`), never at import: threads don't survive a fork.
+job_queue = JobQueue(run_analysis_job, on_abandoned=report_abandoned_job)
+
+
+def _queue_full_response(e):
+    resp = jsonify({
+        "error": "Too many analyses in progress, please retry later",
+        "retry_after": e.retry_after,
+    })
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp, 429
+
 # ---------------------------------------
 # ROUTES (STATIC)
 # ---------------------------------------
@@ -76,7 +168,7 @@ def home():
     return jsonify({"status": "backend_running"})
 
 # ---------------------------------------
-# ANALYZE → RUN PIPELINE (SYNC)
+# ANALYZE → QUEUE PIPELINE JOB
 # ---------------------------------------
 
 @app.route("/analyze", methods=["POST"])
@@ -86,12 +178,20 @@ def analyze():
     user_id = request.form.get("userId")
     user_name = request.form.get("userName")
     job_role = request.form.get("jobRole", "Product Designer")
+    # Re-analysis: keep the previous analysis of unchanged case studies
+    reanalyze = request.form.get("reanalyze", "").lower() in ("1", "true", "yes")
 
     if not portfolio_url:
         return jsonify({"error": "Portfolio URL missing"}), 400
     if not resume:
         return jsonify({"error": "Resume file missing"}), 400
 
+    # Reject before doing any work when the backlog is full
+    try:
+        job_queue.check_capacity()
+    except QueueFull as e:
+        return _queue_full_response(e)
+
     # ---------------------------------------
     # PREPARE JOB (FAST)
     # ---------------------------------------
@@ -125,12 +225,13 @@ def analyze():
     except Exception as _:
         pass
 
-    # Initialize Firestore status
+    # Initialize Firestore status (before the job is queued, so a worker's
+    # own status updates can never be overwritten by this one)
     update_analysis_status(
         report_id,
         status="processing",
-        progress=5,
-        message="Starting analysis...",
+        progress=2,
+        message="Queued for analysis...",
         user_id=user_id,
         portfolio_url=portfolio_url,
         result_data={
@@ -140,49 +241,27 @@ def analyze():
     )
 
     # ---------------------------------------
-    # START BACKGROUND ANALYSIS THREAD
+    # QUEUE THE ANALYSIS
     # ---------------------------------------
 
-    def run_analysis_background():
-        try:
-            result = run_analysis_from_flask(
-                portfolio_url,
-                resume_path=resume_path,
-                report_id=report_id,
-                user_id=user_id,
-            )
-
-            projects_found = len(result.get("project_links", []) or [])
-            projects_analyzed = result.get("project_reports_count", 0)
-
-            update_analysis_status(
-                report_id,
-                status="completed",
-                progress=100,
-                message="Analysis complete",
-                result_data={
-                    "resume_pdf_url": gcs_pdf_url,
-                    "projects_found": projects_found,
-                    "projects_analyzed": projects_analyzed,
-                    "time_report_url": result.get("time_report_url"),
-                },
-            )
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            update_analysis_status(
-                report_id,
-                status="failed",
-                progress=0,
-                message=str(e),
-            )
-
-    threading.Thread(target=run_analysis_background, daemon=True).start()
+    try:
+        position = job_queue.submit(report_id, {
+            "portfolio_url": portfolio_url,
+            "resume_path": resume_path,
+            "user_id": user_id,
+            "gcs_folder": gcs_folder,
+            "gcs_pdf_url": gcs_pdf_url,
+            "reanalyze": reanalyze,
+        })
+    except QueueFull as e:
+        update_analysis_status(report_id, status="failed", progress=0, message=str(e))
+        return _queue_full_response(e)
 
     # Return immediately to satisfy Cloud Run/Hosting first-byte requirement
     return jsonify({
         "report_id": report_id,
         "status": "processing",
+        "queue_position": position,
     })
 
 
@@ -212,6 +291,14 @@ def get_status(report_id):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/queue", methods=["GET"])
+def get_queue_stats():
+    try:
+        return jsonify({"success": True, **job_queue.stats()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # ---------------------------------------
 # USER PROFILE APIs
 # ---------------------------------------
@@ -274,9 +361,29 @@ def get_reports():
         return jsonify({"error": "Missing report_id"}), 400
 
     bucket = get_storage_client().bucket(BUCKET_NAME)
-    prefix = f"{report_id}/"
 
-    blobs = list(bucket.list_blobs(prefix=prefix))
+    # Fast path: one read of the per-job manifest (LRU-cached in process)
+    try:
+        manifest = load_manifest(bucket, report_id)
+    except Exception as e:
+        print(f"[WARNING] Could not read manifest for {report_id}: {e}")
+        manifest = None
+
+    if manifest is not None:
+        return jsonify({
+            "status": "ok",
+            "portfolio": manifest.get("portfolio"),
+            "case_studies": manifest.get("case_studies", []),
+        })
+
+    # Legacy jobs (no manifest): list and fetch the reports in parallel
+    prefix = f"{report_id}/"
+    blobs = [
+        blob for blob in bucket.list_blobs(prefix=prefix)
+        if blob.name.endswith(".json")
+        and not blob.name.endswith("_time_report.json")
+        and not blob.name.endswith(MANIFEST_NAME)
+    ]
 
     if not blobs:
         return jsonify({
@@ -285,49 +392,33 @@ def get_reports():
             "case_studies": []
         })
 
+    def _download(blob):
+        try:
+            return blob.name, json.loads(blob.download_as_text())
+        except Exception:
+            return blob.name, None
+
     portfolio = None
     case_studies = []
 
-    for blob in blobs:
-        if not blob.name.endswith(".json"):
-            continue
+    with ThreadPoolExecutor(max_workers=min(8, len(blobs))) as pool:
+        results = list(pool.map(_download, blobs))
 
-        try:
-            content = json.loads(blob.download_as_text())
-        except Exception:
+    for name, content in results:
+        if content is None:
             continue
 
         # Detect main portfolio file
-        if blob.name.endswith("_main_portfolio.json"):
+        if name.endswith("_main_portfolio.json"):
             # Ensure type field for frontend
             if isinstance(content, dict):
                 content.setdefault("type", "portfolio")
             portfolio = content
 
         # Detect project case studies
-        elif "/projects/" in blob.name:
+        elif "/projects/" in name:
             # Normalize structure for frontend consumption
-            if isinstance(content, dict):
-                analysis = content.get("analysis", {})
-                scraped = content.get("scraped_data", {})
-                # Prefer project_name saved in report; fallback to title or URL
-                project_name = content.get("project_name") or scraped.get("title") or (content.get("url") or "").split("/")[-1]
-                normalized = {
-                    "type": "case_study",
-                    "url": content.get("url"),
-                    "project_name": project_name,
-                    "category": "UX/UI",
-                    # map snake_case to camelCase expected by frontend
-                    "overallScore": analysis.get("overall_score", 0) or 0,
-                    "phase_scores": analysis.get("phase_scores", []) or [],
-                    "ux_keywords": analysis.get("ux_keywords", []) or [],
-                    "improvements": analysis.get("improvements", []) or [],
-                    "verdict": analysis.get("verdict", "") or "",
-                    "summary": analysis.get("overall_feedback", "") or "",
-                }
-                case_studies.append(normalized)
-            else:
-                case_studies.append(content)
+            case_studies.append(normalize_case_study(content))
 
     return jsonify({
         "status": "ok",
@@ -341,21 +432,172 @@ def get_reports():
 # SCREENSHOT PROXY
 # ---------------------------------------
 
+def get_screenshot_cache():
+    global _screenshot_cache
+    if _screenshot_cache is None:
+        _screenshot_cache = DiskCache(SCREENSHOT_CACHE_DIR, SCREENSHOT_CACHE_MAX_BYTES)
+    return _screenshot_cache
+
+
+def _set_screenshot_cache_headers(resp):
+    # Screenshot objects are never rewritten under the same name
+    resp.cache_control.public = True
+    resp.cache_control.max_age = SCREENSHOT_MAX_AGE
+    resp.cache_control.immutable = True
+    resp.headers["Accept-Ranges"] = "bytes"
+    return resp
+
+
+_signing_unavailable_logged = False
+
+
+def _screenshot_exists(bucket, gcs_path):
+    """One metadata lookup per object; positive answers are remembered."""
+    if gcs_path in _known_screenshot_objects:
+        return True
+    if bucket.get_blob(gcs_path) is None:
+        # Not remembered: a variant may still be uploading
+        return False
+    if len(_known_screenshot_objects) >= SCREENSHOT_KNOWN_OBJECTS_MAX:
+        _known_screenshot_objects.clear()
+    _known_screenshot_objects.add(gcs_path)
+    return True
+
+
+def _send_cached_screenshot(hit):
+    # send_file handles Range and If-None-Match for local files
+    path, meta = hit
+    resp = send_file(
+        path,
+        mimetype=meta.get("content_type"),
+        conditional=True,
+        etag=meta.get("etag"),
+        last_modified=meta.get("updated"),
+    )
+    return _set_screenshot_cache_headers(resp)
+
+
 @app.route("/reports/<report_id>/screenshots/<filename>")
 def serve_screenshot(report_id, filename):
+    global _signing_unavailable_logged
+    if ".." in report_id or ".." in filename:
+        return "Not found", 404
+
+    # Content-addressed screenshots are shared across jobs; ?w= picks the
+    # smallest precomputed width variant that covers the requested width
+    fallback_path = None
+    if CAS_FILENAME_RE.match(filename):
+        digest, ext = filename.rsplit(".", 1)
+        gcs_path = screenshot_object_path(digest, ext)
+        width = request.args.get("w", type=int)
+        variant_path = variant_path_for_width(digest, ext, width) if width else None
+        if variant_path:
+            gcs_path, fallback_path = variant_path, gcs_path
+    else:
+        gcs_path = f"{report_id}/screenshots/{filename}"
+
     try:
-        blob = get_storage_client().bucket(BUCKET_NAME).blob(
-            f"{report_id}/screenshots/{filename}"
-        )
-        if not blob.exists():
+        # Optional: hand the client a signed URL and drop out of the image path
+        # (proxied below when the credentials cannot sign)
+        if SCREENSHOT_DELIVERY == "redirect":
+            # Never sign a path that would 404: variants are skipped for narrow
+            # sources and older screenshots have none
+            bucket = get_storage_client().bucket(BUCKET_NAME)
+            if not _screenshot_exists(bucket, gcs_path):
+                if not fallback_path or not _screenshot_exists(bucket, fallback_path):
+                    return "Not found", 404
+                gcs_path = fallback_path
+                fallback_path = None
+            try:
+                signed_url = generate_signed_url(gcs_path, SIGNED_URL_TTL_SECONDS)
+            except SigningUnavailable as e:
+                if not _signing_unavailable_logged:
+                    print(f"⚠️ Cannot sign screenshot URLs ({e}); proxying screenshots instead")
+                    _signing_unavailable_logged = True
+            else:
+                resp = redirect(signed_url, code=302)
+                resp.cache_control.private = True
+                resp.cache_control.max_age = SIGNED_URL_TTL_SECONDS // 2
+                return resp
+
+        # Hot images are served from the bounded local disk cache
+        cache = get_screenshot_cache()
+        hit = cache.get(gcs_path)
+        if hit:
+            return _send_cached_screenshot(hit)
+
+        # One metadata round trip (also tells us whether the object exists)
+        bucket = get_storage_client().bucket(BUCKET_NAME)
+        blob = bucket.get_blob(gcs_path)
+        if blob is None and fallback_path:
+            # Variant not generated (source narrower than requested width)
+            gcs_path = fallback_path
+            hit = cache.get(gcs_path)
+            if hit:
+                return _send_cached_screenshot(hit)
+            blob = bucket.get_blob(gcs_path)
+        if blob is None:
             return "Not found", 404
 
-        return send_file(
-            io.BytesIO(blob.download_as_bytes()),
-            mimetype="image/webp",
-        )
+        size = blob.size or 0
+        etag = blob.etag
+        content_type = blob.content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        if etag and request.if_none_match.contains(etag):
+            resp = Response(status=304)
+            resp.set_etag(etag)
+            return _set_screenshot_cache_headers(resp)
+
+        byte_range = None
+        if request.range and (not request.if_range or request.if_range.etag == etag):
+            byte_range = request.range.range_for_length(size)
+            if byte_range is None:
+                resp = Response(status=416)
+                resp.headers["Content-Range"] = f"bytes */{size}"
+                return resp
+        start, stop = byte_range or (0, size)
+
+        # Full reads of cacheable objects are teed into the disk cache
+        cache_entry = None
+        if byte_range is None and size <= SCREENSHOT_CACHE_MAX_BYTES // 8:
+            cache_entry = cache.open_write(gcs_path, {
+                "content_type": content_type,
+                "etag": etag,
+                "updated": blob.updated.timestamp() if blob.updated else None,
+            })
+
+        def generate():
+            remaining = stop - start
+            try:
+                with blob.open("rb", chunk_size=SCREENSHOT_CHUNK_SIZE) as f:
+                    f.seek(start)
+                    while remaining > 0:
+                        chunk = f.read(min(SCREENSHOT_CHUNK_SIZE, remaining))
+                        if not chunk:
+                            break
+                        remaining -= len(chunk)
+                        if cache_entry:
+                            cache_entry.write(chunk)
+                        yield chunk
+            finally:
+                if cache_entry:
+                    if remaining == 0:
+                        cache_entry.commit()
+                    else:
+                        cache_entry.abort()
+
+        resp = Response(generate(), status=206 if byte_range else 200, mimetype=content_type, direct_passthrough=True)
+        resp.headers["Content-Length"] = str(stop - start)
+        if byte_range:
+            resp.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+        if etag:
+            resp.set_etag(etag)
+        if blob.updated:
+            resp.last_modified = blob.updated
+        return _set_screenshot_cache_headers(resp)
     except Exception as e:
-        return str(e), 500
+        print(f"❌ Screenshot serve failed for {gcs_path}: {e}")
+        return "Internal server error", 500
 
 
 # ---------------------------------------
@@ -363,4 +605,5 @@ def serve_screenshot(report_id, filename):
 # ---------------------------------------
 
 if __name__ == "__main__":
+    job_queue.start()
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8080)))
@@ -0,0 +1,92 @@
+"""
+Benchmark: single-pass extraction vs the previous BeautifulSoup pipeline
+
+Usage (from backend/):
+    python -m benchmarks.bench_html_extract [path/to/page.html ...]
+
+Without arguments a synthetic case-study page (~2 MB, long text, many
+headings, images and links) is generated.
+
+Both pipelines extract the full text for the comparison (max_text_chars=None);
+the production setting, capped at SCRAPE_TEXT_BUDGET characters, is timed
+separately since it can stop collecting text early.
+"""
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+from utils.html_extract import SCRAPE_TEXT_BUDGET, extract_html
+
+
+def legacy_extract(html):
+    """The multi-pass pipeline scrape_project_page used before."""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    title = ""
+    if soup.find('title'):
+        title = soup.find('title').get_text(strip=True)
+    elif soup.find('h1'):
+        title = soup.find('h1').get_text(strip=True)
+
+    meta_desc = ""
+    meta_tag = soup.find('meta', attrs={'name': 'description'})
+    if meta_tag and meta_tag.get('content'):
+        meta_desc = meta_tag['content']
+
+    headings = []
+    for tag in ['h1', 'h2', 'h3', 'h4']:
+        for heading in soup.find_all(tag):
+            headings.append({'level': tag, 'text': heading.get_text(strip=True)})
+
+    for element in soup(['script', 'style', 'nav', 'footer', 'header']):
+        element.decompose()
+
+    text_content = soup.get_text(separator=' ', strip=True)
+    image_count = len(soup.find_all('img'))
+    return title, meta_desc, headings, len(text_content), image_count
+
+
+def synthetic_page(sections=1150):
+    parts = [
+        "<html><head><title>Case study</title>",
+        '<meta name="description" content="Redesigning onboarding">',
+        "<style>body{font-family:sans-serif}</style></head><body>",
+        '<header><nav><a href="/">Home</a><a href="/work">Work</a></nav></header>',
+    ]
+    paragraph = "We interviewed users, mapped the journey and iterated on the flows. " * 12
+    for i in range(sections):
+        parts.append(f"<section><h2>Phase {i}</h2><h3>Research {i}</h3>")
+        parts.append(f"<p>{paragraph}</p><div><div><span>{paragraph}</span></div></div>")
+        parts.append(f'<img src="/img/{i}.png" alt="figure {i}"><a href="/p/{i}">Detail {i}</a>')
+        parts.append("<script>window.__data = {\"k\": 1};</script></section>")
+    parts.append("<footer>© Portfolio</footer></body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+def bench(fn, html, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(paths):
+    pages = [(p, open(p, "rb").read()) for p in paths] or [("synthetic", synthetic_page())]
+    for name, html in pages:
+        rounds = 5
+        old = bench(legacy_extract, html, rounds)
+        new = bench(lambda page: extract_html(page, max_text_chars=None), html, rounds)
+        capped = bench(extract_html, html, rounds)
+        print(
+            f"{name}: {len(html) / 1024 / 1024:.2f} MB | "
+            f"BeautifulSoup {old * 1000:.1f} ms | single-pass {new * 1000:.1f} ms | "
+            f"{old / new:.1f}x faster (full text both) | "
+            f"capped at {SCRAPE_TEXT_BUDGET} chars {capped * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,13 +1,19 @@
 """
 Handles scraping based on platform type and coordinates Gemini analysis
 """
-import os
 import json
 from urllib.parse import urlparse
 
-from scrapers import behance, designfolio, notion, normal_scraper
+from scrapers import normal_scraper, site_builders
 from analysis import casestudies
+from utils.report_manifest import ReportManifest
 from utils.gemini_api import analyze_content
+from utils.http_cache import http_cache_stats, http_cache_stats_since
+from utils.fetch_scheduler import scheduler_stats, scheduler_stats_since
+from utils.helpers import dedupe_urls
+from utils.checkpoints import JobCheckpoints
+from utils.reanalysis import RunIndex
+from utils import render_client
 from utils.firebase_db import (
   save_portfolio_main_json,
   save_time_report,
@@ -21,10 +27,23 @@ def get_clean_filename(url):
     return domain or "portfolio"
 
 
-def extract_portfolio(url, platform, report_id=None, user_id=None):
+def _scrape_in_renderer(op, url):
+    """Browser-based portfolio scrape (render service when configured)."""
+    try:
+        return render_client.run(op, url)
+    except render_client.RenderError as e:
+        print(f"  ❌ Portfolio render failed: {e}")
+        return {'url': url, 'content': '', 'links': [], 'project_links': []}
+
+
+def extract_portfolio(url, platform, report_id=None, user_id=None, reanalyze=False):
     """
     Scrape portfolio → Send to Gemini → Save portfolio JSON → Extract project links → Analyze each project
 
+    With reanalyze, case studies whose extracted text is unchanged since
+    this user's last run on the portfolio keep their previous analysis
+    (see utils/reanalysis.py); they are listed in "reused_projects".
+
     Returns:
         {
             "success": True,
@@ -33,6 +52,7 @@ def extract_portfolio(url, platform, report_id=None, user_id=None):
             "analysis": {...},
             "project_links": [...],
             "project_reports_count": 0,
+            "reused_projects": [...],
             "time_report": {...}
         }
     """
@@ -47,18 +67,30 @@ def extract_portfolio(url, platform, report_id=None, user_id=None):
         "report_id": report_id
     }
     pipeline_start_time = time.perf_counter()
+    http_cache_start = http_cache_stats()
+    scheduler_start = scheduler_stats()
+    # Stages/projects finished by an interrupted earlier attempt of this job
+    checkpoints = JobCheckpoints(report_id)
+    # Per-project hashes of this run (and the last one, for reanalyze)
+    run_index = RunIndex(url, user_id, report_id=report_id, reuse=reanalyze)
+    timings['reanalyze'] = reanalyze
 
     print(f"📥 Extracting portfolio data from {platform}...")
     stage_start = time.perf_counter()
     # --------------------------
     # 1. SCRAPE BASED ON PLATFORM
     # --------------------------
-    if platform == "behance":
-      scraped_data = behance.extract(url)
+    scraped_data = checkpoints.restore("stage:scrape")
+    if scraped_data:
+      print("♻️ Scrape restored from checkpoint")
+    elif platform == "behance":
+      scraped_data = _scrape_in_renderer("portfolio_behance", url)
     elif platform == "designfolio":
-      scraped_data = designfolio.extract(url)
+      scraped_data = _scrape_in_renderer("portfolio_designfolio", url)
     elif platform == "notion":
-      scraped_data = notion.extract(url)
+      scraped_data = _scrape_in_renderer("portfolio_notion", url)
+    elif platform in site_builders.BUILDERS:
+      scraped_data = site_builders.extract(url, platform)
     else:
       scraped_data = normal_scraper.extract(url)
     timings['scraping_time_seconds'] = round(time.perf_counter() - stage_start, 2)
@@ -66,6 +98,8 @@ def extract_portfolio(url, platform, report_id=None, user_id=None):
 
     if not scraped_data:
       return {"success": False, "error": "Failed to scrape portfolio"}
+    if "scrape" not in checkpoints.restored_stages():
+      checkpoints.save("stage:scrape", scraped_data)
 
     print("✅ Portfolio data extracted\n")
     print("SCRAPED_DATA : \n\n",scraped_data,"\n\n")
@@ -152,21 +186,27 @@ Return ONLY valid JSON (no markdown, no descriptions). Use EXACTLY this format:
 """
 
 
-    try:
-      gemini_response = analyze_content(prompt, scraped_data)
-      timings['gemini_portfolio_analysis_seconds'] = round(time.perf_counter() - gemini_start, 2)
-      print(f"✅ Gemini analysis successful in {timings['gemini_portfolio_analysis_seconds']:.2f}s\n")
-      print("\n\n",gemini_response,"\n\n")
-    except Exception as e:
-      print(f"❌ Gemini failed: {e}")
-      return {"success": False, "error": "Gemini main analysis failed", "time_report": timings}
+    gemini_response = checkpoints.restore("stage:portfolio_analysis")
+    if gemini_response:
+      timings['gemini_portfolio_analysis_seconds'] = 0
+      print("♻️ Portfolio analysis restored from checkpoint\n")
+    else:
+      try:
+        gemini_response = analyze_content(prompt, scraped_data)
+        timings['gemini_portfolio_analysis_seconds'] = round(time.perf_counter() - gemini_start, 2)
+        print(f"✅ Gemini analysis successful in {timings['gemini_portfolio_analysis_seconds']:.2f}s\n")
+        print("\n\n",gemini_response,"\n\n")
+      except Exception as e:
+        print(f"❌ Gemini failed: {e}")
+        return {"success": False, "error": "Gemini main analysis failed", "time_report": timings}
+      checkpoints.save("stage:portfolio_analysis", gemini_response)
 
     # --------------------------
     # 3. SAVE MAIN REPORT
     # --------------------------
     save_start = time.perf_counter()
     filename = get_clean_filename(url)
-    main_json_path = f"backend/reports/{filename}_main_portfolio.json"
+    main_json_name = f"{filename}_main_portfolio.json"
 
     # Add type field for frontend identification
     portfolio_report = {
@@ -176,13 +216,8 @@ Return ONLY valid JSON (no markdown, no descriptions). Use EXACTLY this format:
       **gemini_response
     }
 
-    with open(main_json_path, "w", encoding="utf-8") as f:
-      json.dump(portfolio_report, f, indent=2, ensure_ascii=False)
-
-    print(f"📁 Main portfolio report saved: {main_json_path}\n")
-
-    # Upload main report to GCS
-    from utils.gcs_utils import upload_file_to_gcs
+    # Upload main report to GCS in the background, straight from memory
+    from utils.upload_queue import enqueue_json, upload_stats
     
     if report_id:
         gcs_folder = f"{report_id}/"
@@ -191,10 +226,13 @@ Return ONLY valid JSON (no markdown, no descriptions). Use EXACTLY this format:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         gcs_folder = f"{parent_slug}_{timestamp}/"
         
-    gcs_main_path = gcs_folder + os.path.basename(main_json_path)
-    gcs_main_url = upload_file_to_gcs(main_json_path, gcs_main_path)
+    gcs_main_path = gcs_folder + main_json_name
+    gcs_main_url = enqueue_json(portfolio_report, gcs_main_path, job=gcs_folder)
+    # Per-job manifest read by /reports; updated as each project completes
+    manifest = ReportManifest(gcs_folder, report_id=report_id)
+    manifest.set_portfolio(portfolio_report)
     timings['save_and_upload_main_report_seconds'] = round(time.perf_counter() - save_start, 2)
-    print(f"[GCS] Uploaded main report to: {gcs_main_url}")
+    print(f"[GCS] Queued main report upload: {gcs_main_url}")
 
     # Save main report in DB
     if report_id:
@@ -217,7 +255,20 @@ Return ONLY valid JSON (no markdown, no descriptions). Use EXACTLY this format:
         if isinstance(p, dict) and p.get("url")
     ]
 
-    project_links = list(dict.fromkeys(project_links))  # remove duplicates
+    # Links found by sitemap/crawl discovery (generic sites) are ranked
+    # already; Gemini's picks are appended after them.
+    discovered_links = (scraped_data.get('discovery') or {}).get('project_links') or []
+    if discovered_links:
+        print(f"🧭 Using {len(discovered_links)} discovered project links (+ Gemini suggestions)")
+        timings['discovered_project_links'] = len(discovered_links)
+    if scraped_data.get('discovery'):
+        timings['discovery_seconds'] = scraped_data['discovery'].get('seconds', 0)
+    project_links = discovered_links + project_links
+
+    # Same page spelled differently (slash, ?ref=, www., http) is analysed once
+    project_links, link_aliases = dedupe_urls(project_links)
+    if link_aliases:
+        timings['duplicate_links_merged'] = sum(len(v) for v in link_aliases.values())
     timings['project_links_extraction_seconds'] = round(time.perf_counter() - extract_start, 2)
     timings['total_project_links_found'] = len(project_links)
     print(f"✅ Found {len(project_links)} project links\n")
@@ -247,7 +298,11 @@ Return ONLY valid JSON (no markdown, no descriptions). Use EXACTLY this format:
     if project_links:
         print("📊 Analyzing individual projects...\n")
         projects_start = time.perf_counter()
-        project_reports_count, project_timings = casestudies.analyze_projects(project_links, url, gcs_folder, report_id=report_id, user_id=user_id)
+        project_reports_count, project_timings = casestudies.analyze_projects(
+            project_links, url, gcs_folder,
+            report_id=report_id, user_id=user_id, manifest=manifest, platform=platform,
+            aliases=link_aliases, checkpoints=checkpoints, run_index=run_index,
+        )
         timings['total_project_analysis_seconds'] = round(time.perf_counter() - projects_start, 2)
         timings['projects_analyzed'] = project_reports_count
         timings['per_project_timings'] = project_timings
@@ -259,7 +314,25 @@ Return ONLY valid JSON (no markdown, no descriptions). Use EXACTLY this format:
         timings['per_project_timings'] = []
 
     # --------------------------
-    # 6. CALCULATE TOTAL TIME & GENERATE REPORT
+    # 6. BACKGROUND UPLOADS
+    # --------------------------
+    # Uploads overlap with scraping/Gemini. The job's single barrier
+    # (flush_uploads) runs after the time report is queued, so its stats and
+    # failures cover every upload; the time report gets a snapshot.
+    for link in project_links:
+        run_index.keep_previous(link)
+    run_index.publish(gcs_folder)
+    timings['reused_projects'] = run_index.reused
+    manifest.mark_complete()
+    timings['uploads'] = upload_stats(gcs_folder)
+    # Process-wide counters; overlapping jobs share them
+    timings['http_cache'] = http_cache_stats_since(http_cache_start)
+    timings['host_queue'] = scheduler_stats_since(scheduler_start)
+    timings['restored_stages'] = checkpoints.restored_stages()
+    timings['restored_projects'] = checkpoints.restored_projects()
+
+    # --------------------------
+    # 7. CALCULATE TOTAL TIME & GENERATE REPORT
     # --------------------------
     total_pipeline_time = time.perf_counter() - pipeline_start_time
     timings['total_pipeline_time_seconds'] = round(total_pipeline_time, 2)
@@ -286,14 +359,45 @@ Return ONLY valid JSON (no markdown, no descriptions). Use EXACTLY this format:
     print(f"6. Total Project Analysis:       {timings['total_project_analysis_seconds']:.2f}s")
     print(f"   - Projects Found:             {timings['total_project_links_found']}")
     print(f"   - Projects Analyzed:          {timings['projects_analyzed']}")
+    if reanalyze:
+        print(f"   - Analyses Reused:            {len(timings['reused_projects'])}")
+    print(f"7. Uploads (overlapped):         {timings['uploads']['upload_seconds']:.2f}s "
+          f"({timings['uploads']['uploads']} files, {timings['uploads']['retries']} retries, "
+          f"{timings['uploads']['failed']} failed so far)")
+    print(f"   - Still Pending:              {timings['uploads']['pending']}")
+    print(f"8. HTTP Cache:                   {timings['http_cache']['hits']} hits, "
+          f"{timings['http_cache']['revalidated']} revalidated, {timings['http_cache']['misses']} misses")
+    print(f"9. Per-Host Queue Wait:")
+    for host, queue in sorted(timings['host_queue'].items(), key=lambda item: -item[1]['wait_seconds']):
+        print(f"   - {host[:30]:<30} {queue['wait_seconds']:.2f}s over {queue['requests']} requests"
+              + (f", {queue['throttled']} throttled" if queue['throttled'] else ""))
+    if timings['restored_stages'] or timings['restored_projects']:
+        print(f"♻️ Restored from checkpoint:      stages {', '.join(timings['restored_stages']) or 'none'}; "
+              f"{len(timings['restored_projects'])} projects")
     
     if project_timings:
         print("\n   Per-Project Breakdown:")
         for i, pt in enumerate(project_timings, 1):
             print(f"   {i}. {pt['project_name'][:50]}")
+            if pt.get('restored'):
+                print("      - Restored from checkpoint (not re-analysed)")
+                continue
+            if pt.get('status') == 'duplicate':
+                print(f"      - Duplicate of {pt['duplicate_of']} (scraped in {pt['scraping_seconds']:.2f}s, not re-analysed)")
+                continue
             print(f"      - Scraping:    {pt['scraping_seconds']:.2f}s")
+            if pt.get('host_wait_seconds'):
+                print(f"        (host queue wait {pt['host_wait_seconds']:.2f}s)")
             print(f"      - Screenshot:  {pt['screenshot_seconds']:.2f}s")
-            print(f"      - Gemini:      {pt['gemini_seconds']:.2f}s")
+            if pt.get('full_capture_seconds') is not None:
+                print(f"        (full page {pt['full_capture_seconds']:.2f}s, overlapped)")
+            shot_metrics = pt.get('screenshot_metrics') or {}
+            compression = shot_metrics.get('compression')
+            if compression:
+                print(f"        (encode {compression['encode_seconds']:.2f}s, "
+                      f"saved {compression['bytes_saved'] / 1024:.0f} KB, {compression['format']}, "
+                      f"{shot_metrics.get('capture_mode')}, peak RSS {shot_metrics.get('peak_rss_mb')} MB)")
+            print(f"      - Gemini:      {pt['gemini_seconds']:.2f}s" + (" (previous analysis reused)" if pt.get('reused') else ""))
             print(f"      - Save/Upload: {pt['save_upload_seconds']:.2f}s")
             print(f"      - Total:       {pt['total_seconds']:.2f}s")
     
@@ -303,17 +407,13 @@ Return ONLY valid JSON (no markdown, no descriptions). Use EXACTLY this format:
     print("="*70 + "\n")
     
     # --------------------------
-    # 7. SAVE TIME REPORT TO GCS
+    # 8. SAVE TIME REPORT TO GCS
     # --------------------------
+    # Flushed by the caller before the job is marked complete.
     time_report_filename = f"{timings['user_identifier']}_time_report.json"
-    time_report_path = f"backend/reports/{time_report_filename}"
-    
-    with open(time_report_path, "w", encoding="utf-8") as f:
-        json.dump(timings, f, indent=2, ensure_ascii=False)
-    
     gcs_time_report_path = gcs_folder + time_report_filename
-    gcs_time_report_url = upload_file_to_gcs(time_report_path, gcs_time_report_path)
-    print(f"📊 Time report saved to GCS: {gcs_time_report_url}\n")
+    gcs_time_report_url = enqueue_json(timings, gcs_time_report_path, job=gcs_folder)
+    print(f"📊 Time report queued for GCS: {gcs_time_report_url}\n")
 
     # Save time report in DB
     if report_id:
@@ -323,7 +423,7 @@ Return ONLY valid JSON (no markdown, no descriptions). Use EXACTLY this format:
         pass
 
     # --------------------------
-    # 8. RETURN FINAL RESULT
+    # 9. RETURN FINAL RESULT
     # --------------------------
     return {
       "success": True,
@@ -331,7 +431,9 @@ Return ONLY valid JSON (no markdown, no descriptions). Use EXACTLY this format:
       "structured_content": gemini_response.get("structured_content", {}),
       "analysis": gemini_response.get("analysis", {}),
       "project_links": project_links,
+      "reused_projects": run_index.reused,
       "project_reports_count": project_reports_count,
       "time_report": timings,
-      "time_report_url": gcs_time_report_url
+      "time_report_url": gcs_time_report_url,
+      "upload_job": gcs_folder
     }
@@ -0,0 +1,11 @@
+"""
+Gunicorn hooks for the web tier (see start.sh)
+
+The analysis job queue runs worker threads, so it is started in each
+gunicorn worker after the fork rather than when app.py is imported.
+"""
+
+
+def post_fork(server, worker):
+    from app import job_queue
+    job_queue.start()
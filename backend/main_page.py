@@ -3,19 +3,22 @@ Identifies platform type and routes to appropriate scraper
 Updated to support new portfolio-level JSON structure (structured_content + analysis)
 """
 
-import os
 from final import extract_portfolio
+from scrapers.site_builders import builder_for_url
+from scrapers.platform_probe import probe_platform
 
 
 def identify_platform(url):
     """
-    Determine the platform type from URL.
+    Determine the platform type from URL, falling back to a one-request
+    fingerprint probe (cached per domain) for custom domains.
 
     Args:
         url (str): Portfolio URL
 
     Returns:
-        str: Platform type (behance, designfolio, notion, or other)
+        str: Platform type (behance, designfolio, notion, framer, webflow,
+             wix, squarespace, or other)
     """
     url_lower = url.lower()
 
@@ -26,10 +29,10 @@ def identify_platform(url):
     elif "notion.site" in url_lower or "notion.so" in url_lower:
         return "notion"
     else:
-        return "other"
+        return builder_for_url(url) or probe_platform(url)
 
 
-def process_main_url(url, report_id=None, user_id=None):
+def process_main_url(url, report_id=None, user_id=None, reanalyze=False):
     """
     Main processing function:
     - Identify platform
@@ -40,6 +43,7 @@ def process_main_url(url, report_id=None, user_id=None):
     Args:
         url (str): Portfolio URL to analyze
         report_id (str): Optional UUID for GCS folder
+        reanalyze (bool): Reuse unchanged case-study analyses from the user's last run
 
     Returns:
         dict: {
@@ -56,13 +60,9 @@ def process_main_url(url, report_id=None, user_id=None):
     platform = identify_platform(url)
     print(f"✅ Platform detected: {platform.upper()}\n")
 
-    # Ensure report folders exist
-    os.makedirs("backend/reports", exist_ok=True)
-    os.makedirs("backend/reports/screenshots", exist_ok=True)
-
     # Call final.py (your main orchestrator)
     print("📥 Extracting portfolio data...")
-    result = extract_portfolio(url, platform, report_id, user_id=user_id)
+    result = extract_portfolio(url, platform, report_id, user_id=user_id, reanalyze=reanalyze)
 
     # result must now return:
     # {
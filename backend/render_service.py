@@ -0,0 +1,241 @@
+"""
+Render service: runs browser work outside the web/job process
+
+    python render_service.py
+
+Listens on RENDER_SERVICE_ADDRESS (see utils/render_client.py) and executes
+the ops in RENDER_OPS in a pool of RENDER_WORKERS worker processes. Each
+worker runs in its own process group together with the Chromium it starts,
+so a crashing or runaway page only takes down that worker:
+
+- a worker that dies mid-op fails that op and is replaced;
+- an op that exceeds its timeout has its process group killed;
+- a watchdog kills any worker whose group RSS (Python + Chromium) goes over
+  RENDER_WORKER_MAX_RSS_MB;
+- workers are recycled after RENDER_WORKER_MAX_TASKS ops.
+
+Callers fall back to rendering in-process when the service is down.
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing.connection import Listener
+
+os.environ.setdefault("RENDER_SERVICE_ADDRESS", "/tmp/portfolio-render.sock")
+
+from utils.render_client import (  # noqa: E402  (address default must be set first)
+    RENDER_SERVICE_ADDRESS,
+    RENDER_SERVICE_AUTHKEY,
+    parse_address,
+    resolve_op,
+)
+
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", "2"))
+RENDER_WORKER_MAX_TASKS = int(os.environ.get("RENDER_WORKER_MAX_TASKS", "25"))
+RENDER_WORKER_MAX_RSS_BYTES = int(os.environ.get("RENDER_WORKER_MAX_RSS_MB", "1536")) * 1024 * 1024
+RENDER_WATCHDOG_SECONDS = 2.0
+WORKER_SHUTDOWN_SECONDS = 5
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+# ---------------------------------------
+# WORKER PROCESS
+# ---------------------------------------
+
+def _worker_main(conn):
+    # Own process group: Chromium children can be killed together with us
+    os.setsid()
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        op, args, kwargs = message
+        try:
+            conn.send(("ok", resolve_op(op)(*args, **kwargs)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def group_rss_bytes(pgid):
+    """Resident memory of every process in a process group (Linux /proc)."""
+    total = 0
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            if int(fields[2]) != pgid:
+                continue
+            with open(f"/proc/{name}/statm") as f:
+                total += int(f.read().split()[1]) * _PAGE_SIZE
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+
+class _Worker:
+    def __init__(self, ctx, index):
+        self.index = index
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), name=f"render-worker-{index}", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+        self.busy = False
+        self.kill_reason = None
+
+    def kill(self, reason):
+        self.kill_reason = self.kill_reason or reason
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            self.process.kill()
+        self.process.join(WORKER_SHUTDOWN_SECONDS)
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(WORKER_SHUTDOWN_SECONDS)
+        # Reap any Chromium left in the group
+        self.kill("shutdown")
+
+
+# ---------------------------------------
+# SUPERVISOR
+# ---------------------------------------
+
+class RenderPool:
+    """Fixed set of worker processes; one op per worker at a time."""
+
+    def __init__(self, size=RENDER_WORKERS):
+        # spawn: workers must not inherit the supervisor's threads/locks
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._workers = {}
+        self._lock = threading.Lock()
+        for i in range(max(1, size)):
+            self._idle.put(self._spawn(i))
+        threading.Thread(target=self._watchdog, name="render-watchdog", daemon=True).start()
+
+    def _spawn(self, index):
+        worker = _Worker(self._ctx, index)
+        with self._lock:
+            self._workers[index] = worker
+        return worker
+
+    def _replace(self, worker):
+        return self._spawn(worker.index)
+
+    def execute(self, op, args, kwargs, timeout):
+        """Run one op on an idle worker; `timeout` covers the wait for a worker too."""
+        started = time.perf_counter()
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            print(f"  🖥️  {op} rejected: no idle worker for {timeout:.0f}s")
+            return ("error", "render pool busy")
+        timeout = max(1.0, timeout - (time.perf_counter() - started))
+        worker.busy = True
+        try:
+            worker.conn.send((op, args, kwargs))
+            if worker.conn.poll(timeout):
+                reply = worker.conn.recv()
+            else:
+                worker.kill(f"timed out after {timeout:.0f}s")
+                reply = ("error", worker.kill_reason)
+        except (EOFError, OSError):
+            reply = ("error", f"render worker {worker.kill_reason or 'crashed'}")
+        finally:
+            worker.busy = False
+            worker.tasks += 1
+
+        if not worker.process.is_alive() or worker.kill_reason:
+            print(f"💥 render-worker-{worker.index} lost ({worker.kill_reason or 'crashed'}) during {op}, replacing")
+            worker = self._replace(worker)
+        elif worker.tasks >= RENDER_WORKER_MAX_TASKS:
+            worker.stop()
+            worker = self._replace(worker)
+        self._idle.put(worker)
+        print(f"  🖥️  {op} {reply[0]} in {time.perf_counter() - started:.2f}s")
+        return reply
+
+    def _watchdog(self):
+        while True:
+            time.sleep(RENDER_WATCHDOG_SECONDS)
+            with self._lock:
+                workers = list(self._workers.values())
+            for worker in workers:
+                if not worker.busy or not worker.process.is_alive():
+                    continue
+                rss = group_rss_bytes(worker.process.pid)
+                if rss > RENDER_WORKER_MAX_RSS_BYTES:
+                    worker.kill(f"killed at {rss // (1024 * 1024)} MB (memory limit)")
+
+    def shutdown(self):
+        with self._lock:
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker.stop()
+
+
+# ---------------------------------------
+# SERVER
+# ---------------------------------------
+
+def _serve_connection(pool, conn):
+    try:
+        op, args, kwargs, timeout = conn.recv()
+        conn.send(pool.execute(op, args, kwargs, timeout))
+    except (EOFError, OSError):
+        pass
+    except Exception as e:
+        try:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        except OSError:
+            pass
+    finally:
+        conn.close()
+
+
+def main():
+    address = parse_address(RENDER_SERVICE_ADDRESS)
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)  # stale socket from a previous run
+
+    # Ops started by the workers must run locally, never re-enter the service
+    os.environ["RENDER_SERVICE_WORKER"] = "1"
+    pool = RenderPool()
+
+    def _stop(signum, frame):
+        pool.shutdown()
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    with Listener(address, authkey=RENDER_SERVICE_AUTHKEY) as listener:
+        if isinstance(address, str):
+            os.chmod(address, 0o600)
+        print(f"🖥️  Render service listening on {RENDER_SERVICE_ADDRESS} ({RENDER_WORKERS} workers)")
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError) as e:
+                # Failed handshake (wrong authkey, client went away)
+                print(f"⚠️  Render service rejected a connection: {e}")
+                continue
+            threading.Thread(target=_serve_connection, args=(pool, conn), daemon=True).start()
+
+
+if __name__ == "__main__":
+    main()
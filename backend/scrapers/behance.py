@@ -3,10 +3,12 @@ Behance portfolio scraper using Playwright
 """
 import os
 import re
-import requests
-from urllib.parse import urljoin
+from utils.http_client import http_get
+from utils.fetch_scheduler import host_slot, note_response
 from playwright.sync_api import sync_playwright, TimeoutError
 
+from scrapers.dom_extract import extract_dom
+
 def extract_username_from_url(url):
     """Extract Behance username from URL"""
     # https://www.behance.net/username
@@ -24,12 +26,9 @@ def try_behance_api(url):
         
         # Behance API endpoint (public)
         api_url = f"https://www.behance.net/v2/users/{username}?api_key=u_n_public"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Referer': 'https://www.behance.net/',
-        }
+        headers = {'Referer': 'https://www.behance.net/'}
         
-        response = requests.get(api_url, headers=headers, timeout=15)
+        response = http_get(api_url, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
@@ -37,7 +36,7 @@ def try_behance_api(url):
             
             # Get user's projects
             projects_url = f"https://www.behance.net/v2/users/{username}/projects?api_key=u_n_public"
-            projects_response = requests.get(projects_url, headers=headers, timeout=15)
+            projects_response = http_get(projects_url, headers=headers)
             
             project_links = []
             if projects_response.status_code == 200:
@@ -171,17 +170,16 @@ def extract(url):
 
             print(f"  🌐 Loading page...")
             
-            # Add random delay before navigation to seem more human
-            page.wait_for_timeout(1000 + (hash(url) % 2000))
-            
-            response = page.goto(url, wait_until="domcontentloaded", timeout=60000)
+            # The host slot spaces requests to Behance across all jobs
+            with host_slot(url):
+                response = page.goto(url, wait_until="domcontentloaded", timeout=60000)
             print(f"  📡 Response: {response.status if response else 'None'}")
             
-            # If we got blocked, wait and try again with different strategy
-            if response and response.status == 403:
-                print(f"  ⚠️  Got 403, retrying with different approach...")
-                page.wait_for_timeout(3000)
-                response = page.goto(url, wait_until="load", timeout=60000)
+            # If we got blocked, cool the host down (Retry-After aware) and try again
+            if response and note_response(url, response.status, response.headers):
+                print(f"  ⚠️  Got {response.status}, retrying with different approach...")
+                with host_slot(url):
+                    response = page.goto(url, wait_until="load", timeout=60000)
                 print(f"  📡 Retry Response: {response.status if response else 'None'}")
             
             # Longer wait for dynamic content + scroll to trigger lazy loading
@@ -207,34 +205,13 @@ def extract(url):
                 html_content = page.content()
                 print(f"  📄 Retry HTML length: {len(html_content)} chars")
 
-            anchors = page.locator("a")
-            count = anchors.count()
-            links_list = []
-            project_links = []
-
-            print(f"  📊 Found {count} anchor tags")
-
-            for i in range(min(count, 500)):
-                try:
-                    text = anchors.nth(i).inner_text().strip()
-                    href = anchors.nth(i).get_attribute("href")
+            # Links and text in a single evaluate (no per-anchor round trips)
+            dom = extract_dom(page, skip=(), max_links=500, max_text_chars=5000)
+            links_list = dom['links']
+            project_links = [l['href'] for l in links_list if '/gallery/' in l['href']]
+            full_text = dom['text']
 
-                    if not href:
-                        continue
-
-                    absolute_url = urljoin(url, href)
-                    links_list.append({"text": text, "href": absolute_url})
-
-                    if '/gallery/' in absolute_url:
-                        project_links.append(absolute_url)
-
-                except Exception:
-                    continue
-
-            try:
-                full_text = page.inner_text("body")
-            except Exception:
-                full_text = ""
+            print(f"  📊 Found {dom['images']['total']} images, {len(links_list)} links")
 
             context.close()
             browser.close()
@@ -4,6 +4,11 @@ Designfolio portfolio scraper using Playwright
 import json
 from playwright.sync_api import sync_playwright
 
+from utils.fetch_scheduler import host_slot
+from utils.http_cache import stream_get
+from utils.html_extract import HtmlExtractor, BASIC_SKIP_TAGS
+from scrapers.dom_extract import extract_dom
+
 def find_projects_recursive(obj):
     """Recursively search for 'projects' key in nested JSON"""
     if isinstance(obj, dict):
@@ -20,34 +25,71 @@ def find_projects_recursive(obj):
                 return result
     return None
 
+def project_links_from_next_data(url, next_json):
+    projects = find_projects_recursive(next_json)
+    project_links = []
+    if projects:
+        for proj in projects:
+            if "_id" in proj:
+                project_links.append(f"{url.rstrip('/')}/project/{proj['_id']}")
+    return project_links
+
+def extract_static(url):
+    """Read the server-rendered __NEXT_DATA__ without a browser; None if unusable"""
+    try:
+        extractor = HtmlExtractor(
+            base_url=url,
+            skip_tags=BASIC_SKIP_TAGS,
+            max_text_chars=5000,
+            capture_scripts=("__NEXT_DATA__",),
+        )
+        fetched = stream_get(url, extractor.feed)
+        if fetched['status_code'] >= 400:
+            return None
+        extracted = extractor.close()
+        script_data = extracted['scripts'].get("__NEXT_DATA__")
+        if not script_data:
+            return None
+        project_links = project_links_from_next_data(url, json.loads(script_data))
+        if not project_links:
+            return None
+        return {
+            'url': url,
+            'content': extracted['text'][:5000],
+            'links': [],
+            'project_links': project_links
+        }
+    except Exception as e:
+        print(f"  ⚠️  Static Designfolio parse failed: {e}")
+        return None
+
 def extract(url):
     """Extract projects from Designfolio portfolio"""
     print(f"  📱 Scraping Designfolio: {url}")
 
+    # The page is server-rendered Next.js: try the static HTML first
+    static = extract_static(url)
+    if static:
+        print(f"  ✅ Parsed __NEXT_DATA__ statically ({len(static['project_links'])} projects)")
+        return static
+
     try:
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=True)
             page = browser.new_page()
-            page.goto(url, wait_until="domcontentloaded", timeout=60000)
+            with host_slot(url):
+                page.goto(url, wait_until="domcontentloaded", timeout=60000)
 
             for _ in range(10):
                 page.mouse.wheel(0, 3000)
                 page.wait_for_timeout(300)
 
             try:
-                script_data = page.locator("script#__NEXT_DATA__").inner_text()
-                next_json = json.loads(script_data)
-                projects = find_projects_recursive(next_json)
-
-                project_links = []
-                if projects:
-                    for proj in projects:
-                        if "_id" in proj:
-                            project_url = f"{url.rstrip('/')}/project/{proj['_id']}"
-                            project_links.append(project_url)
-
-                content = page.inner_text("body")
+                dom = extract_dom(page, skip=(), max_links=0, max_text_chars=5000, scripts=("__NEXT_DATA__",))
                 browser.close()
+                next_json = json.loads(dom['scripts']["__NEXT_DATA__"])
+                project_links = project_links_from_next_data(url, next_json)
+                content = dom['text']
 
                 return {
                     'url': url,
@@ -0,0 +1,266 @@
+"""
+Case-study discovery for generic portfolio sites
+
+Reads robots.txt and the sitemap(s), then runs a bounded, parallel,
+same-domain crawl from the portfolio URL. Every URL seen is scored with
+path heuristics (/work/<slug>, /case-study/..., /projects/...) and, for
+crawled pages, content heuristics (length, headings, UX process keywords).
+The ranked list goes straight to analyze_projects, no LLM needed.
+"""
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse, urldefrag
+from urllib.robotparser import RobotFileParser
+from xml.etree import ElementTree
+
+from utils.http_client import http_get, DEFAULT_HEADERS
+from utils.http_cache import stream_get
+from utils.html_extract import HtmlExtractor, BASIC_SKIP_TAGS
+from utils.helpers import normalize_url
+
+DISCOVERY_MAX_PAGES = int(os.environ.get("DISCOVERY_MAX_PAGES", "30"))
+DISCOVERY_MAX_DEPTH = 2
+DISCOVERY_WORKERS = int(os.environ.get("DISCOVERY_WORKERS", "6"))
+DISCOVERY_TIME_BUDGET_SECONDS = float(os.environ.get("DISCOVERY_TIME_BUDGET_SECONDS", "20"))
+MAX_SITEMAPS = 5
+MAX_SITEMAP_URLS = 500
+MAX_PROJECTS = 20
+MIN_PROJECT_SCORE = 3.0
+
+# Path segments that introduce case studies / that list them
+PROJECT_SEGMENTS = {
+    "work", "works", "case-study", "case-studies", "casestudy", "casestudies",
+    "project", "projects", "portfolio", "cases", "case",
+}
+NEGATIVE_SEGMENTS = {
+    "about", "contact", "blog", "posts", "tag", "tags", "category", "categories",
+    "resume", "cv", "privacy", "terms", "login", "signin", "signup", "cart",
+    "search", "feed", "rss", "author", "services", "pricing", "faq",
+}
+SKIP_EXTENSIONS = re.compile(
+    r"\.(pdf|jpe?g|png|gif|webp|svg|avif|mp4|mov|webm|zip|css|js|json|xml|ico|woff2?|ttf)$",
+    re.IGNORECASE,
+)
+PROCESS_KEYWORDS = (
+    "problem", "research", "persona", "wireframe", "prototype", "usability",
+    "user flow", "journey", "insight", "iteration", "outcome", "my role", "process",
+)
+
+
+def _same_site(url, host):
+    return (urlparse(url).hostname or "").lower().removeprefix("www.") == host
+
+
+def _clean(url):
+    return normalize_url(urldefrag(url)[0])
+
+
+def _segments(url):
+    return [s for s in urlparse(url).path.lower().split("/") if s]
+
+
+def score_path(url):
+    """Path-only score plus whether the URL looks like a project listing (hub)."""
+    segments = _segments(url)
+    if not segments:
+        return 0.0, False, []
+    reasons = []
+    score = 0.0
+    if any(s in NEGATIVE_SEGMENTS for s in segments):
+        return -3.0, False, ["negative path"]
+
+    hub = segments[-1] in PROJECT_SEGMENTS
+    for segment in segments[:-1]:
+        if segment in PROJECT_SEGMENTS:
+            score += 3
+            reasons.append(f"/{segment}/<slug>")
+            break
+    if any(k in segments[-1] for k in ("case-study", "casestudy")):
+        score += 2
+        reasons.append("case-study slug")
+    if len(segments) > 4:
+        score -= 1
+    return score, hub, reasons
+
+
+def score_content(extracted):
+    score = 0.0
+    reasons = []
+    if extracted['text_length'] > 1500:
+        score += 2
+        reasons.append("long text")
+    elif extracted['text_length'] < 300:
+        score -= 1
+    if len(extracted['headings']) >= 3:
+        score += 1
+        reasons.append("structured headings")
+    if extracted['images']['total'] >= 3:
+        score += 0.5
+    haystack = (extracted['text'] + " " + " ".join(h['text'] for h in extracted['headings'])).lower()
+    hits = [k for k in PROCESS_KEYWORDS if k in haystack]
+    if hits:
+        score += min(3, len(hits))
+        reasons.append("keywords: " + ", ".join(hits[:3]))
+    return score, reasons
+
+
+# ---------------------------------------
+# ROBOTS / SITEMAPS
+# ---------------------------------------
+
+def load_robots(root):
+    parser = RobotFileParser()
+    try:
+        response = http_get(urljoin(root, "/robots.txt"))
+        if response.status_code >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+    except Exception:
+        parser.allow_all = True
+    return parser
+
+
+def _sitemap_locs(xml_bytes):
+    root = ElementTree.fromstring(xml_bytes)
+    tag = root.tag.rsplit("}", 1)[-1]
+    locs = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+    return tag, locs
+
+
+def read_sitemaps(root, robots, host):
+    """Page URLs from the site's sitemaps (follows one level of sitemap index)."""
+    queue = list(robots.site_maps() or []) or [urljoin(root, "/sitemap.xml")]
+    seen, urls = set(), []
+    while queue and len(seen) < MAX_SITEMAPS and len(urls) < MAX_SITEMAP_URLS:
+        sitemap = queue.pop(0)
+        if sitemap in seen:
+            continue
+        seen.add(sitemap)
+        try:
+            response = http_get(sitemap)
+            if response.status_code >= 400:
+                continue
+            kind, locs = _sitemap_locs(response.content)
+        except Exception:
+            continue
+        if kind == "sitemapindex":
+            queue.extend(locs)
+        else:
+            urls.extend(_clean(u) for u in locs if _same_site(u, host))
+    return urls[:MAX_SITEMAP_URLS]
+
+
+# ---------------------------------------
+# CRAWL
+# ---------------------------------------
+
+def _fetch_page(url):
+    extractor = HtmlExtractor(base_url=url, skip_tags=BASIC_SKIP_TAGS, max_links=300, max_text_chars=3000)
+    fetched = stream_get(url, extractor.feed, max_bytes=2 * 1024 * 1024)
+    if fetched['status_code'] >= 400:
+        return None
+    return extractor.close()
+
+
+def discover_projects(url, max_pages=DISCOVERY_MAX_PAGES, time_budget=DISCOVERY_TIME_BUDGET_SECONDS):
+    """
+    Find likely case-study URLs on a generic portfolio site.
+
+    Returns {"project_links": [ranked urls], "candidates": [...], "pages_crawled",
+    "sitemap_urls", "seconds"}.
+    """
+    start = time.perf_counter()
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower().removeprefix("www.")
+    root = f"{parsed.scheme or 'https'}://{parsed.netloc}/"
+    home = _clean(url)
+    user_agent = DEFAULT_HEADERS["User-Agent"]
+
+    robots = load_robots(root)
+    sitemap_urls = read_sitemaps(root, robots, host)
+
+    # url -> {"score", "reasons", "depth", "hub", "crawled", "in_sitemap", "from_hub"}
+    known = {}
+
+    def note(link, depth, in_sitemap=False, from_hub=False):
+        link = _clean(link)
+        if not _same_site(link, host) or SKIP_EXTENSIONS.search(urlparse(link).path):
+            return
+        entry = known.get(link)
+        if entry is None:
+            score, hub, reasons = score_path(link)
+            entry = known[link] = {
+                "score": score, "reasons": reasons, "depth": depth, "hub": hub,
+                "crawled": False, "in_sitemap": False, "from_hub": False,
+            }
+        entry["depth"] = min(entry["depth"], depth)
+        entry["in_sitemap"] |= in_sitemap
+        if from_hub and not entry["from_hub"]:
+            entry["from_hub"] = True
+            entry["score"] += 1
+            entry["reasons"].append("linked from project listing")
+
+    note(home, 0)
+    for link in sitemap_urls:
+        note(link, 1, in_sitemap=True)
+
+    def next_batch(size):
+        pending = [
+            (u, e) for u, e in known.items()
+            if not e["crawled"] and e["depth"] <= DISCOVERY_MAX_DEPTH
+            and e["score"] > -3 and robots.can_fetch(user_agent, u)
+        ]
+        # Home first, then listings, then the most promising candidates
+        pending.sort(key=lambda item: (item[0] != home, not item[1]["hub"], -item[1]["score"], item[1]["depth"]))
+        return [u for u, _ in pending[:size]]
+
+    crawled = 0
+    with ThreadPoolExecutor(max_workers=max(1, DISCOVERY_WORKERS)) as pool:
+        while crawled < max_pages and time.perf_counter() - start < time_budget:
+            batch = next_batch(min(DISCOVERY_WORKERS, max_pages - crawled))
+            if not batch:
+                break
+            for page_url in batch:
+                known[page_url]["crawled"] = True
+            results = list(pool.map(_safe_fetch, batch))
+            crawled += len(batch)
+            for page_url, extracted in zip(batch, results):
+                if extracted is None:
+                    continue
+                entry = known[page_url]
+                content_score, reasons = score_content(extracted)
+                if page_url != home and not entry["hub"]:
+                    entry["score"] += content_score
+                    entry["reasons"].extend(reasons)
+                for link in extracted['links']:
+                    note(link['href'], entry["depth"] + 1, from_hub=entry["hub"])
+
+    candidates = sorted(
+        (
+            {"url": u, "score": round(e["score"], 1), "reasons": e["reasons"], "crawled": e["crawled"]}
+            for u, e in known.items()
+            if u != home and not e["hub"] and e["score"] >= MIN_PROJECT_SCORE
+        ),
+        key=lambda c: -c["score"],
+    )
+    seconds = round(time.perf_counter() - start, 2)
+    print(f"  🧭 Discovery: {crawled} pages crawled, {len(sitemap_urls)} sitemap URLs, "
+          f"{len(candidates)} case-study candidates ({seconds:.2f}s)")
+    return {
+        "project_links": [c["url"] for c in candidates[:MAX_PROJECTS]],
+        "candidates": candidates[:MAX_PROJECTS],
+        "pages_crawled": crawled,
+        "sitemap_urls": len(sitemap_urls),
+        "seconds": seconds,
+    }
+
+
+def _safe_fetch(url):
+    try:
+        return _fetch_page(url)
+    except Exception as e:
+        print(f"    ⚠️  Discovery fetch failed for {url}: {e}")
+        return None
@@ -0,0 +1,125 @@
+"""
+Bulk in-page extraction for browser-based scrapers
+
+Everything a scraper needs from a rendered page (links, headings, visible
+text, meta tags, image stats, selected inline scripts) is collected by one
+`page.evaluate` call and returned in a single structured-clone transfer,
+instead of one Chromium round trip per element.
+"""
+from utils.html_extract import SCRAPE_TEXT_BUDGET
+
+# Same exclusions as the static extractor's project mode
+CHROME_TAGS = ["script", "style", "noscript", "template", "nav", "footer", "header"]
+BASIC_TAGS = ["script", "style", "noscript", "template"]
+
+EXTRACT_JS = """
+(opts) => {
+    const squash = (s) => (s || "").replace(/\\s+/g, " ").trim();
+    const skip = new Set(opts.skip.map((t) => t.toUpperCase()));
+    const body = document.body || document.documentElement;
+
+    // Visible text: innerText when nothing is excluded, else a filtered walk
+    let text = "";
+    let textLength = 0;
+    if (!skip.size) {
+        const all = body ? body.innerText || "" : "";
+        textLength = all.length;
+        text = all.slice(0, opts.maxText);
+    } else if (body) {
+        const walker = document.createTreeWalker(body, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT, {
+            acceptNode: (node) => {
+                if (node.nodeType === Node.TEXT_NODE) return NodeFilter.FILTER_ACCEPT;
+                return skip.has(node.tagName) ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_SKIP;
+            },
+        });
+        const parts = [];
+        let kept = 0;
+        while (walker.nextNode()) {
+            const piece = walker.currentNode.nodeValue.trim();
+            if (!piece) continue;
+            textLength += piece.length + (textLength ? 1 : 0);
+            if (kept < opts.maxText) {
+                parts.push(piece);
+                kept += piece.length + 1;
+            }
+        }
+        text = parts.join(" ").slice(0, opts.maxText);
+    }
+
+    const headings = [];
+    for (const h of document.querySelectorAll("h1, h2, h3, h4")) {
+        const t = squash(h.innerText);
+        if (t) headings.push({ level: h.tagName.toLowerCase(), text: t });
+        if (headings.length >= 200) break;
+    }
+
+    const links = [];
+    for (const a of document.querySelectorAll("a[href]")) {
+        if (links.length >= opts.maxLinks) break;
+        const href = a.href;
+        if (href && href.startsWith("http")) links.push({ text: squash(a.innerText), href });
+    }
+
+    const meta = {};
+    for (const m of document.querySelectorAll("meta[name], meta[property]")) {
+        const key = (m.getAttribute("name") || m.getAttribute("property")).toLowerCase();
+        if (!(key in meta)) meta[key] = m.getAttribute("content") || "";
+    }
+
+    const imgs = document.images;
+    let withAlt = 0, loaded = 0;
+    for (const img of imgs) {
+        if (img.alt) withAlt++;
+        if (img.complete && img.naturalWidth) loaded++;
+    }
+
+    const scripts = {};
+    for (const id of opts.scripts) {
+        const el = document.getElementById(id);
+        if (el) scripts[id] = el.textContent;
+    }
+
+    const h1 = headings.find((h) => h.level === "h1");
+    return {
+        title: squash(document.title),
+        first_h1: h1 ? h1.text : "",
+        meta_description: meta["description"] || "",
+        meta,
+        headings,
+        text,
+        text_length: textLength,
+        text_truncated: textLength > text.length,
+        links,
+        images: { total: imgs.length, with_alt: withAlt, loaded },
+        scripts,
+    };
+}
+"""
+
+
+def extract_dom(page, skip=CHROME_TAGS, max_links=500, max_text_chars=SCRAPE_TEXT_BUDGET, scripts=()):
+    """Run the bulk extraction in `page`; one IPC round trip."""
+    return page.evaluate(EXTRACT_JS, {
+        "skip": list(skip),
+        "maxLinks": max_links,
+        "maxText": max_text_chars,
+        "scripts": list(scripts),
+    })
+
+
+def dom_to_project_scrape(url, dom, prefer_h1=False):
+    """Shape an extract_dom() result like the project scrapers' return value."""
+    if prefer_h1:
+        title = dom['first_h1'] or dom['title']
+    else:
+        title = dom['title'] or dom['first_h1']
+    return {
+        'url': url,
+        'title': title,
+        'meta_description': dom['meta_description'],
+        'headings': dom['headings'],
+        'text_content': dom['text'],
+        'full_text_length': dom['text_length'],
+        'text_truncated': dom['text_truncated'],
+        'total_images': dom['images']['total'],
+    }
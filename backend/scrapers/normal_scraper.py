@@ -1,42 +1,37 @@
 """
 Generic web scraper for non-specific platforms
 """
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from utils.http_cache import stream_get
+from utils.html_extract import HtmlExtractor, BASIC_SKIP_TAGS
+from scrapers.discovery import discover_projects
 
 def extract(url):
-    """Extract content from generic webpage using BeautifulSoup"""
+    """Extract content from generic webpage (single-pass HTML extraction)"""
     print(f"  🌐 Scraping generic website: {url}")
 
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        for script in soup(["script", "style", "meta", "link"]):
-            script.decompose()
-
-        text = soup.get_text()
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text_content = ' '.join(chunk for chunk in chunks if chunk)
-
-        links = []
-        for link in soup.find_all('a'):
-            href = link.get('href')
-            if href:
-                absolute_url = urljoin(url, href)
-                if absolute_url.startswith('http'):
-                    links.append({'text': link.get_text(strip=True), 'href': absolute_url})
+        extractor = HtmlExtractor(base_url=url, skip_tags=BASIC_SKIP_TAGS, max_links=100, max_text_chars=5000)
+        fetched = stream_get(url, extractor.feed)
+        if fetched['status_code'] >= 400:
+            raise Exception(f"HTTP {fetched['status_code']}")
+
+        extracted = extractor.close()
+        text_content = extracted['text']
+        links = extracted['links']
+
+        # Sitemap + bounded crawl; never fail the scrape because of it
+        try:
+            discovery = discover_projects(url)
+        except Exception as e:
+            print(f"  ⚠️  Project discovery failed: {e}")
+            discovery = {'project_links': [], 'candidates': []}
 
         return {
             'url': url,
             'content': text_content[:5000],
             'links': links[:100],
-            'project_links': []
+            'project_links': discovery['project_links'],
+            'discovery': discovery,
         }
 
     except Exception as e:
@@ -4,14 +4,12 @@ Notion portfolio scraper using Playwright
 from playwright.sync_api import sync_playwright, TimeoutError
 import time
 
+from utils.fetch_scheduler import host_slot, note_response
+from scrapers.dom_extract import extract_dom
+
 def extract_links(page):
     """Extract all anchor links from page"""
-    return page.evaluate("""
-        () => [...document.querySelectorAll("a")].map(a => ({
-            text: a.innerText.trim(),
-            href: a.href
-        }))
-    """)
+    return extract_dom(page, skip=(), max_text_chars=0)['links']
 
 def extract(url):
     """Extract content from Notion portfolio page"""
@@ -65,8 +63,11 @@ def extract(url):
 
             try:
                 print(f"  🌐 Loading Notion page...")
-                response = page.goto(url, wait_until="domcontentloaded", timeout=60000)
+                with host_slot(url):
+                    response = page.goto(url, wait_until="domcontentloaded", timeout=60000)
                 print(f"  📡 Response: {response.status if response else 'None'}")
+                if response:
+                    note_response(url, response.status, response.headers)
             except TimeoutError:
                 print("  ⚠️  Timeout during load, continuing...")
 
@@ -84,8 +85,9 @@ def extract(url):
             html_content = page.content()
             print(f"  📄 HTML length: {len(html_content)} chars")
             
-            content = page.inner_text("body")
-            all_links = extract_links(page)
+            dom = extract_dom(page, skip=(), max_text_chars=5000)
+            content = dom['text']
+            all_links = dom['links']
             db_links = [l["href"] for l in all_links if "?v=" in l["href"] or "?p=" in l["href"]]
 
             print(f"  📊 Found {len(all_links)} links, {len(db_links)} database links")
@@ -94,7 +96,8 @@ def extract(url):
             if db_links:
                 try:
                     print(f"  🗂️ Loading database view...")
-                    page.goto(db_links[0], wait_until="domcontentloaded", timeout=60000)
+                    with host_slot(db_links[0]):
+                        page.goto(db_links[0], wait_until="domcontentloaded", timeout=60000)
                     time.sleep(3)
                     db_page_links = extract_links(page)
 
@@ -0,0 +1,140 @@
+"""
+Platform fingerprinting for custom-domain portfolios
+
+identify_platform() can only match hostnames. Notion sites on a custom
+domain, Designfolio custom domains and Framer/Webflow/Wix/Squarespace
+sites on their own domain all look like "other" by URL, and the generic
+scraper gets little out of them. One small GET (the first PROBE_MAX_BYTES
+of the page) is enough to read the generator meta tag, response headers,
+<html> attributes and asset hostnames that give the builder away. The
+verdict is cached per domain, so repeat analyses skip the probe.
+
+Notion pages published through super.so or Potion are served as static
+HTML, so they stay "other": the generic scraper and link discovery read
+them directly, while the Notion browser path would wait on a client-side
+render that never happens and look for Notion-style page ids.
+"""
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+from utils.http_client import http_get
+from utils.html_extract import HtmlExtractor, BASIC_SKIP_TAGS
+from scrapers.site_builders import fingerprint_html
+
+PROBE_MAX_BYTES = 64 * 1024
+PLATFORM_PROBE_TTL_SECONDS = int(os.environ.get("PLATFORM_PROBE_TTL_SECONDS", str(24 * 3600)))
+
+# platform -> byte signatures in the page head (asset hosts, inline markers).
+# Plain links are not enough: any portfolio may link to a Notion page.
+SCRIPT_SIGNATURES = {
+    "notion": (b"notion-static", b"__notion"),
+    "framer": (b"framerusercontent.com", b"framer.com/m/", b"__framer"),
+    "webflow": (b"website-files.com", b"webflow.js", b"data-wf-site"),
+    "wix": (b"static.wixstatic.com", b"static.parastorage.com", b"wix-thunderbolt"),
+    "squarespace": (b"static1.squarespace.com", b"this is squarespace", b"squarespace-cdn.com"),
+}
+# Static renderers of Notion pages (see module docstring)
+STATIC_NOTION_SIGNATURES = (b"assets.super.so", b"cdn.potion.so")
+GENERATOR_PLATFORMS = {
+    "super": "other",
+    "potion": "other",
+    "notion": "notion",
+    "designfolio": "designfolio",
+}
+
+
+# ---------------------------------------
+# PER-DOMAIN VERDICT CACHE
+# ---------------------------------------
+
+_verdicts = {}
+_verdicts_lock = threading.Lock()
+
+
+def _domain(url):
+    return (urlparse(url).hostname or "").lower().removeprefix("www.")
+
+
+def cached_platform(url):
+    with _verdicts_lock:
+        entry = _verdicts.get(_domain(url))
+    if entry and time.monotonic() - entry[1] < PLATFORM_PROBE_TTL_SECONDS:
+        return entry[0]
+    return None
+
+
+def _remember(url, platform):
+    with _verdicts_lock:
+        _verdicts[_domain(url)] = (platform, time.monotonic())
+
+
+# ---------------------------------------
+# PROBE
+# ---------------------------------------
+
+def _read_head(url):
+    """(first PROBE_MAX_BYTES of the body, headers) from one streamed GET."""
+    response = http_get(url, stream=True)
+    try:
+        if response.status_code >= 400:
+            return b"", response.headers
+        body = b""
+        for chunk in response.iter_content(16 * 1024):
+            body += chunk
+            if len(body) >= PROBE_MAX_BYTES:
+                break
+        return body[:PROBE_MAX_BYTES], response.headers
+    finally:
+        response.close()
+
+
+def fingerprint(body, headers):
+    """Platform name from a page prefix and its headers, or None."""
+    extractor = HtmlExtractor(skip_tags=BASIC_SKIP_TAGS, max_links=0, max_text_chars=0)
+    extractor.feed(body)
+    extracted = extractor.close()
+
+    generator = (extracted['meta'].get('generator') or "").lower()
+    for marker, platform in GENERATOR_PLATFORMS.items():
+        if marker in generator:
+            return platform
+    builder = fingerprint_html(extracted, headers)
+    if builder:
+        return builder
+
+    haystack = body.lower()
+    # Designfolio custom domains are its Next.js app with its own asset URLs
+    if b"__next_data__" in haystack and b"designfolio" in haystack:
+        return "designfolio"
+    if any(sig in haystack for sig in STATIC_NOTION_SIGNATURES):
+        return "other"
+    for platform, signatures in SCRIPT_SIGNATURES.items():
+        if any(sig in haystack for sig in signatures):
+            return platform
+    return None
+
+
+def probe_platform(url):
+    """
+    Detect the platform behind a custom-domain URL (cached per domain).
+
+    Returns a platform name understood by final.extract_portfolio, or
+    "other" when nothing matched or the probe failed.
+    """
+    cached = cached_platform(url)
+    if cached:
+        return cached
+
+    start = time.perf_counter()
+    try:
+        body, headers = _read_head(url)
+        platform = fingerprint(body, headers) or "other"
+    except Exception as e:
+        print(f"  ⚠️  Platform probe failed for {url}: {e}")
+        return "other"
+
+    _remember(url, platform)
+    print(f"  🔎 Platform probe: {platform} ({len(body) // 1024} KB read, {time.perf_counter() - start:.2f}s)")
+    return platform
@@ -0,0 +1,180 @@
+"""
+Fast-path scrapers for site-builder portfolios (Framer, Webflow, Wix, Squarespace)
+
+All four builders serve server-rendered HTML (Squarespace also serves each
+page as JSON via `?format=json`), so case-study text, headings and images
+can be read with plain HTTP. A browser is only needed when the static
+content comes back thin, which the callers handle via the tiered fetcher.
+
+Only Squarespace has a builder-specific path (its page JSON). Framer,
+Webflow and Wix pages go through the same generic static HTML extraction;
+their embedded data (Framer handover data, Wix warmup data, Webflow CMS
+collections) is not parsed, so content that only exists there is picked up
+by the browser fallback, not here.
+"""
+from urllib.parse import urljoin, urlparse
+
+from utils.http_client import http_get
+from utils.http_cache import stream_get
+from utils.html_extract import (
+    HtmlExtractor,
+    extract_html,
+    to_project_scrape,
+    BASIC_SKIP_TAGS,
+    PROJECT_SKIP_TAGS,
+    SCRAPE_TEXT_BUDGET,
+)
+from scrapers.discovery import discover_projects
+
+# platform -> hostname suffixes of the builder's own domains
+BUILDER_HOSTS = {
+    "framer": ("framer.website", "framer.app", "framer.ai", "framer.photos", "framer.media"),
+    "webflow": ("webflow.io",),
+    "wix": ("wixsite.com", "wixstudio.io", "editorx.io"),
+    "squarespace": ("squarespace.com",),
+}
+BUILDERS = tuple(BUILDER_HOSTS)
+
+# Minimum visible text for a static result to count as the real page
+MIN_PROJECT_TEXT = 400
+
+
+def builder_for_url(url):
+    """Builder name from the hostname, or None for custom domains."""
+    host = (urlparse(url).hostname or "").lower()
+    for builder, suffixes in BUILDER_HOSTS.items():
+        if any(host == s or host.endswith("." + s) for s in suffixes):
+            return builder
+    return None
+
+
+def fingerprint_html(extracted, headers=None):
+    """Builder name from an extraction's meta/root attributes and response headers."""
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    generator = (extracted.get('meta', {}).get('generator') or "").lower()
+    root_attrs = extracted.get('root_attrs', {})
+
+    if "framer" in generator or "framer" in headers.get("server", "").lower():
+        return "framer"
+    if "webflow" in generator or "data-wf-site" in root_attrs or "data-wf-page" in root_attrs:
+        return "webflow"
+    if "wix" in generator or "x-wix-request-id" in headers:
+        return "wix"
+    if "squarespace" in generator or "squarespace" in headers.get("server", "").lower():
+        return "squarespace"
+    return None
+
+
+def _static_extract(url, skip_tags=BASIC_SKIP_TAGS, max_text_chars=5000):
+    extractor = HtmlExtractor(base_url=url, skip_tags=skip_tags, max_links=300, max_text_chars=max_text_chars)
+    fetched = stream_get(url, extractor.feed)
+    if fetched['status_code'] >= 400:
+        raise Exception(f"HTTP {fetched['status_code']}")
+    return extractor.close()
+
+
+# ---------------------------------------
+# SQUARESPACE JSON
+# ---------------------------------------
+
+def _squarespace_json(url):
+    sep = "&" if "?" in url else "?"
+    response = http_get(f"{url}{sep}format=json")
+    if response.status_code >= 400:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+def _squarespace_item_links(url, data):
+    """Item pages (portfolio/blog entries) listed in a collection's JSON."""
+    links = []
+    for item in (data or {}).get("items") or []:
+        full_url = item.get("fullUrl")
+        if full_url:
+            links.append(urljoin(url, full_url))
+    return links
+
+
+# ---------------------------------------
+# PORTFOLIO
+# ---------------------------------------
+
+def extract(url, platform):
+    """Portfolio-level scrape for a site-builder site (same shape as the other scrapers)."""
+    print(f"  🧱 Scraping {platform} site: {url}")
+    try:
+        extracted = _static_extract(url)
+    except Exception as e:
+        print(f"  ❌ {platform} scraping error: {e}")
+        return {'url': url, 'content': '', 'links': [], 'project_links': []}
+
+    try:
+        discovery = discover_projects(url)
+    except Exception as e:
+        print(f"  ⚠️  Project discovery failed: {e}")
+        discovery = {'project_links': [], 'candidates': []}
+
+    if platform == "squarespace":
+        # Portfolio/blog collections list their items in JSON
+        collection_pages = [url] + [
+            c['url'] for c in discovery.get('candidates', [])[:3]
+        ]
+        item_links = []
+        for page_url in collection_pages:
+            item_links.extend(_squarespace_item_links(url, _squarespace_json(page_url)))
+        if item_links:
+            merged = list(dict.fromkeys(item_links + discovery['project_links']))
+            discovery = dict(discovery, project_links=merged[:20])
+
+    return {
+        'url': url,
+        'content': extracted['text'][:5000],
+        'links': extracted['links'][:100],
+        'project_links': discovery['project_links'],
+        'discovery': discovery,
+        'builder': platform,
+    }
+
+
+# ---------------------------------------
+# PROJECT PAGES
+# ---------------------------------------
+
+def _squarespace_project(url):
+    data = _squarespace_json(url)
+    if not data:
+        return None
+    item = data.get("item") or {}
+    html = item.get("body") or data.get("mainContent") or ""
+    if not html:
+        return None
+    extracted = extract_html(html, base_url=url)
+    scraped = to_project_scrape(url, extracted)
+    scraped['title'] = item.get("title") or (data.get("collection") or {}).get("title") or scraped['title']
+    scraped['meta_description'] = item.get("excerpt") or scraped['meta_description']
+    return scraped
+
+
+def extract_project(url, platform):
+    """
+    Case-study page via plain HTTP; None when the static content is too thin
+    (the caller then falls back to the tiered fetcher / browser).
+
+    Squarespace reads the page JSON; the other builders use generic static
+    extraction of the server-rendered HTML.
+    """
+    try:
+        if platform == "squarespace":
+            scraped = _squarespace_project(url)
+        else:
+            extracted = _static_extract(url, skip_tags=PROJECT_SKIP_TAGS, max_text_chars=SCRAPE_TEXT_BUDGET)
+            scraped = to_project_scrape(url, extracted)
+    except Exception as e:
+        print(f"    ⚠️  {platform} fast path failed for {url}: {e}")
+        return None
+    if not scraped or scraped['full_text_length'] < MIN_PROJECT_TEXT:
+        return None
+    return scraped
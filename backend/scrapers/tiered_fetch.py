@@ -0,0 +1,228 @@
+"""
+Tiered page fetcher
+
+Tier 1 is a static HTTP fetch (cached, streamed, single-pass extraction).
+The result is judged by text length/density, heading count and whether the
+page is an empty client-side app shell; only thin pages escalate to tier 2,
+a render in a pooled headless browser. The tier that worked is remembered
+per domain, so later pages of a JS-only site skip the static attempt.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from utils import render_client
+from utils.fetch_scheduler import host_slot, thread_wait_seconds
+from utils.http_cache import stream_get
+from utils.html_extract import HtmlExtractor, to_project_scrape
+from scrapers.dom_extract import extract_dom, dom_to_project_scrape
+
+STATIC_MIN_TEXT = int(os.environ.get("STATIC_MIN_TEXT", "400"))
+# Below this visible-text/HTML-bytes ratio a page with no headings is treated as a shell
+STATIC_MIN_DENSITY = 0.01
+SPA_ROOT_MIN_TEXT = 200
+
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "2"))
+# Relaunch a pooled browser after this many renders to cap its memory growth
+BROWSER_MAX_RENDERS = int(os.environ.get("BROWSER_MAX_RENDERS", "25"))
+DOMAIN_TIER_TTL_SECONDS = 6 * 3600
+
+TIER_STATIC = "static"
+TIER_BROWSER = "browser"
+
+
+# ---------------------------------------
+# PER-DOMAIN TIER MEMORY
+# ---------------------------------------
+
+_domain_tiers = {}
+_domain_tiers_lock = threading.Lock()
+
+
+def _domain(url):
+    return (urlparse(url).hostname or "").lower()
+
+
+def remembered_tier(url):
+    with _domain_tiers_lock:
+        entry = _domain_tiers.get(_domain(url))
+    if entry and time.monotonic() - entry[1] < DOMAIN_TIER_TTL_SECONDS:
+        return entry[0]
+    return None
+
+
+def remember_tier(url, tier):
+    with _domain_tiers_lock:
+        _domain_tiers[_domain(url)] = (tier, time.monotonic())
+
+
+# ---------------------------------------
+# TIER 1: STATIC
+# ---------------------------------------
+
+def static_fetch(url):
+    """Return (scraped_data, extraction, html_bytes) or raise on HTTP errors."""
+    extractor = HtmlExtractor(base_url=url)
+    fetched = stream_get(url, extractor.feed)
+    if fetched['status_code'] >= 400:
+        raise Exception(f"HTTP {fetched['status_code']}")
+    extracted = extractor.close()
+    return to_project_scrape(url, extracted), extracted, fetched['bytes']
+
+
+def needs_browser(extracted, html_bytes):
+    """Heuristic: does the static HTML lack the rendered content?"""
+    text_length = extracted['text_length']
+    if extracted.get('spa_root') and (extracted.get('spa_root_text_length') or 0) < SPA_ROOT_MIN_TEXT:
+        return "empty app root"
+    if text_length < STATIC_MIN_TEXT:
+        return "too little text"
+    density = text_length / max(1, html_bytes)
+    if not extracted['headings'] and density < STATIC_MIN_DENSITY:
+        return "low text density"
+    return None
+
+
+# ---------------------------------------
+# TIER 2: POOLED BROWSER
+# ---------------------------------------
+# Playwright's sync API is bound to the thread that started it, so each pool
+# thread owns one browser and renders are submitted to the pool.
+
+_local = threading.local()
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def _get_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ThreadPoolExecutor(
+                max_workers=max(1, BROWSER_POOL_SIZE),
+                thread_name_prefix="render-browser",
+            )
+        return _render_pool
+
+
+def _thread_browser():
+    browser = getattr(_local, "browser", None)
+    if browser is not None and (_local.renders >= BROWSER_MAX_RENDERS or not browser.is_connected()):
+        _close_thread_browser()
+        browser = None
+    if browser is None:
+        from playwright.sync_api import sync_playwright
+        _local.playwright = sync_playwright().start()
+        _local.browser = _local.playwright.chromium.launch(
+            headless=True,
+            args=["--disable-dev-shm-usage", "--no-sandbox", "--disable-gpu"],
+        )
+        _local.renders = 0
+    _local.renders += 1
+    return _local.browser
+
+
+def _close_thread_browser():
+    try:
+        _local.browser.close()
+    except Exception:
+        pass
+    try:
+        _local.playwright.stop()
+    except Exception:
+        pass
+    _local.browser = _local.playwright = None
+
+
+def _render_page(url):
+    from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
+    browser = _thread_browser()
+    context = browser.new_context(viewport={"width": 1440, "height": 900})
+    try:
+        page = context.new_page()
+        try:
+            with host_slot(url):
+                page.goto(url, wait_until="domcontentloaded", timeout=30000)
+            page.wait_for_load_state("networkidle", timeout=8000)
+        except PlaywrightTimeout:
+            pass
+        # Trigger lazy-loaded sections
+        for _ in range(6):
+            page.mouse.wheel(0, 3000)
+            page.wait_for_timeout(250)
+        return extract_dom(page)
+    finally:
+        context.close()
+
+
+def render_page_pooled(url):
+    """extract_dom() result for `url`, rendered by a browser in this process's pool."""
+    return _get_render_pool().submit(_render_page, url).result()
+
+
+def browser_fetch(url):
+    """Render `url` in a pooled browser (render service when configured) and extract it in-page."""
+    dom = render_client.run("render_page", url)
+    return dom_to_project_scrape(url, dom)
+
+
+# ---------------------------------------
+# ENTRY POINT
+# ---------------------------------------
+
+def fetch_project_page(url, render=None, timing=None):
+    """
+    Scrape a project page with the cheapest tier that yields real content.
+
+    `render(url)` overrides the browser tier (it must return scraped data);
+    `timing`, when given, receives the tier used, why it escalated and the
+    time spent waiting for per-host fetch slots on this thread.
+    """
+    timing = {} if timing is None else timing
+    wait_start = thread_wait_seconds()
+    try:
+        return _fetch_tiers(url, render or browser_fetch, timing)
+    finally:
+        timing['host_wait_seconds'] = round(thread_wait_seconds() - wait_start, 3)
+
+
+def _fetch_tiers(url, render, timing):
+    scraped = None
+
+    if remembered_tier(url) != TIER_BROWSER:
+        try:
+            scraped, extracted, html_bytes = static_fetch(url)
+            reason = needs_browser(extracted, html_bytes)
+            if reason is None:
+                remember_tier(url, TIER_STATIC)
+                timing['fetch_tier'] = TIER_STATIC
+                return scraped
+            print(f"    ↗️  Static HTML insufficient ({reason}), rendering: {url}")
+            timing['escalation_reason'] = reason
+        except Exception as e:
+            print(f"    ⚠️  Static fetch failed for {url}: {e}")
+            timing['escalation_reason'] = str(e)
+
+    try:
+        rendered = render(url)
+    except Exception as e:
+        print(f"    ⚠️  Browser render failed for {url}: {e}")
+        rendered = None
+    if rendered and rendered.get('full_text_length'):
+        remember_tier(url, TIER_BROWSER)
+        timing['fetch_tier'] = TIER_BROWSER
+        return rendered
+
+    # Thin static content still beats nothing
+    timing['fetch_tier'] = TIER_STATIC if scraped else TIER_BROWSER
+    return scraped or rendered or scrape_failed(url)
+
+
+def scrape_failed(url):
+    return {
+        'url': url, 'title': 'Scraping Failed', 'meta_description': '',
+        'headings': [], 'text_content': '', 'full_text_length': 0, 'total_images': 0
+    }
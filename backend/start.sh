@@ -0,0 +1,27 @@
+#!/bin/sh
+# Render service (Chromium) and the web tier run as separate processes, so
+# the Flask workers can be scaled without multiplying browsers.
+set -e
+
+export RENDER_SERVICE_ADDRESS="${RENDER_SERVICE_ADDRESS:-/tmp/portfolio-render.sock}"
+# Shared secret for the render connection (the service unpickles requests)
+if [ -z "$RENDER_SERVICE_AUTHKEY" ]; then
+    RENDER_SERVICE_AUTHKEY="$(python -c 'import secrets; print(secrets.token_hex(32))')"
+fi
+export RENDER_SERVICE_AUTHKEY
+# Analysis jobs per web worker (browsers are bounded by RENDER_WORKERS instead)
+export JOB_WORKERS="${JOB_WORKERS:-1}"
+
+# Keep the render service up; callers render in-process while it restarts
+(while true; do
+    python render_service.py || echo "render service exited ($?), restarting"
+    sleep 1
+done) &
+
+# Wait briefly for the socket so the first jobs do not fall back in-process
+for _ in $(seq 1 20); do
+    [ -S "$RENDER_SERVICE_ADDRESS" ] && break
+    sleep 0.5
+done
+
+exec gunicorn -c gunicorn.conf.py -w "${WEB_WORKERS:-2}" --threads "${WEB_THREADS:-4}" -t 3600 -b "0.0.0.0:${PORT:-8080}" app:app
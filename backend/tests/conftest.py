@@ -0,0 +1,9 @@
+"""
+Unit tests for the backend's pure helpers (no network, GCS or browser).
+
+    cd backend && python -m pytest
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
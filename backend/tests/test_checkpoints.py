@@ -0,0 +1,42 @@
+import pytest
+
+from utils import checkpoints
+from utils.checkpoints import JobCheckpoints
+from utils.job_queue import SqliteJobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SqliteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_project_checkpoint_waits_for_uploads(store, monkeypatch):
+    pending = {"reports/r1/": 2}
+    monkeypatch.setattr(checkpoints, "pending_uploads", lambda job: pending.get(job, 0))
+
+    run = JobCheckpoints("r1", store=store)
+    run.save("stage:scrape", {"text": "x"})
+    run.save("project:https://a.com/p", {"gcs_path": "p.json"}, after_uploads="reports/r1/")
+    assert store.load_checkpoints("r1") == {"stage:scrape": {"text": "x"}}
+
+    pending["reports/r1/"] = 0
+    run.write_uploaded()
+    assert "project:https://a.com/p" in store.load_checkpoints("r1")
+
+
+def test_restore_records_what_was_reused(store):
+    store.save_checkpoint("r1", "stage:scrape", {"text": "x"})
+    store.save_checkpoint("r1", "project:https://a.com/p", {"gcs_path": "p.json"})
+
+    run = JobCheckpoints("r1", store=store)
+    assert run.restore("stage:scrape") == {"text": "x"}
+    assert run.restore("project:https://a.com/p") == {"gcs_path": "p.json"}
+    assert run.restore("project:https://a.com/missing") is None
+    assert run.restored_stages() == ["scrape"]
+    assert run.restored_projects() == ["https://a.com/p"]
+
+
+def test_disabled_without_job_id(store):
+    run = JobCheckpoints(None, store=store)
+    run.save("stage:scrape", {"text": "x"})
+    assert run.restore("stage:scrape") is None
@@ -0,0 +1,63 @@
+import random
+
+from utils.helpers import canonicalize_url, dedupe_urls
+from utils.simhash import NearDuplicateIndex, hamming, simhash
+
+
+def test_canonicalize_folds_spellings():
+    canonical = "https://site.com/work/app"
+    for url in (
+        "http://www.site.com/work/app/",
+        "https://SITE.com/work/app#top",
+        "https://site.com/work/app?utm_source=x&ref=tw",
+        " https://site.com:443/work/app ",
+    ):
+        assert canonicalize_url(url) == canonical
+
+
+def test_canonicalize_keeps_meaningful_query_sorted():
+    assert canonicalize_url("https://site.com/p?b=2&a=1&fbclid=z") == "https://site.com/p?a=1&b=2"
+    assert canonicalize_url("https://site.com:8080/") == "https://site.com:8080/"
+
+
+def test_dedupe_first_spelling_wins():
+    urls = [
+        "https://site.com/a",
+        "http://www.site.com/a/",
+        "https://site.com/b",
+        "",
+        "https://site.com/a",
+        "https://site.com/a?utm_medium=mail",
+    ]
+    unique, aliases = dedupe_urls(urls)
+    assert unique == ["https://site.com/a", "https://site.com/b"]
+    assert aliases == {"https://site.com/a": ["http://www.site.com/a/", "https://site.com/a?utm_medium=mail"]}
+
+
+def _text(seed, words=1500):
+    rng = random.Random(seed)
+    vocab = [f"word{i}" for i in range(2000)]
+    return " ".join(rng.choice(vocab) for _ in range(words))
+
+
+def test_simhash_short_text_is_not_fingerprinted():
+    assert simhash("too short") is None
+    assert simhash("") is None
+
+
+def test_simhash_near_duplicates_are_close():
+    text = _text(1)
+    mirrored = "Behance gallery | " + text + " | Follow me"
+    assert hamming(simhash(text), simhash(mirrored)) <= 3
+    assert hamming(simhash(text), simhash(_text(2))) > 10
+
+
+def test_index_returns_closest_match_within_distance():
+    index = NearDuplicateIndex(max_distance=3)
+    index.add(0b0000, "a")
+    index.add(0b0111, "b")
+    index.add(None, "ignored")
+    assert index.find(0b0001) == ("a", 1)
+    assert index.find(0b0110) == ("b", 1)
+    assert index.find(0b1111000) is None
+    assert index.find(None) is None
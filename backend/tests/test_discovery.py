@@ -0,0 +1,70 @@
+from scrapers.discovery import _sitemap_locs, score_content, score_path
+
+
+def _extracted(text="", headings=(), images=0):
+    return {
+        "text": text,
+        "text_length": len(text),
+        "headings": [{"level": "h2", "text": h} for h in headings],
+        "images": {"total": images, "with_alt": 0},
+    }
+
+
+def test_project_under_work_segment_scores():
+    score, hub, reasons = score_path("https://site.com/work/checkout-redesign")
+    assert score == 3
+    assert hub is False
+    assert reasons == ["/work/<slug>"]
+
+
+def test_listing_page_is_a_hub_not_a_project():
+    score, hub, _ = score_path("https://site.com/projects")
+    assert hub is True
+    assert score == 0
+
+
+def test_case_study_slug_bonus():
+    score, _, reasons = score_path("https://site.com/case-studies/fintech-case-study")
+    assert score == 5
+    assert "case-study slug" in reasons
+
+
+def test_negative_segments_win():
+    score, hub, reasons = score_path("https://site.com/work/about")
+    assert score < 0
+    assert hub is False
+    assert reasons == ["negative path"]
+
+
+def test_root_and_deep_paths():
+    assert score_path("https://site.com/")[0] == 0
+    deep, _, _ = score_path("https://site.com/a/b/work/c/d")
+    assert deep == 2
+
+
+def test_content_score_rewards_case_study_signals():
+    text = "The problem we found in research led to a prototype and usability tests. " * 30
+    score, reasons = score_content(_extracted(text, headings=("Problem", "Research", "Outcome"), images=4))
+    # long text 2 + headings 1 + images 0.5 + keywords capped at 3
+    assert score == 6.5
+    assert "long text" in reasons
+    assert any(r.startswith("keywords:") for r in reasons)
+
+
+def test_content_score_penalises_thin_pages():
+    score, reasons = score_content(_extracted("Hello"))
+    assert score == -1
+    assert reasons == []
+
+
+def test_sitemap_index_and_urlset():
+    urlset = b"""<?xml version="1.0"?>
+    <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+      <url><loc> https://site.com/work/a </loc></url>
+      <url><loc>https://site.com/work/b</loc></url>
+    </urlset>"""
+    assert _sitemap_locs(urlset) == ("urlset", ["https://site.com/work/a", "https://site.com/work/b"])
+    index = b"""<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+      <sitemap><loc>https://site.com/sitemap-pages.xml</loc></sitemap>
+    </sitemapindex>"""
+    assert _sitemap_locs(index) == ("sitemapindex", ["https://site.com/sitemap-pages.xml"])
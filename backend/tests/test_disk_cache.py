@@ -0,0 +1,63 @@
+import os
+import time
+
+from utils.disk_cache import DiskCache
+
+
+def _age(cache, key, seconds_ago):
+    path = cache._base(key) + ".bin"
+    stamp = time.time() - seconds_ago
+    os.utime(path, (stamp, stamp))
+
+
+def test_put_and_read(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    cache.put("a", b"hello", {"content_type": "image/webp"})
+    data, meta = cache.read("a")
+    assert data == b"hello"
+    assert meta["content_type"] == "image/webp"
+    assert meta["size"] == 5
+    assert cache.read("missing") is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=300)
+    cache.put("old", b"x" * 100)
+    cache.put("recent", b"x" * 100)
+    _age(cache, "old", 60)
+    _age(cache, "recent", 30)
+    # A hit bumps recency: "old" is now the most recently used entry
+    assert cache.get("old") is not None
+    cache.put("new", b"x" * 150)
+    assert cache.get("recent") is None
+    assert cache.get("old") is not None
+    assert cache.get("new") is not None
+    assert cache._total <= 300
+
+
+def test_oversized_entries_are_not_stored(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10)
+    cache.put("big", b"x" * 11)
+    assert cache.get("big") is None
+    assert [name for name in os.listdir(tmp_path) if not name.startswith(".")] == []
+
+
+def test_aborted_stream_leaves_nothing(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    entry = cache.open_write("partial", {"etag": "e1"})
+    entry.write(b"abc")
+    entry.abort()
+    assert cache.get("partial") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    cache.put("a", b"data", {"stored_at": time.time() - 100})
+    assert cache.get("a", max_age=50) is None
+    assert cache._total == 0
+
+
+def test_total_size_is_rebuilt_on_startup(tmp_path):
+    DiskCache(str(tmp_path), max_bytes=1000).put("a", b"x" * 40)
+    assert DiskCache(str(tmp_path), max_bytes=1000)._total == 40
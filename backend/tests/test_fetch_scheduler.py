@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from utils import fetch_scheduler
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch_scheduler, "FETCH_SCHEDULER_DIR", str(tmp_path))
+    monkeypatch.setattr(fetch_scheduler, "_hosts", {})
+    return fetch_scheduler
+
+
+def test_slot_held_by_another_process_is_not_free(scheduler):
+    url = "https://www.behance.net/gallery/1/x"
+    scheduler.acquire(url)
+    # A second process builds its own state over the same files
+    other = scheduler._HostState("behance.net")
+    assert other.take_slot_file() is None
+    scheduler.release(url)
+    fd = other.take_slot_file()
+    assert fd is not None
+    scheduler.os.close(fd)
+
+
+def test_cooldown_is_shared_through_state_file(scheduler):
+    url = "https://www.behance.net/gallery/1/x"
+    assert scheduler.note_response(url, 429, {"Retry-After": "30"}) == 30.0
+    other = scheduler._HostState("behance.net")
+    cooldown_until = other.update_times(lambda now, n, c: (n, c, c))
+    assert cooldown_until - time.time() > 25
+
+
+def test_min_interval_spaces_request_starts(scheduler, monkeypatch):
+    monkeypatch.setitem(scheduler.HOST_LIMITS, "example.com", (2, 0.2))
+    url = "https://example.com/a"
+    with scheduler.host_slot(url):
+        pass
+    start = time.monotonic()
+    with scheduler.host_slot(url):
+        pass
+    assert time.monotonic() - start >= 0.15
+
+
+def test_falls_back_to_process_state_without_dir(monkeypatch):
+    monkeypatch.setattr(fetch_scheduler, "FETCH_SCHEDULER_DIR", "")
+    monkeypatch.setattr(fetch_scheduler, "_hosts", {})
+    with fetch_scheduler.host_slot("https://example.org/"):
+        assert fetch_scheduler._state("example.org").base is None
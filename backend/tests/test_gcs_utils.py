@@ -0,0 +1,24 @@
+import pytest
+
+from utils import gcs_utils
+
+
+class _Blob:
+    def generate_signed_url(self, **kwargs):
+        raise AssertionError("must not sign without a service account")
+
+
+class _Bucket:
+    def blob(self, path):
+        return _Blob()
+
+
+def test_user_credentials_cannot_sign(monkeypatch):
+    class UserCredentials:  # like google.oauth2.credentials.Credentials
+        token = "t"
+
+    monkeypatch.setattr(gcs_utils, "get_bucket", lambda: _Bucket())
+    monkeypatch.setattr(gcs_utils, "get_credentials", lambda: UserCredentials())
+    monkeypatch.setattr(gcs_utils, "_signed_url_cache", {})
+    with pytest.raises(gcs_utils.SigningUnavailable):
+        gcs_utils.generate_signed_url("screenshots/cas/x.jpg")
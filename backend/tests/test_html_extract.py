@@ -0,0 +1,96 @@
+import pytest
+
+from utils import html_extract
+from utils.html_extract import BASIC_SKIP_TAGS, HtmlExtractor, extract_html
+
+PAGE = """<!doctype html>
+<html lang="en" data-wf-site="abc">
+<head>
+  <title> Case  study:
+    Checkout </title>
+  <meta name="description" content="Redesigning checkout">
+  <meta property="og:title" content="OG title">
+  <script>var ignored = "script text";</script>
+  <script id="__NEXT_DATA__" type="application/json">{"page": "/project"}</script>
+</head>
+<body>
+  <nav><a href="/home">Home</a> navigation text</nav>
+  <div id="__next">
+    <h1>Checkout <em>redesign</em></h1>
+    <p>Problem statement paragraph.</p>
+    <h2>Research</h2>
+    <img src="a.png" alt="Flow"><img src="b.png">
+    <a href="/work/next">Next project</a>
+    <a href="mailto:me@example.com">Mail</a>
+  </div>
+  <footer>footer text</footer>
+</body>
+</html>"""
+
+
+@pytest.fixture(params=["lxml", "stdlib"])
+def parser(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(html_extract, "etree", None)
+    elif html_extract.etree is None:
+        pytest.skip("lxml not installed")
+    return request.param
+
+
+def _extract(**kwargs):
+    extractor = HtmlExtractor(base_url="https://site.com/work/checkout", capture_scripts=("__NEXT_DATA__",), **kwargs)
+    extractor.feed(PAGE)
+    return extractor.close()
+
+
+def test_collects_page_structure(parser):
+    result = _extract()
+    assert result["title"] == "Case study: Checkout"
+    assert result["meta_description"] == "Redesigning checkout"
+    assert result["meta"]["og:title"] == "OG title"
+    assert result["headings"] == [
+        {"level": "h1", "text": "Checkout redesign"},
+        {"level": "h2", "text": "Research"},
+    ]
+    assert result["images"] == {"total": 2, "with_alt": 1}
+    assert result["root_attrs"].get("data-wf-site") == "abc"
+    assert result["spa_root"] == "__next"
+    assert result["scripts"]["__NEXT_DATA__"] == '{"page": "/project"}'
+
+
+def test_skipped_tags_are_not_visible_text(parser):
+    text = _extract()["text"]
+    assert "Problem statement paragraph." in text
+    assert "navigation text" not in text
+    assert "footer text" not in text
+    assert "script text" not in text
+
+
+def test_links_are_absolute_and_http_only(parser):
+    links = _extract()["links"]
+    assert {"text": "Next project", "href": "https://site.com/work/next"} in links
+    assert all(link["href"].startswith("http") for link in links)
+    # nav is skipped for text, not for links
+    assert any(link["href"] == "https://site.com/home" for link in links)
+
+
+def test_text_budget_keeps_counting(parser):
+    html = "<p>" + " ".join(["word"] * 1000) + "</p>"
+    result = extract_html(html, max_text_chars=100)
+    assert len(result["text"]) == 100
+    assert result["text_length"] > 100
+    assert result["text_truncated"] is True
+
+
+def test_chunked_bytes_with_split_multibyte_character(parser):
+    data = '<html><head><meta charset="utf-8"></head><body><p>café déjà vu</p></body></html>'.encode("utf-8")
+    extractor = HtmlExtractor(skip_tags=BASIC_SKIP_TAGS)
+    for i in range(0, len(data), 3):
+        extractor.feed(data[i:i + 3])
+    assert extractor.close()["text"] == "café déjà vu"
+
+
+def test_empty_document(parser):
+    result = extract_html(b"")
+    assert result["text"] == ""
+    assert result["links"] == []
@@ -0,0 +1,48 @@
+import pytest
+
+from utils import http_cache
+from utils.disk_cache import DiskCache
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None, url="https://site.com/"):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.url = url
+
+
+@pytest.fixture
+def origin(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), 1024 * 1024)
+    monkeypatch.setattr(http_cache, "get_http_cache", lambda: cache)
+    monkeypatch.setattr(http_cache, "HTTP_CACHE_ENABLED", True)
+    requests = []
+    responses = []
+
+    def fake_get(url, headers=None, **kwargs):
+        requests.append(dict(headers or {}))
+        return responses.pop(0)
+
+    monkeypatch.setattr(http_cache, "http_get", fake_get)
+    return requests, responses
+
+
+def test_every_read_is_revalidated(origin):
+    requests, responses = origin
+    responses.append(FakeResponse(200, b"<p>v1</p>", {"ETag": '"v1"', "Content-Type": "text/html"}))
+    responses.append(FakeResponse(304))
+    assert http_cache.cached_get("https://site.com/").content == b"<p>v1</p>"
+
+    again = http_cache.cached_get("https://site.com/")
+    assert again.from_cache and again.content == b"<p>v1</p>"
+    assert requests[1]["If-None-Match"] == '"v1"'
+
+
+def test_edited_page_replaces_the_cached_copy(origin):
+    requests, responses = origin
+    responses.append(FakeResponse(200, b"v1", {"ETag": '"v1"'}))
+    responses.append(FakeResponse(200, b"v2", {"ETag": '"v2"'}))
+    http_cache.cached_get("https://site.com/")
+    assert http_cache.cached_get("https://site.com/").content == b"v2"
+    assert len(requests) == 2
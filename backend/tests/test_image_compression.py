@@ -0,0 +1,90 @@
+import io
+
+import pytest
+from PIL import Image
+
+from analysis import image_compression
+from analysis.image_compression import (
+    MAX_QUALITY,
+    MIN_QUALITY,
+    TileStitcher,
+    build_variants,
+    encode_to_target,
+)
+
+
+@pytest.fixture
+def sized_encoder(monkeypatch):
+    """_encode stub whose output is 10 bytes per quality point; records qualities tried."""
+    tried = []
+
+    def fake_encode(img, fmt, quality):
+        tried.append(quality)
+        return b"x" * (quality * 10)
+
+    monkeypatch.setattr(image_compression, "_encode", fake_encode)
+    return tried
+
+
+def _png(width, height, color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_max_quality_when_it_fits(sized_encoder):
+    data, quality, encodes = encode_to_target(None, "jpeg", target_size=10_000)
+    assert quality == MAX_QUALITY
+    assert encodes == 1
+    assert len(data) == MAX_QUALITY * 10
+
+
+def test_binary_search_finds_highest_fitting_quality(sized_encoder):
+    data, quality, encodes = encode_to_target(None, "jpeg", target_size=605)
+    assert quality == 60
+    assert len(data) <= 605
+    assert all(MIN_QUALITY <= q <= MAX_QUALITY for q in sized_encoder)
+    # log2 search over the range, not a linear scan
+    assert encodes <= 8
+
+
+def test_nothing_fits_returns_min_quality_encode(sized_encoder):
+    data, quality, encodes = encode_to_target(None, "jpeg", target_size=100)
+    assert quality == MIN_QUALITY
+    assert len(data) == MIN_QUALITY * 10
+    assert sized_encoder[-1] == MIN_QUALITY
+
+
+def test_tile_stitcher_places_tiles_and_drops_overlap():
+    # 100x300 page from two 200px tiles; the second overlaps the first by 100px
+    stitcher = TileStitcher(100, 300, scale=0.5, overview_width=50)
+    stitcher.add_tile(_png(100, 200, (255, 0, 0)), top=0)
+    stitcher.add_tile(_png(100, 200, (0, 0, 255)), top=100, skip=100)
+    canvas = stitcher.canvas
+    assert canvas.size == (50, 150)
+    assert canvas.getpixel((25, 10)) == (255, 0, 0)
+    assert canvas.getpixel((25, 90)) == (255, 0, 0)
+    assert canvas.getpixel((25, 140)) == (0, 0, 255)
+    assert stitcher.overview.size == (50, 150)
+
+    data, overview, stats = stitcher.finish(fmt="jpeg")
+    assert stats["tiles"] == 2
+    assert (stats["width"], stats["height"]) == (50, 150)
+    assert Image.open(io.BytesIO(data)).size == (50, 150)
+    assert overview
+    assert stitcher.canvas is None
+
+
+def test_build_variants_skips_widths_at_or_above_source():
+    data = _png(640, 400, "red")
+    variants, color, source_width = build_variants(data, "jpeg")
+    assert source_width == 640
+    assert [(name, width) for name, width, _ in variants] == [("thumb", 320)]
+    assert color == "#ff0000"
+    thumb = Image.open(io.BytesIO(variants[0][2]))
+    assert thumb.size == (320, 200)
+
+
+def test_build_variants_for_wide_source():
+    variants, _, _ = build_variants(_png(960, 100, "blue"), "jpeg")
+    assert [width for _, width, _ in variants] == [320, 640]
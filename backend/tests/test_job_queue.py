@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from utils import job_queue
+from utils.job_queue import JobQueue, QueueFull, SqliteJobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SqliteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_claim_is_fifo_and_counts_attempts(store):
+    store.add("a", {"n": 1})
+    store.add("b", {"n": 2})
+    assert store.position("b") == 2
+    assert store.claim("w") == ("a", {"n": 1}, 1)
+    assert store.claim("w") == ("b", {"n": 2}, 1)
+    assert store.claim("w") is None
+    assert store.counts() == {job_queue.RUNNING: 2}
+
+
+def test_add_enforces_capacity(store):
+    assert store.add("a", {}, max_queued=2)
+    assert store.add("b", {}, max_queued=2)
+    assert not store.add("c", {}, max_queued=2)
+    store.claim("w")
+    assert store.add("c", {}, max_queued=2)
+
+
+def test_concurrent_submits_never_overrun_the_bound(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(lambda job_id, payload: None, store=SqliteJobStore(path), max_queued=5)
+    accepted, rejected = [], []
+
+    def submit(i):
+        try:
+            queue.submit(f"job-{i}", {})
+            accepted.append(i)
+        except QueueFull as e:
+            assert e.retry_after >= 5
+            rejected.append(i)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(accepted) == 5
+    assert len(rejected) == 15
+    assert queue.store.counts() == {job_queue.QUEUED: 5}
+
+
+def test_expired_lease_resumes_with_checkpoints(store):
+    store.add("a", {})
+    store.claim("dead-worker")
+    store.save_checkpoint("a", "stage:scrape", {"text": "x"})
+    # Lease not expired yet
+    assert store.requeue_expired(lease_seconds=60, max_attempts=3) == ([], [])
+    time.sleep(0.01)
+    assert store.requeue_expired(lease_seconds=0, max_attempts=3) == (["a"], [])
+    assert store.claim("new-worker") == ("a", {}, 2)
+    assert store.load_checkpoints("a") == {"stage:scrape": {"text": "x"}}
+
+
+def test_job_lost_too_often_fails_and_drops_checkpoints(store):
+    store.add("a", {})
+    store.claim("w")
+    store.save_checkpoint("a", "stage:scrape", {})
+    time.sleep(0.01)
+    assert store.requeue_expired(lease_seconds=0, max_attempts=1) == ([], ["a"])
+    assert store.counts() == {job_queue.FAILED: 1}
+    assert store.load_checkpoints("a") == {}
+
+
+def test_abandoned_jobs_are_reported(store, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 0)
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 1)
+    store.add("a", {})
+    store.claim("dead-worker")
+    time.sleep(0.01)
+    reported = []
+    queue = JobQueue(lambda job_id, payload: None, store=store,
+                     on_abandoned=lambda job_id, error: reported.append((job_id, error)))
+    assert queue._requeue_expired() == []
+    assert reported == [("a", job_queue.ABANDONED_ERROR)]
@@ -0,0 +1,29 @@
+import pytest
+
+from scrapers.platform_probe import fingerprint
+
+
+def _page(head="", body="<p>hello</p>"):
+    return f"<!doctype html><html><head>{head}</head><body>{body}</body></html>".encode()
+
+
+@pytest.mark.parametrize("head", [
+    '<meta name="generator" content="Super">',
+    '<link rel="stylesheet" href="https://assets.super.so/app.css">',
+    '<script src="https://cdn.potion.so/runtime.js"></script>',
+])
+def test_static_notion_renderers_stay_on_static_path(head):
+    assert fingerprint(_page(head), {}) == "other"
+
+
+def test_notion_marker_routes_to_notion():
+    assert fingerprint(_page('<meta name="generator" content="Notion">'), {}) == "notion"
+
+
+def test_designfolio_next_app():
+    body = '<script id="__NEXT_DATA__">{"buildId":"designfolio"}</script>'
+    assert fingerprint(_page(body=body), {}) == "designfolio"
+
+
+def test_unknown_page():
+    assert fingerprint(_page(), {}) is None
@@ -0,0 +1,79 @@
+import pytest
+
+from utils import reanalysis
+from utils.reanalysis import RunIndex, text_hash
+
+CAS = "https://storage.googleapis.com/bucket/screenshots/cas/{}.jpg"
+TEXT = text_hash({"text_content": "A case  study\nabout checkout"})
+
+
+@pytest.fixture
+def previous(monkeypatch):
+    index = {
+        "report_id": "old",
+        "projects": {
+            "https://site.com/work/a": {
+                "url": "https://site.com/work/a",
+                "text_hash": TEXT,
+                "screenshot_sha256": "a" * 64,
+                "analysis": {"overall_score": 70},
+                "report_id": "old",
+            },
+            "https://site.com/work/failed": {"text_hash": TEXT, "analysis": None},
+        },
+    }
+    monkeypatch.setattr(reanalysis, "load_run_index", lambda url, user: index)
+    return index
+
+
+def test_text_hash_ignores_whitespace():
+    assert text_hash({"text_content": "A case study about checkout"}) == TEXT
+    assert text_hash({"content": "A case study about checkout"}) == TEXT
+
+
+def test_unchanged_text_reuses_even_when_screenshot_was_reencoded(previous):
+    index = RunIndex("https://site.com", "u1", reuse=True)
+    # Another spelling of the same URL, a fresh encode of the screenshot
+    entry = index.reusable("http://www.site.com/work/a/", TEXT, CAS.format("b" * 64))
+    assert entry["analysis"] == {"overall_score": 70}
+    assert entry["screenshot_changed"] is True
+    assert index.reusable("https://site.com/work/a", TEXT, CAS.format("a" * 64))["screenshot_changed"] is False
+
+
+def test_changed_or_unknown_projects_are_scored_again(previous):
+    index = RunIndex("https://site.com", "u1", reuse=True)
+    assert index.reusable("https://site.com/work/a", text_hash({"text_content": "new"}), None) is None
+    assert index.reusable("https://site.com/work/new", TEXT, None) is None
+    assert index.reusable("https://site.com/work/failed", TEXT, None) is None
+
+
+def test_no_reuse_unless_requested(previous):
+    assert RunIndex("https://site.com", "u1").reusable("https://site.com/work/a", TEXT, None) is None
+
+
+def test_failed_project_keeps_previous_entry_and_reuse_points_at_scoring_run(previous):
+    index = RunIndex("https://site.com", "u1", report_id="new", reuse=True)
+    index.keep_previous("https://site.com/work/a")
+    assert index.projects["https://site.com/work/a"]["report_id"] == "old"
+
+    index.record("https://site.com/work/b", TEXT, None, {"analysis": {}}, "gs://b.json",
+                 reused_from={"report_id": "older", "report_url": "gs://old-b.json", "generated_at": None})
+    assert index.projects["https://site.com/work/b"]["report_id"] == "older"
+    assert index.reused == ["https://site.com/work/b"]
+
+
+def test_index_path_is_keyed_by_the_server_secret(monkeypatch):
+    monkeypatch.setattr(reanalysis, "REANALYSIS_INDEX_SECRET", b"one")
+    path = reanalysis.index_path("https://site.com", "u1")
+    assert path.startswith(reanalysis.REANALYSIS_PREFIX)
+    assert reanalysis.index_path("http://www.site.com/", "u1") == path
+    monkeypatch.setattr(reanalysis, "REANALYSIS_INDEX_SECRET", b"two")
+    assert reanalysis.index_path("https://site.com", "u1") != path
+
+
+def test_no_index_without_a_secret(monkeypatch):
+    monkeypatch.setattr(reanalysis, "REANALYSIS_INDEX_SECRET", b"")
+    monkeypatch.setattr(reanalysis, "enqueue_json", lambda *a, **kw: pytest.fail("index published"))
+    assert reanalysis.index_path("https://site.com", "u1") is None
+    assert reanalysis.load_run_index("https://site.com", "u1") is None
+    assert RunIndex("https://site.com", "u1").publish() is None
@@ -0,0 +1,37 @@
+import os
+import queue
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_client(**env):
+    return subprocess.run(
+        [sys.executable, "-c", "import utils.render_client"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "RENDER_SERVICE_AUTHKEY": "", **env},
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_service_address_requires_authkey():
+    result = _import_client(RENDER_SERVICE_ADDRESS="/tmp/render-test.sock")
+    assert result.returncode != 0
+    assert "RENDER_SERVICE_AUTHKEY" in result.stderr
+    assert _import_client(RENDER_SERVICE_ADDRESS="/tmp/render-test.sock",
+                          RENDER_SERVICE_AUTHKEY="k").returncode == 0
+    assert _import_client(RENDER_SERVICE_ADDRESS="").returncode == 0
+
+
+def test_execute_gives_up_when_no_worker_frees_up(monkeypatch):
+    monkeypatch.setenv("RENDER_SERVICE_AUTHKEY", "k")
+    monkeypatch.setenv("RENDER_SERVICE_ADDRESS", "/tmp/render-test.sock")
+    monkeypatch.delitem(sys.modules, "utils.render_client", raising=False)
+    monkeypatch.delitem(sys.modules, "render_service", raising=False)
+    import render_service
+
+    pool = render_service.RenderPool.__new__(render_service.RenderPool)
+    pool._idle = queue.Queue()
+    assert pool.execute("render_page", (), {}, timeout=0.05) == ("error", "render pool busy")
@@ -0,0 +1,39 @@
+from analysis import screenshot
+from analysis.screenshot import TwoPhaseCapture
+
+
+def test_phase_two_renders_desktop_in_the_viewport_session(monkeypatch):
+    calls = []
+
+    def fake_capture_viewports(url, profiles, upload_job=None, metrics=None):
+        calls.append(profiles)
+        metrics["desktop"] = {"overview_url": "gs://overview.jpg", "seconds": 1.0}
+        metrics["mobile"] = {"seconds": 1.0}
+        return {"desktop": "gs://desktop.jpg", "mobile": "gs://mobile.jpg"}
+
+    monkeypatch.setattr(screenshot, "capture_viewports", fake_capture_viewports)
+    monkeypatch.setattr(screenshot, "capture_screenshot", lambda *a, **k: _unexpected_full_capture())
+
+    capture = TwoPhaseCapture("https://site.com/work/a", extra=["mobile"])
+    screenshot._start_phase_two(capture, "job")
+
+    assert capture.full.result(timeout=5) == "gs://desktop.jpg"
+    assert capture.viewports.result(timeout=5) == {"mobile": "gs://mobile.jpg"}
+    assert calls == [["desktop", "mobile"]]
+    assert capture.metrics["overview_url"] == "gs://overview.jpg"
+    assert capture.metrics["viewports"] == {"mobile": {"seconds": 1.0}}
+
+
+def test_failed_phase_two_still_resolves_both_futures(monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("chromium died")
+
+    monkeypatch.setattr(screenshot, "capture_viewports", broken)
+    capture = TwoPhaseCapture("https://site.com/work/a", extra=["mobile"])
+    screenshot._start_phase_two(capture, "job")
+    assert capture.full.result(timeout=5) is None
+    assert capture.viewports.result(timeout=5) == {"mobile": None}
+
+
+def _unexpected_full_capture():
+    raise AssertionError("desktop must not be captured in its own session")
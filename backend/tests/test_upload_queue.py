@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from utils import upload_queue
+from utils.upload_queue import UploadQueue
+
+
+class FakeStorage:
+    """Stands in for upload_bytes_to_gcs; records the final content of each path."""
+
+    def __init__(self, delays=None, failures=None):
+        self.objects = {}
+        self.calls = []
+        self.delays = delays or {}
+        self.failures = list(failures or [])
+        self.lock = threading.Lock()
+
+    def __call__(self, data, gcs_path, content_type=None, gzip=False):
+        with self.lock:
+            self.calls.append((gcs_path, data))
+            error = self.failures.pop(0) if self.failures else None
+        time.sleep(self.delays.get(data, 0))
+        if error is not None:
+            raise error
+        with self.lock:
+            self.objects[gcs_path] = data
+        return f"gs://{gcs_path}"
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    fake = FakeStorage()
+    monkeypatch.setattr(upload_queue, "upload_bytes_to_gcs", fake)
+    monkeypatch.setattr(upload_queue, "UPLOAD_BACKOFF_SECONDS", 0.001)
+    return fake
+
+
+def test_same_path_last_write_wins(storage):
+    # The first version is slow: without serialisation it would land last
+    storage.delays[b"v1"] = 0.2
+    q = UploadQueue(workers=4)
+    q.submit(b"v1", "job/report.json", job="job")
+    time.sleep(0.02)
+    q.submit(b"v2", "job/report.json", job="job")
+    stats = q.flush("job", timeout=5)
+    assert storage.objects["job/report.json"] == b"v2"
+    assert stats["pending"] == 0
+    assert q._path_locks == {}
+
+
+def test_superseded_versions_are_skipped(storage):
+    storage.delays[b"v1"] = 0.2
+    q = UploadQueue(workers=2)
+    for version in (b"v1", b"v2", b"v3", b"v4"):
+        q.submit(version, "job/manifest.json", job="job")
+    stats = q.flush("job", timeout=5)
+    assert storage.objects["job/manifest.json"] == b"v4"
+    assert stats["superseded"] >= 1
+    assert stats["uploads"] + stats["superseded"] == 4
+
+
+def test_transient_errors_are_retried(storage):
+    storage.failures = [ConnectionError("reset"), TimeoutError("slow")]
+    q = UploadQueue(workers=1)
+    future = q.submit(b"data", "job/a.json", job="job")
+    stats = q.flush("job", timeout=5)
+    assert future.result(timeout=1) == "gs://job/a.json"
+    assert stats["retries"] == 2
+    assert stats["failed"] == 0
+
+
+def test_permanent_error_fails_without_retry(storage):
+    storage.failures = [ValueError("bad request")]
+    q = UploadQueue(workers=1)
+    future = q.submit(b"data", "job/a.json", job="job")
+    stats = q.flush("job", timeout=5)
+    assert stats["failed"] == 1
+    assert stats["failed_paths"] == ["job/a.json"]
+    assert len(storage.calls) == 1
+    with pytest.raises(ValueError):
+        future.result(timeout=1)
+
+
+def test_pending_counts_unfinished_uploads(storage):
+    storage.delays[b"slow"] = 0.2
+    q = UploadQueue(workers=1)
+    q.submit(b"slow", "job/a.json", job="job")
+    assert q.pending("job") == 1
+    q.flush("job", timeout=5)
+    assert q.pending("job") == 0
+
+
+def test_snapshot_keeps_failures_for_the_final_flush(storage):
+    storage.failures = [ValueError("bad request")]
+    q = UploadQueue(workers=1)
+    q.submit(b"report", "job/report.json", job="job").exception(timeout=5)
+    assert q.stats("job")["failed"] == 1
+    # Uploads queued after the snapshot (the time report) share the same counters
+    q.submit(b"timings", "job/timings.json", job="job")
+    stats = q.flush("job", timeout=5)
+    assert stats["failed"] == 1
+    assert stats["uploads"] == 1
+    assert q.stats("job")["failed"] == 0
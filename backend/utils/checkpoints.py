@@ -0,0 +1,84 @@
+"""
+Stage and project checkpoints for resumable analysis jobs
+
+The pipeline records the output (or output reference) of each completed
+stage and each completed project under the job's report_id in the JobStore.
+When a job interrupted by a restart is picked up again, extract_portfolio
+and analyze_projects restore those instead of redoing the scraping,
+screenshots and Gemini calls, and continue with the first unfinished
+project. Restored keys are listed in the time report.
+
+A project checkpoint points at objects (report JSON, screenshots) that the
+upload queue writes in the background, so it is only persisted once the
+job has no uploads in flight; until then it is kept in memory.
+
+Checkpointing is best effort: a store error is logged and the stage simply
+runs (or is not recorded) as if checkpoints were disabled.
+"""
+import os
+
+from utils.job_queue import get_job_store
+from utils.upload_queue import pending_uploads
+
+CHECKPOINTS_ENABLED = os.environ.get("JOB_CHECKPOINTS", "1").lower() in ("1", "true", "yes")
+
+
+class JobCheckpoints:
+    """Checkpoints of one job; a no-op without a report_id."""
+
+    def __init__(self, job_id, store=None):
+        self.job_id = job_id
+        self.enabled = bool(job_id) and CHECKPOINTS_ENABLED
+        self.store = None
+        self.restored = []
+        self._saved = {}
+        self._deferred = {}
+        if self.enabled:
+            try:
+                self.store = store or get_job_store()
+                self._saved = self.store.load_checkpoints(job_id)
+            except Exception as e:
+                print(f"⚠️  Checkpoints unavailable for {job_id}: {e}")
+                self.enabled = False
+        if self._saved:
+            print(f"♻️  Resuming job {job_id} from {len(self._saved)} checkpoint(s)")
+
+    def restore(self, key):
+        """Saved value for `key` (recorded as restored), or None."""
+        value = self._saved.get(key)
+        if value is not None:
+            self.restored.append(key)
+        return value
+
+    def save(self, key, value, after_uploads=None):
+        """
+        Record `key`. With `after_uploads` (an upload job key) the write waits
+        until that job's queued uploads have all landed.
+        """
+        if not self.enabled:
+            return
+        if after_uploads is None:
+            self._write(key, value)
+            return
+        self._deferred[key] = (value, after_uploads)
+        self.write_uploaded()
+
+    def write_uploaded(self):
+        """Persist deferred checkpoints whose uploads have finished."""
+        for key, (value, job) in list(self._deferred.items()):
+            if pending_uploads(job) == 0:
+                del self._deferred[key]
+                self._write(key, value)
+
+    def _write(self, key, value):
+        self._saved[key] = value
+        try:
+            self.store.save_checkpoint(self.job_id, key, value)
+        except Exception as e:
+            print(f"⚠️  Could not save checkpoint {key}: {e}")
+
+    def restored_stages(self):
+        return [key.removeprefix("stage:") for key in self.restored if key.startswith("stage:")]
+
+    def restored_projects(self):
+        return [key.removeprefix("project:") for key in self.restored if key.startswith("project:")]
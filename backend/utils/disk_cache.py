@@ -0,0 +1,164 @@
+"""
+Bounded on-disk LRU cache
+
+Entries are stored as `<sha1(key)>.bin` with a small `.json` metadata sidecar.
+The total size of the cache directory is kept under `max_bytes` by evicting
+the least recently used entries (file mtime is bumped on every hit).
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class _PendingEntry:
+    """Streaming writer for one cache entry; nothing is visible until commit()."""
+
+    def __init__(self, cache, key, meta):
+        self._cache = cache
+        self._key = key
+        self._meta = meta
+        fd, self._tmp_path = tempfile.mkstemp(dir=cache.directory, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+        self.size = 0
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self._file.close()
+        self._cache._commit(self._key, self._tmp_path, self.size, self._meta)
+
+    def abort(self):
+        try:
+            self._file.close()
+        finally:
+            try:
+                os.remove(self._tmp_path)
+            except OSError:
+                pass
+
+
+class DiskCache:
+    """Size-bounded LRU cache of binary blobs on local disk."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory)
+            if name.endswith(".bin")
+        )
+
+    def _base(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def get(self, key, max_age=None):
+        """Return (data_path, meta) for a cached key, or None."""
+        base = self._base(key)
+        try:
+            with open(base + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if max_age is not None and time.time() - meta.get("stored_at", 0) > max_age:
+            self.delete(key)
+            return None
+        path = base + ".bin"
+        try:
+            os.utime(path, None)
+        except OSError:
+            return None
+        return path, meta
+
+    def read(self, key, max_age=None):
+        """Return (data_bytes, meta) for a cached key, or None."""
+        hit = self.get(key, max_age=max_age)
+        if hit is None:
+            return None
+        path, meta = hit
+        try:
+            with open(path, "rb") as f:
+                return f.read(), meta
+        except OSError:
+            return None
+
+    def open_write(self, key, meta=None):
+        """Start a streaming write; call commit() or abort() on the result."""
+        return _PendingEntry(self, key, dict(meta or {}))
+
+    def put(self, key, data, meta=None):
+        if len(data) > self.max_bytes:
+            return
+        entry = self.open_write(key, meta)
+        try:
+            entry.write(data)
+        except Exception:
+            entry.abort()
+            raise
+        entry.commit()
+
+    def update_meta(self, key, **fields):
+        """Patch the metadata of an existing entry (and bump its recency)."""
+        hit = self.get(key)
+        if hit is None:
+            return
+        _, meta = hit
+        meta.update(fields)
+        with open(self._base(key) + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def delete(self, key):
+        base = self._base(key)
+        with self._lock:
+            self._remove(base)
+
+    def _remove(self, base):
+        try:
+            self._total -= os.path.getsize(base + ".bin")
+            os.remove(base + ".bin")
+        except OSError:
+            pass
+        try:
+            os.remove(base + ".json")
+        except OSError:
+            pass
+
+    def _commit(self, key, tmp_path, size, meta):
+        if size > self.max_bytes:
+            os.remove(tmp_path)
+            return
+        base = self._base(key)
+        meta["key"] = key
+        meta["size"] = size
+        meta.setdefault("stored_at", time.time())
+        with self._lock:
+            self._remove(base)
+            os.replace(tmp_path, base + ".bin")
+            with open(base + ".json", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            self._total += size
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".bin"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((os.path.getmtime(path), path[:-4]))
+            except OSError:
+                continue
+        entries.sort()
+        for _, base in entries:
+            if self._total <= self.max_bytes * 0.9:
+                break
+            self._remove(base)
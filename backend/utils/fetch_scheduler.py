@@ -0,0 +1,291 @@
+"""
+Per-host politeness scheduler for outbound fetches
+
+Every outbound request (static HTTP and browser navigations) takes a slot
+for its host first. Each host gets a concurrency limit and a minimum
+interval between request starts; a 429/503 (or a 403 from hosts known to
+use it for throttling) puts the host in a cooldown that honours
+Retry-After. Different hosts never wait on each other.
+
+The budget is shared by every process on the instance: the gunicorn
+workers and the render-service workers all take slots as flock()ed files
+and read/write start times and cooldowns in a per-host state file under
+FETCH_SCHEDULER_DIR (locks die with their process). Separate instances
+each enforce HOST_LIMITS on their own, so the limits are per instance;
+without fcntl or a writable directory they fall back to per process.
+
+Waits are counted per host (see scheduler_stats) and per thread (see
+thread_wait_seconds) so they can be reported in the pipeline timings.
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: limits are per process
+    fcntl = None
+
+FETCH_HOST_CONCURRENCY = int(os.environ.get("FETCH_HOST_CONCURRENCY", "2"))
+FETCH_HOST_MIN_INTERVAL = float(os.environ.get("FETCH_HOST_MIN_INTERVAL", "0.25"))
+# Cooldown when a throttling response carries no usable Retry-After
+FETCH_DEFAULT_COOLDOWN = float(os.environ.get("FETCH_DEFAULT_COOLDOWN", "5"))
+FETCH_MAX_COOLDOWN = 60.0
+FETCH_SCHEDULER_DIR = os.environ.get("FETCH_SCHEDULER_DIR", os.path.join(tempfile.gettempdir(), "fetch-scheduler"))
+# How often a request waiting for a slot held by another process retries
+SLOT_POLL_SECONDS = 0.05
+
+# host suffix -> (max concurrent requests, min seconds between request starts)
+HOST_LIMITS = {
+    "behance.net": (1, 1.0),
+    "notion.site": (2, 0.5),
+    "notion.so": (2, 0.5),
+}
+THROTTLE_STATUS = (429, 503)
+# Hosts that answer rate-limited clients with 403 instead of 429
+THROTTLE_403_HOSTS = ("behance.net",)
+
+
+def host_key(url):
+    """Scheduling key for a URL: lowercased hostname without 'www.'."""
+    return (urlparse(url).hostname or "").lower().removeprefix("www.")
+
+
+def _limits_for(host):
+    for suffix, limits in HOST_LIMITS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return limits
+    return FETCH_HOST_CONCURRENCY, FETCH_HOST_MIN_INTERVAL
+
+
+def _shared_dir():
+    if fcntl is None or not FETCH_SCHEDULER_DIR:
+        return None
+    try:
+        os.makedirs(FETCH_SCHEDULER_DIR, exist_ok=True)
+    except OSError as e:
+        print(f"⚠️  Fetch scheduler dir unavailable ({e}); host limits are per process")
+        return None
+    return FETCH_SCHEDULER_DIR
+
+
+class _HostState:
+    def __init__(self, host):
+        concurrency, interval = _limits_for(host)
+        self.concurrency = max(1, concurrency)
+        # Also bounds this process's threads, so only they poll the slot files
+        self.slots = threading.BoundedSemaphore(self.concurrency)
+        self.interval = interval
+        self.lock = threading.Lock()
+        # Wall-clock times, comparable across processes
+        self.next_start = 0.0
+        self.cooldown_until = 0.0
+        directory = _shared_dir()
+        self.base = os.path.join(directory, re.sub(r"[^a-z0-9.-]", "_", host) or "_") if directory else None
+        self.held = []  # slot-file descriptors held by this process
+
+    # ---- instance-wide slots ----
+
+    def take_slot_file(self):
+        """Lock a free slot file; returns its fd, or None when all are held."""
+        for i in range(self.concurrency):
+            fd = os.open(f"{self.base}.slot{i}", os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+    # ---- start times / cooldown ----
+
+    def update_times(self, update):
+        """
+        Apply update(now, next_start, cooldown_until) -> (next_start,
+        cooldown_until, result) atomically (across processes when shared).
+        """
+        with self.lock:
+            if self.base is None:
+                self.next_start, self.cooldown_until, result = update(
+                    time.time(), self.next_start, self.cooldown_until
+                )
+                return result
+            with open(f"{self.base}.state", "a+") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    next_start, cooldown_until = (float(v) for v in f.read().split())
+                except ValueError:
+                    next_start, cooldown_until = 0.0, 0.0
+                next_start, cooldown_until, result = update(time.time(), next_start, cooldown_until)
+                f.seek(0)
+                f.truncate()
+                f.write(f"{next_start} {cooldown_until}")
+                return result
+
+
+_hosts = {}
+_hosts_lock = threading.Lock()
+_local = threading.local()
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _state(host):
+    with _hosts_lock:
+        state = _hosts.get(host)
+        if state is None:
+            state = _hosts[host] = _HostState(host)
+        return state
+
+
+def _count(host, **amounts):
+    with _stats_lock:
+        entry = _stats.setdefault(host, {"requests": 0, "wait_seconds": 0.0, "throttled": 0})
+        for name, amount in amounts.items():
+            entry[name] += amount
+
+
+# ---------------------------------------
+# SLOTS
+# ---------------------------------------
+
+def acquire(url):
+    """Block until `url`'s host has a free slot and its rate allows a start; returns seconds waited."""
+    host = host_key(url)
+    state = _state(host)
+    start = time.monotonic()
+
+    def _reserve(now, next_start, cooldown_until):
+        ready_at = max(next_start, cooldown_until)
+        if now >= ready_at:
+            return now + state.interval, cooldown_until, 0.0
+        return next_start, cooldown_until, ready_at - now
+
+    state.slots.acquire()
+    try:
+        if state.base is not None:
+            fd = state.take_slot_file()
+            while fd is None:
+                time.sleep(SLOT_POLL_SECONDS)
+                fd = state.take_slot_file()
+            with state.lock:
+                state.held.append(fd)
+        while True:
+            delay = state.update_times(_reserve)
+            if delay <= 0:
+                break
+            time.sleep(min(delay, 1.0))
+    except BaseException:
+        _release(state)
+        raise
+
+    waited = time.monotonic() - start
+    _count(host, requests=1, wait_seconds=waited)
+    _local.wait = getattr(_local, "wait", 0.0) + waited
+    return waited
+
+
+def _release(state):
+    with state.lock:
+        fd = state.held.pop() if state.held else None
+    if fd is not None:
+        os.close(fd)  # drops the flock
+    state.slots.release()
+
+
+def release(url):
+    _release(_state(host_key(url)))
+
+
+@contextmanager
+def host_slot(url):
+    """`with host_slot(url):` around one request to `url`."""
+    acquire(url)
+    try:
+        yield
+    finally:
+        release(url)
+
+
+# ---------------------------------------
+# THROTTLING
+# ---------------------------------------
+
+def _retry_after(value):
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttled(url, status_code):
+    if status_code in THROTTLE_STATUS:
+        return True
+    host = host_key(url)
+    return status_code == 403 and any(host == h or host.endswith("." + h) for h in THROTTLE_403_HOSTS)
+
+
+def note_response(url, status_code, headers=None):
+    """
+    Feed a response status back to the scheduler.
+
+    Throttling responses put the host in a cooldown (Retry-After, capped at
+    FETCH_MAX_COOLDOWN); returns the cooldown in seconds, 0 otherwise.
+    """
+    if not is_throttled(url, status_code):
+        return 0.0
+    host = host_key(url)
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    retry_after = _retry_after(headers.get("retry-after"))
+    cooldown = FETCH_DEFAULT_COOLDOWN if retry_after is None else retry_after
+    cooldown = min(max(cooldown, 0.0), FETCH_MAX_COOLDOWN)
+    _state(host).update_times(
+        lambda now, next_start, cooldown_until: (next_start, max(cooldown_until, now + cooldown), None)
+    )
+    _count(host, throttled=1)
+    print(f"    🐢 {host} throttled (HTTP {status_code}), cooling down {cooldown:.1f}s")
+    return cooldown
+
+
+# ---------------------------------------
+# STATS
+# ---------------------------------------
+
+def thread_wait_seconds():
+    """Total slot wait of the calling thread (diff two readings to time a block)."""
+    return getattr(_local, "wait", 0.0)
+
+
+def scheduler_stats():
+    """Snapshot of the process-wide per-host counters."""
+    with _stats_lock:
+        return {host: dict(entry) for host, entry in _stats.items()}
+
+
+def scheduler_stats_since(snapshot):
+    """Per-host counters accumulated since an earlier scheduler_stats() snapshot."""
+    since = {}
+    for host, entry in scheduler_stats().items():
+        before = snapshot.get(host, {})
+        diff = {
+            "requests": entry["requests"] - before.get("requests", 0),
+            "wait_seconds": round(entry["wait_seconds"] - before.get("wait_seconds", 0.0), 3),
+            "throttled": entry["throttled"] - before.get("throttled", 0),
+        }
+        if diff["requests"] or diff["throttled"]:
+            since[host] = diff
+    return since
@@ -1,25 +1,113 @@
 from google.cloud import storage
+import google.auth
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+import gzip as _gzip
+import json
 import os
+import threading
 
 BUCKET_NAME = "portfolio-reports-confi360"
 
+# Local copies of uploaded artifacts are only written in debug mode.
+# Cloud Run's filesystem is in-memory and counts against the instance limit.
+DEBUG_LOCAL_COPIES = os.environ.get("DEBUG_LOCAL_REPORTS", "").lower() in ("1", "true", "yes")
+DEBUG_REPORTS_DIR = os.environ.get("DEBUG_REPORTS_DIR", "backend/reports")
+
+# Connection pool shared by all threads using the client (upload workers etc.)
+GCS_HTTP_POOL_SIZE = int(os.environ.get("GCS_HTTP_POOL_SIZE", "16"))
+
+_credentials = None
 _storage_client = None
 _bucket = None
+_client_lock = threading.Lock()
 
 def get_bucket():
     global _storage_client, _bucket
     if _bucket is None:
-        if _storage_client is None:
-            _storage_client = storage.Client()
-        _bucket = _storage_client.bucket(BUCKET_NAME)
+        with _client_lock:
+            if _storage_client is None:
+                _storage_client = _create_client()
+            if _bucket is None:
+                _bucket = _storage_client.bucket(BUCKET_NAME)
     return _bucket
 
+def get_credentials():
+    """Application default credentials the storage client was built with."""
+    get_bucket()
+    return _credentials
+
+def _create_client():
+    """Storage client on an AuthorizedSession whose keep-alive pool fits concurrent uploads."""
+    global _credentials
+    _credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+    session = AuthorizedSession(_credentials)
+    adapter = HTTPAdapter(pool_connections=GCS_HTTP_POOL_SIZE, pool_maxsize=GCS_HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    # Without a project the client infers one, as storage.Client() did
+    kwargs = {"project": project} if project else {}
+    return storage.Client(credentials=_credentials, _http=session, **kwargs)
+
+def public_url(gcs_path):
+    return f"https://storage.googleapis.com/{BUCKET_NAME}/{gcs_path}"
+
 def upload_file_to_gcs(local_path, gcs_path, public=True):
     blob = get_bucket().blob(gcs_path)
     blob.upload_from_filename(local_path)
     # Uniform bucket-level access: cannot set object ACLs
     # Public access must be set at the bucket level or use signed URLs
-    return f"https://storage.googleapis.com/{BUCKET_NAME}/{gcs_path}"
+    return public_url(gcs_path)
+
+def upload_bytes_to_gcs(data, gcs_path, content_type="application/octet-stream", gzip=False):
+    """Upload an in-memory payload without touching the local filesystem.
+
+    With gzip=True the payload is stored compressed with Content-Encoding: gzip,
+    GCS transparently decompresses it for clients that don't accept gzip.
+    """
+    blob = get_bucket().blob(gcs_path)
+    if gzip:
+        data = _gzip.compress(data, compresslevel=6)
+        blob.content_encoding = "gzip"
+    blob.upload_from_string(data, content_type=content_type)
+    return public_url(gcs_path)
+
+def upload_stream_to_gcs(stream, gcs_path, content_type="application/octet-stream", gzip=False, size=None):
+    """Upload from a binary file-like object (BytesIO, pipe, response body)."""
+    if gzip:
+        # Compression needs the whole payload; fall back to the bytes path.
+        return upload_bytes_to_gcs(stream.read(), gcs_path, content_type=content_type, gzip=True)
+    blob = get_bucket().blob(gcs_path)
+    blob.upload_from_file(stream, content_type=content_type, size=size, rewind=False)
+    return public_url(gcs_path)
+
+def dumps_compact(obj):
+    """Compact JSON encoding used for every uploaded report."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def upload_json_to_gcs(obj, gcs_path, gzip=False):
+    """Serialise obj compactly and upload it straight from memory."""
+    data = dumps_compact(obj)
+    save_debug_copy(os.path.basename(gcs_path), data)
+    return upload_bytes_to_gcs(
+        data,
+        gcs_path,
+        content_type="application/json; charset=utf-8",
+        gzip=gzip,
+    )
+
+def save_debug_copy(filename, data):
+    """Write a local copy of an artifact, only when DEBUG_LOCAL_REPORTS is set."""
+    if not DEBUG_LOCAL_COPIES:
+        return None
+    try:
+        os.makedirs(DEBUG_REPORTS_DIR, exist_ok=True)
+        path = os.path.join(DEBUG_REPORTS_DIR, filename)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+    except Exception as e:
+        print(f"⚠️ Could not write debug copy {filename}: {e}")
+        return None
 
 def download_file_from_gcs(gcs_path, local_path):
     blob = get_bucket().blob(gcs_path)
@@ -28,3 +116,50 @@ def download_file_from_gcs(gcs_path, local_path):
 def get_public_url(gcs_path):
     blob = get_bucket().blob(gcs_path)
     return blob.public_url
+
+class SigningUnavailable(Exception):
+    """The credentials can neither sign locally nor through IAM signBlob (e.g. user credentials)."""
+
+_signed_url_cache = {}
+_signed_url_lock = threading.Lock()
+
+def generate_signed_url(gcs_path, expires_seconds=3600):
+    """V4 signed GET URL, cached in-process for half of its lifetime.
+
+    On Cloud Run the default credentials have no private key, so signing goes
+    through the IAM signBlob API using the service account's access token.
+    Raises SigningUnavailable for credentials that have no service account.
+    """
+    import time
+    from datetime import timedelta
+
+    now = time.time()
+    with _signed_url_lock:
+        cached = _signed_url_cache.get(gcs_path)
+        if cached and cached[1] > now:
+            return cached[0]
+
+    blob = get_bucket().blob(gcs_path)
+    kwargs = {}
+    credentials = get_credentials()
+    from google.auth.credentials import Signing
+    if not isinstance(credentials, Signing):
+        if not hasattr(credentials, "service_account_email"):
+            raise SigningUnavailable(f"{type(credentials).__name__} cannot sign URLs")
+        import google.auth.transport.requests
+        # Refreshing also resolves the metadata server's "default" account to its email
+        credentials.refresh(google.auth.transport.requests.Request())
+        kwargs["service_account_email"] = credentials.service_account_email
+        kwargs["access_token"] = credentials.token
+
+    url = blob.generate_signed_url(
+        version="v4",
+        expiration=timedelta(seconds=expires_seconds),
+        method="GET",
+        **kwargs,
+    )
+    with _signed_url_lock:
+        if len(_signed_url_cache) > 1024:
+            _signed_url_cache.clear()
+        _signed_url_cache[gcs_path] = (url, now + expires_seconds / 2)
+    return url
@@ -1,8 +1,9 @@
 """
 Helper utility functions
 """
+import os
 import re
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 
 def clean_filename(text, max_length=100):
     """Convert text to safe filename"""
@@ -24,8 +25,103 @@ def is_valid_url(url):
     except:
         return False
 
+def normalize_url(url):
+    """Cache key form of a URL: lowercase scheme/host, no default port or fragment, sorted query"""
+    parsed = urlparse(url.strip())
+    scheme = (parsed.scheme or 'https').lower()
+    host = (parsed.hostname or '').lower()
+    if parsed.port and not ((scheme == 'http' and parsed.port == 80) or (scheme == 'https' and parsed.port == 443)):
+        host = f"{host}:{parsed.port}"
+    path = parsed.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, host, path, '', query, ''))
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {'ref', 'ref_src', 'source', 'fbclid', 'gclid', 'igshid', 'mc_cid', 'mc_eid', 'si'}
+
+def canonicalize_url(url):
+    """Identity form of a page URL: https, no www., no tracking params, fragment or trailing slash"""
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parsed.port and parsed.port not in (80, 443):
+        host = f"{host}:{parsed.port}"
+    path = (parsed.path or '/').rstrip('/') or '/'
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith('utm_')
+    ))
+    return urlunparse(('https', host, path, '', query, ''))
+
+def dedupe_urls(urls):
+    """
+    Drop URLs that canonicalise to one already seen (first spelling wins).
+
+    Returns (unique_urls, aliases) where aliases maps each kept URL to the
+    other spellings that were folded into it.
+    """
+    kept = {}
+    aliases = {}
+    for url in urls:
+        if not url:
+            continue
+        key = canonicalize_url(url)
+        if key not in kept:
+            kept[key] = url
+            aliases[url] = []
+        elif url != kept[key] and url not in aliases[kept[key]]:
+            aliases[kept[key]].append(url)
+    return list(kept.values()), {url: others for url, others in aliases.items() if others}
+
 def truncate_text(text, max_length=500, suffix='...'):
     """Truncate text to max length"""
     if len(text) <= max_length:
         return text
     return text[:max_length - len(suffix)] + suffix
+
+def current_rss_bytes():
+    """Resident set size of this process (Linux /proc, falls back to peak RSS)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def process_tree_rss_bytes(pid=None):
+    """
+    Resident memory of a process plus all its descendants (Linux /proc).
+
+    Covers the Chromium and compression-pool children that do the heavy
+    lifting of a capture; falls back to this process alone elsewhere.
+    """
+    pid = pid or os.getpid()
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    children, rss = {}, {}
+    try:
+        names = os.listdir('/proc')
+    except OSError:
+        return current_rss_bytes()
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open(f'/proc/{name}/statm') as f:
+                rss[int(name)] = int(f.read().split()[1]) * page_size
+            children.setdefault(int(fields[1]), []).append(int(name))
+        except (OSError, ValueError, IndexError):
+            continue
+    if pid not in rss:
+        return current_rss_bytes()
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += rss.get(current, 0)
+        stack.extend(children.get(current, ()))
+    return total
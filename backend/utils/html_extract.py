@@ -0,0 +1,304 @@
+"""
+Single-pass HTML extraction
+
+One streaming walk over the document (lxml's target parser, stdlib
+html.parser as fallback) collects everything the scrapers need: title,
+meta description, headings in document order, visible text, links and
+image stats. No tree is built, so there is nothing to search or decompose
+afterwards.
+
+Visible text is kept only up to a character budget (the prompt only uses
+the start of it); past the budget the walk continues to count total text
+length and images, so memory stays bounded on huge pages.
+"""
+import codecs
+import os
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# Text inside these is not visible page content
+PROJECT_SKIP_TAGS = frozenset(["script", "style", "noscript", "template", "nav", "footer", "header"])
+BASIC_SKIP_TAGS = frozenset(["script", "style", "noscript", "template"])
+
+# Prompts use the first 5000 characters; keep some slack for other consumers
+SCRAPE_TEXT_BUDGET = int(os.environ.get("SCRAPE_TEXT_BUDGET", "8000"))
+MAX_HEADINGS = 200
+
+# Mount points of client-rendered apps; an empty one means the HTML is a shell
+SPA_ROOT_IDS = frozenset(["root", "app", "__next", "__nuxt", "___gatsby", "svelte"])
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4")
+VOID_TAGS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+])
+
+
+def _squash(parts):
+    return " ".join("".join(parts).split())
+
+
+class _Collector:
+    """Parser target: receives start/end/data events and accumulates results."""
+
+    def __init__(self, base_url=None, skip_tags=PROJECT_SKIP_TAGS, max_links=None,
+                 max_text_chars=SCRAPE_TEXT_BUDGET, capture_scripts=()):
+        self.base_url = base_url
+        self.skip_tags = skip_tags
+        self.max_links = max_links
+        self.max_text_chars = max_text_chars
+        self.capture_scripts = frozenset(capture_scripts)
+
+        self.title = None
+        self.first_h1 = None
+        self.meta_description = ""
+        self.headings = []
+        self.links = []
+        self.images = 0
+        self.images_with_alt = 0
+        self.text_parts = []
+        self.text_kept = 0         # characters in text_parts (incl. joining spaces)
+        self.text_total = 0        # characters seen, kept or not
+        self.scripts = {}          # id -> raw content for capture_scripts
+        self.meta = {}             # <meta name|property> -> content
+        self.root_attrs = {}       # attributes of <html> (builder fingerprints)
+        self.spa_root = None
+        self._spa_root_text_start = 0
+
+        self._skip_depth = 0
+        # One visible text node may arrive as several data() calls (chunk
+        # boundaries, entities); it is joined before being stripped and counted
+        self._pending = []
+        self._pending_len = 0
+        self._pending_dropped = 0  # characters past the budget, counted only
+        self._title = None         # text parts while inside <title>
+        self._heading = None       # (tag, parts) while inside h1-h4
+        self._link = None          # (href, parts) while inside <a href>
+        self._script = None        # (id, parts) while inside a captured <script>
+
+    # ---- parser target interface ----
+
+    def start(self, tag, attrib):
+        self._flush_text()
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if tag in VOID_TAGS:
+            self._void(tag, attrib)
+            return
+        if tag == "html" and not self.root_attrs:
+            self.root_attrs = dict(attrib)
+        if tag == "script" and attrib.get("id") in self.capture_scripts:
+            self._script = (attrib["id"], [])
+        elif tag == "div" and self.spa_root is None and attrib.get("id") in SPA_ROOT_IDS:
+            self.spa_root = attrib["id"]
+            self._spa_root_text_start = self.text_total
+        if tag in self.skip_tags:
+            self._skip_depth += 1
+        elif tag == "title":
+            if self.title is None:
+                self._title = []
+        elif tag in HEADING_TAGS:
+            self._heading = (tag, [])
+        elif tag == "a":
+            href = attrib.get("href")
+            if href:
+                self._link = (href, [])
+
+    def end(self, tag):
+        self._flush_text()
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if tag == "script" and self._script is not None:
+            self.scripts[self._script[0]] = "".join(self._script[1])
+            self._script = None
+        if tag in self.skip_tags:
+            if self._skip_depth:
+                self._skip_depth -= 1
+        elif tag == "title" and self._title is not None:
+            self.title = _squash(self._title)
+            self._title = None
+        elif self._heading is not None and tag == self._heading[0]:
+            text = _squash(self._heading[1])
+            if len(self.headings) < MAX_HEADINGS:
+                self.headings.append({"level": tag, "text": text})
+            if tag == "h1" and self.first_h1 is None:
+                self.first_h1 = text
+            self._heading = None
+        elif tag == "a" and self._link is not None:
+            self._add_link(self._link[0], _squash(self._link[1]))
+            self._link = None
+
+    def data(self, text):
+        if self._script is not None:
+            self._script[1].append(text)
+            return
+        if self._title is not None:
+            self._title.append(text)
+            return
+        if self._heading is not None:
+            self._heading[1].append(text)
+        if self._link is not None:
+            self._link[1].append(text)
+        if self._skip_depth:
+            return
+        if self.max_text_chars is None or self._pending_len <= self.max_text_chars - self.text_kept:
+            self._pending.append(text)
+            self._pending_len += len(text)
+        else:
+            self._pending_dropped += len(text)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return self.result()
+
+    # ---- helpers ----
+
+    def _flush_text(self):
+        if not self._pending and not self._pending_dropped:
+            return
+        text = "".join(self._pending).strip()
+        dropped = self._pending_dropped
+        self._pending, self._pending_len, self._pending_dropped = [], 0, 0
+        if not text and not dropped:
+            return
+        size = len(text) + dropped + (1 if self.text_total else 0)
+        self.text_total += size
+        if text and (self.max_text_chars is None or self.text_kept < self.max_text_chars):
+            self.text_parts.append(text)
+            self.text_kept += size
+
+    def _void(self, tag, attrib):
+        if tag == "img":
+            if not self._skip_depth:
+                self.images += 1
+                if attrib.get("alt"):
+                    self.images_with_alt += 1
+        elif tag == "meta":
+            key = (attrib.get("name") or attrib.get("property") or "").lower()
+            if key and key not in self.meta:
+                self.meta[key] = attrib.get("content") or ""
+            if key == "description" and not self.meta_description and attrib.get("content"):
+                self.meta_description = attrib["content"]
+
+    def _add_link(self, href, text):
+        if self.max_links is not None and len(self.links) >= self.max_links:
+            return
+        absolute = urljoin(self.base_url, href) if self.base_url else href
+        if absolute.startswith("http"):
+            self.links.append({"text": text, "href": absolute})
+
+    def result(self):
+        self._flush_text()
+        text = " ".join(self.text_parts)
+        if self.max_text_chars is not None:
+            text = text[:self.max_text_chars]
+        return {
+            "title": self.title or self.first_h1 or "",
+            "meta_description": self.meta_description,
+            "headings": self.headings,
+            "text": text,
+            "text_length": self.text_total,
+            "text_truncated": self.text_total > len(text),
+            "links": self.links,
+            "images": {"total": self.images, "with_alt": self.images_with_alt},
+            "spa_root": self.spa_root,
+            "spa_root_text_length": self.text_total - self._spa_root_text_start if self.spa_root else None,
+            "scripts": self.scripts,
+            "meta": self.meta,
+            "root_attrs": self.root_attrs,
+        }
+
+
+class _StdlibParser(HTMLParser):
+    """Fallback driver feeding the same collector from html.parser events."""
+
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, dict((k, v or "") for k, v in attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.collector.start(tag, dict((k, v or "") for k, v in attrs))
+
+    def handle_endtag(self, tag):
+        if tag not in VOID_TAGS:
+            self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+class HtmlExtractor:
+    """
+    Incremental extractor: feed() bytes or str chunks, then close() for the result.
+
+    Usable on a streamed response body; nothing but the running results is
+    kept in memory.
+    """
+
+    def __init__(self, base_url=None, skip_tags=PROJECT_SKIP_TAGS, max_links=None,
+                 max_text_chars=SCRAPE_TEXT_BUDGET, capture_scripts=(), encoding=None):
+        self.collector = _Collector(
+            base_url=base_url,
+            skip_tags=skip_tags,
+            max_links=max_links,
+            max_text_chars=max_text_chars,
+            capture_scripts=capture_scripts,
+        )
+        if etree is not None:
+            self._parser = etree.HTMLParser(target=self.collector, encoding=encoding, recover=True)
+            self._stdlib = False
+        else:
+            self._parser = _StdlibParser(self.collector)
+            self._stdlib = True
+        # Chunks may split multi-byte characters
+        self._decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+
+    def feed(self, chunk):
+        if self._stdlib and isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        self._parser.feed(chunk)
+
+    def close(self):
+        if self._stdlib:
+            self._parser.close()
+            return self.collector.result()
+        try:
+            return self._parser.close()
+        except etree.XMLSyntaxError:
+            # Empty or unparseable document: whatever was collected so far
+            return self.collector.result()
+
+
+def extract_html(html, base_url=None, skip_tags=PROJECT_SKIP_TAGS, max_links=None, max_text_chars=SCRAPE_TEXT_BUDGET):
+    """One-shot extraction of a whole document (bytes or str)."""
+    extractor = HtmlExtractor(
+        base_url=base_url,
+        skip_tags=skip_tags,
+        max_links=max_links,
+        max_text_chars=max_text_chars,
+    )
+    if html:
+        extractor.feed(html)
+    return extractor.close()
+
+
+def to_project_scrape(url, extracted):
+    """Shape an extraction result like the project scrapers' return value."""
+    return {
+        'url': url,
+        'title': extracted['title'],
+        'meta_description': extracted['meta_description'],
+        'headings': extracted['headings'],
+        'text_content': extracted['text'],
+        'full_text_length': extracted['text_length'],
+        'text_truncated': extracted.get('text_truncated', False),
+        'total_images': extracted['images']['total'],
+    }
@@ -0,0 +1,248 @@
+"""
+Conditional on-disk HTTP cache for static scrapers
+
+Response bodies are stored zlib-compressed in a DiskCache, keyed by the
+normalised URL. Every read is revalidated with If-None-Match /
+If-Modified-Since and a 304 refreshes the entry in place, so an edited page
+is seen on the next analysis. HTTP_CACHE_FRESH_SECONDS (default 0) can allow
+serving recent entries without touching the network. Entries older than
+HTTP_CACHE_MAX_AGE_SECONDS are dropped, and the directory is size-bounded
+(LRU).
+
+stream_get() is the streaming form used by the HTML scrapers: the body is
+handed to a callback chunk by chunk and cut off at SCRAPE_MAX_BYTES, so a
+huge page never sits in memory uncompressed.
+"""
+import json
+import os
+import threading
+import time
+import zlib
+
+from utils.disk_cache import DiskCache
+from utils.helpers import normalize_url
+from utils.http_client import http_get
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join(BACKEND_DIR, "cache", "http"))
+HTTP_CACHE_MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_MB", "64")) * 1024 * 1024
+# Unrevalidated reads could hand a resubmitted, edited site its old page
+HTTP_CACHE_FRESH_SECONDS = int(os.environ.get("HTTP_CACHE_FRESH_SECONDS", "0"))
+HTTP_CACHE_MAX_AGE_SECONDS = int(os.environ.get("HTTP_CACHE_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+HTTP_CACHE_ENABLED = os.environ.get("HTTP_CACHE", "1").lower() in ("1", "true", "yes")
+SCRAPE_MAX_BYTES = int(os.environ.get("SCRAPE_MAX_MB", "5")) * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class CachedResponse:
+    """The subset of requests.Response the scrapers use."""
+
+    def __init__(self, url, status_code, headers, content, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode(_charset(self.headers.get("Content-Type", "")), errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+def _charset(content_type):
+    for part in content_type.split(";"):
+        key, _, value = part.strip().partition("=")
+        if key.lower() == "charset" and value:
+            return value.strip('"')
+    return "utf-8"
+
+
+# ---------------------------------------
+# COUNTERS
+# ---------------------------------------
+
+_stats = {"hits": 0, "misses": 0, "revalidated": 0, "stored_bytes": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def http_cache_stats():
+    """Snapshot of the process-wide counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def http_cache_stats_since(snapshot):
+    """Counters accumulated since an earlier http_cache_stats() snapshot."""
+    now = http_cache_stats()
+    return {key: now[key] - snapshot.get(key, 0) for key in now}
+
+
+# ---------------------------------------
+# CACHE
+# ---------------------------------------
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DiskCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES)
+    return _cache
+
+
+def _from_entry(url, hit):
+    data, meta = hit
+    headers = {"Content-Type": meta.get("content_type", "")}
+    return CachedResponse(meta.get("final_url", url), 200, headers, zlib.decompress(data), from_cache=True)
+
+
+def cached_get(url, headers=None):
+    """
+    GET `url` through the conditional cache.
+
+    Only 200 responses are stored; anything else is returned uncached.
+    """
+    if not HTTP_CACHE_ENABLED:
+        return http_get(url, headers=headers)
+
+    cache = get_http_cache()
+    key = normalize_url(url)
+    hit = cache.read(key, max_age=HTTP_CACHE_MAX_AGE_SECONDS)
+
+    request_headers = dict(headers or {})
+    if hit is not None:
+        _, meta = hit
+        if time.time() - meta.get("stored_at", 0) < HTTP_CACHE_FRESH_SECONDS:
+            _count("hits")
+            return _from_entry(url, hit)
+        if meta.get("etag"):
+            request_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            request_headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = http_get(url, headers=request_headers)
+
+    if response.status_code == 304 and hit is not None:
+        cache.update_meta(key, stored_at=time.time())
+        _count("revalidated")
+        return _from_entry(url, hit)
+
+    _count("misses")
+    if response.status_code == 200:
+        body = zlib.compress(response.content, 6)
+        cache.put(key, body, meta={
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type", ""),
+            "final_url": response.url,
+        })
+        _count("stored_bytes", len(body))
+    return response
+
+
+# ---------------------------------------
+# STREAMING
+# ---------------------------------------
+
+def _replay(hit, on_chunk):
+    """Feed a cached body to on_chunk without inflating it all at once; returns its size."""
+    data, _ = hit
+    decompressor = zlib.decompressobj()
+    size = 0
+    for i in range(0, len(data), STREAM_CHUNK_SIZE):
+        out = decompressor.decompress(data[i:i + STREAM_CHUNK_SIZE])
+        if out:
+            size += len(out)
+            on_chunk(out)
+    tail = decompressor.flush()
+    if tail:
+        size += len(tail)
+        on_chunk(tail)
+    return size
+
+
+def stream_get(url, on_chunk, headers=None, max_bytes=SCRAPE_MAX_BYTES):
+    """
+    GET `url` through the cache, passing the body to on_chunk(bytes) in pieces.
+
+    At most max_bytes are read from the network. Returns a dict with
+    status_code, bytes, truncated, from_cache and the final url.
+    """
+    cache = get_http_cache() if HTTP_CACHE_ENABLED else None
+    key = normalize_url(url)
+    hit = cache.read(key, max_age=HTTP_CACHE_MAX_AGE_SECONDS) if cache else None
+    result = {"status_code": 200, "bytes": 0, "truncated": False, "from_cache": True, "url": url}
+
+    request_headers = dict(headers or {})
+    if hit is not None:
+        _, meta = hit
+        result["url"] = meta.get("final_url", url)
+        result["truncated"] = bool(meta.get("truncated"))
+        if time.time() - meta.get("stored_at", 0) < HTTP_CACHE_FRESH_SECONDS:
+            _count("hits")
+            result["bytes"] = _replay(hit, on_chunk)
+            return result
+        if meta.get("etag"):
+            request_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            request_headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = http_get(url, headers=request_headers, stream=True)
+    try:
+        if response.status_code == 304 and hit is not None:
+            cache.update_meta(key, stored_at=time.time())
+            _count("revalidated")
+            result["bytes"] = _replay(hit, on_chunk)
+            return result
+
+        if cache is not None:
+            _count("misses")
+        result.update(status_code=response.status_code, from_cache=False, truncated=False, url=response.url)
+        if response.status_code != 200:
+            return result
+
+        compressor = zlib.compressobj(6) if cache is not None else None
+        pieces = []
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            if result["bytes"] + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - result["bytes"]]
+                result["truncated"] = True
+            result["bytes"] += len(chunk)
+            on_chunk(chunk)
+            if compressor is not None:
+                pieces.append(compressor.compress(chunk))
+            if result["truncated"]:
+                print(f"    ⚠️  Page over {max_bytes // 1024} KB, truncated: {url}")
+                break
+    finally:
+        response.close()
+
+    if compressor is not None:
+        pieces.append(compressor.flush())
+        body = b"".join(pieces)
+        cache.put(key, body, meta={
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type", ""),
+            "final_url": response.url,
+            "truncated": result["truncated"],
+        })
+        _count("stored_bytes", len(body))
+    return result
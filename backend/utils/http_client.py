@@ -0,0 +1,189 @@
+"""
+Shared HTTP client for static scrapers
+
+One process-wide requests.Session with per-host keep-alive pools, a retry
+adapter for transient failures (connection errors and 5xx), (connect, read)
+timeouts and one consistent set of headers. Every request goes through the
+per-host fetch scheduler; 429/503 responses are retried here once the
+host's Retry-After cooldown has passed.
+
+async_http_get() is the asyncio counterpart: it uses httpx when installed
+and otherwise runs the sync client in a worker thread.
+"""
+import asyncio
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import fetch_scheduler
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode Content-Encoding: br)
+    _ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    _ACCEPT_ENCODING = "gzip, deflate"
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "15"))
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "16"))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_SECONDS = 0.5
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# Throttling statuses are retried by http_get() via the scheduler, not the adapter
+ADAPTER_RETRY_STATUS = tuple(s for s in RETRY_STATUS if s not in fetch_scheduler.THROTTLE_STATUS)
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,application/json;q=0.8,*/*;q=0.7",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": _ACCEPT_ENCODING,
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_SECONDS,
+        status_forcelist=ADAPTER_RETRY_STATUS,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,  # hand the last response back to the caller
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Process-wide pooled session (thread-safe lazy init)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def http_get(url, headers=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """
+    GET through the shared session and the per-host scheduler; extra headers
+    are merged over the defaults. Throttled responses are retried up to
+    HTTP_MAX_RETRIES times, after which the last one is returned.
+    """
+    session = get_session()
+    attempt = 0
+    while True:
+        with fetch_scheduler.host_slot(url):
+            response = session.get(url, headers=headers, timeout=timeout, **kwargs)
+        cooldown = fetch_scheduler.note_response(url, response.status_code, response.headers)
+        # A throttling 403 only cools the host down; retrying it rarely helps
+        if not cooldown or response.status_code not in fetch_scheduler.THROTTLE_STATUS or attempt >= HTTP_MAX_RETRIES:
+            return response
+        response.close()
+        attempt += 1
+
+
+# ---------------------------------------
+# ASYNC VARIANT
+# ---------------------------------------
+
+# httpx clients are bound to the event loop that created them
+_async_clients = {}
+_async_clients_lock = threading.Lock()
+
+
+def _get_async_client():
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                headers=DEFAULT_HEADERS,
+                timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_keepalive_connections=HTTP_POOL_SIZE, max_connections=HTTP_POOL_SIZE * 4),
+                transport=httpx.AsyncHTTPTransport(retries=HTTP_MAX_RETRIES),  # connect errors only
+                follow_redirects=True,
+            )
+            _async_clients[loop] = client
+    return client
+
+
+def _retry_after_seconds(response, attempt):
+    value = response.headers.get("Retry-After")
+    if value:
+        try:
+            return min(float(value), 30.0)
+        except ValueError:
+            pass
+    return HTTP_BACKOFF_SECONDS * (2 ** attempt)
+
+
+async def _async_slot_get(client, url, kwargs):
+    # The scheduler is thread-based; wait for the slot off the event loop
+    await asyncio.to_thread(fetch_scheduler.acquire, url)
+    try:
+        return await client.get(url, **kwargs)
+    finally:
+        fetch_scheduler.release(url)
+
+
+async def async_http_get(url, headers=None, timeout=None):
+    """
+    Async GET with the same headers and retry policy as http_get().
+
+    Returns an httpx.Response when httpx is installed, otherwise the
+    requests.Response from http_get() run in a thread. Both expose
+    status_code, headers, content, text and json().
+    """
+    if httpx is None:
+        return await asyncio.to_thread(http_get, url, headers=headers, timeout=timeout or DEFAULT_TIMEOUT)
+
+    client = _get_async_client()
+    kwargs = {"headers": headers}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    attempt = 0
+    while True:
+        response = await _async_slot_get(client, url, kwargs)
+        if response.status_code not in RETRY_STATUS or attempt >= HTTP_MAX_RETRIES:
+            return response
+        # Throttling puts the host in a cooldown that the next slot wait honours
+        if not fetch_scheduler.note_response(url, response.status_code, response.headers):
+            await asyncio.sleep(_retry_after_seconds(response, attempt))
+        attempt += 1
+
+
+async def close_async_clients():
+    """Close the httpx client owned by the running loop (call before the loop ends)."""
+    if httpx is None:
+        return
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,425 @@
+"""
+Durable, bounded job queue for analysis jobs
+
+/analyze used to start one daemon thread per request: no admission control
+(a burst launched dozens of Chromiums) and every job in flight was lost when
+the instance stopped. Jobs are now written to a JobStore and run by a fixed
+pool of JOB_WORKERS threads; submissions beyond MAX_QUEUED_JOBS waiting jobs
+are rejected with a retry hint.
+
+Running jobs hold a lease that their worker renews every
+JOB_HEARTBEAT_SECONDS. A job whose lease has expired (its process died) is
+put back in the queue, so queued and interrupted jobs resume after a
+restart. The store is pluggable (JOB_STORE); the default is SQLite on local
+disk, which several worker processes on one instance can share. It also
+holds each job's stage/project checkpoints (see utils/checkpoints.py), which
+are dropped once the job has finished.
+
+Durability is only as good as the disk under JOB_DB_PATH. On Cloud Run the
+container filesystem is in memory and per instance: jobs and checkpoints
+survive a crashed or restarted worker process, but not the instance being
+replaced or scaled to zero. Surviving that needs JOB_DB_PATH on a volume
+that outlives the instance, or a JobStore backend on a shared service.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOB_STORE = os.environ.get("JOB_STORE", "sqlite").lower()
+# Same-instance durability only unless this is on a persistent volume (see above)
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", os.path.join(BACKEND_DIR, "cache", "jobs.sqlite3"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", "20"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_HEARTBEAT_SECONDS = 30
+# A running job whose lease is older than this is considered orphaned
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "120"))
+JOB_POLL_SECONDS = 2.0
+# Retry hint before any job has finished in this process
+DEFAULT_JOB_SECONDS = 180.0
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+ABANDONED_ERROR = "worker lost too many times"
+
+
+class QueueFull(Exception):
+    """Raised by submit() when the backlog is at MAX_QUEUED_JOBS."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+# ---------------------------------------
+# STORES
+# ---------------------------------------
+
+class JobStore:
+    """Persistence interface for the queue; implementations must make claim() atomic."""
+
+    def add(self, job_id, payload, max_queued=None):
+        """
+        Queue a job unless `max_queued` jobs are already waiting; the check and
+        the insert are one atomic step. Returns whether the job was added.
+        """
+        raise NotImplementedError
+
+    def claim(self, worker):
+        """Move the oldest queued job to running; returns (job_id, payload, attempts) or None."""
+        raise NotImplementedError
+
+    def heartbeat(self, job_ids):
+        raise NotImplementedError
+
+    def finish(self, job_id, state, error=None):
+        raise NotImplementedError
+
+    def requeue_expired(self, lease_seconds, max_attempts):
+        """Return orphaned running jobs to the queue, failing those past max_attempts.
+
+        Returns (requeued ids, abandoned ids).
+        """
+        raise NotImplementedError
+
+    def counts(self):
+        """{state: number of jobs}"""
+        raise NotImplementedError
+
+    def position(self, job_id):
+        """1-based position of a queued job, or None."""
+        raise NotImplementedError
+
+    def save_checkpoint(self, job_id, key, value):
+        """Store (or replace) one JSON-serialisable checkpoint of a job."""
+        raise NotImplementedError
+
+    def load_checkpoints(self, job_id):
+        """{key: value} of every checkpoint saved for a job."""
+        raise NotImplementedError
+
+    def clear_checkpoints(self, job_id):
+        raise NotImplementedError
+
+
+class SqliteJobStore(JobStore):
+    """Jobs table in a local SQLite file (WAL, one connection per thread)."""
+
+    def __init__(self, path=JOB_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.environ.get("K_SERVICE") and "JOB_DB_PATH" not in os.environ:
+            print("⚠️  Job store is on the instance's in-memory disk: queued jobs and checkpoints "
+                  "are lost when the instance is replaced (set JOB_DB_PATH to a persistent volume)")
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    heartbeat_at REAL,
+                    finished_at REAL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at)")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    job_id TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    saved_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, key)
+                )
+            """)
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return _Transaction(db)
+
+    def add(self, job_id, payload, max_queued=None):
+        with self._connect() as db:
+            if max_queued is not None:
+                queued = db.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+                if queued >= max_queued:
+                    return False
+            db.execute(
+                "INSERT INTO jobs (id, payload, state, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, json.dumps(payload), QUEUED, time.time()),
+            )
+        return True
+
+    def claim(self, worker):
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id, payload, attempts FROM jobs WHERE state = ? ORDER BY created_at LIMIT 1",
+                (QUEUED,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET state = ?, worker = ?, attempts = attempts + 1, "
+                "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (RUNNING, worker, now, now, row[0]),
+            )
+        return row[0], json.loads(row[1]), row[2] + 1
+
+    def heartbeat(self, job_ids):
+        if not job_ids:
+            return
+        with self._connect() as db:
+            db.executemany(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND state = ?",
+                [(time.time(), job_id, RUNNING) for job_id in job_ids],
+            )
+
+    def finish(self, job_id, state, error=None):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET state = ?, error = ?, finished_at = ? WHERE id = ?",
+                (state, error, time.time(), job_id),
+            )
+
+    def requeue_expired(self, lease_seconds, max_attempts):
+        cutoff = time.time() - lease_seconds
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, attempts FROM jobs WHERE state = ? AND heartbeat_at < ?",
+                (RUNNING, cutoff),
+            ).fetchall()
+            requeued, abandoned = [], []
+            for job_id, attempts in rows:
+                if attempts >= max_attempts:
+                    db.execute(
+                        "UPDATE jobs SET state = ?, error = ?, finished_at = ? WHERE id = ?",
+                        (FAILED, ABANDONED_ERROR, time.time(), job_id),
+                    )
+                    db.execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+                    abandoned.append(job_id)
+                else:
+                    db.execute("UPDATE jobs SET state = ?, worker = NULL WHERE id = ?", (QUEUED, job_id))
+                    requeued.append(job_id)
+        return requeued, abandoned
+
+    def counts(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return dict(rows)
+
+    def position(self, job_id):
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = ? AND created_at <= "
+                "(SELECT created_at FROM jobs WHERE id = ? AND state = ?)",
+                (QUEUED, job_id, QUEUED),
+            ).fetchone()
+        return row[0] or None
+
+    def save_checkpoint(self, job_id, key, value):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO checkpoints (job_id, key, value, saved_at) VALUES (?, ?, ?, ?)",
+                (job_id, key, json.dumps(value), time.time()),
+            )
+
+    def load_checkpoints(self, job_id):
+        with self._connect() as db:
+            rows = db.execute("SELECT key, value FROM checkpoints WHERE job_id = ?", (job_id,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def clear_checkpoints(self, job_id):
+        with self._connect() as db:
+            db.execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+
+
+class _Transaction:
+    """`with` block that runs as one IMMEDIATE transaction (claims are atomic across processes)."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+JOB_STORE_BACKENDS = {
+    "sqlite": SqliteJobStore,
+}
+
+
+def create_job_store(kind=JOB_STORE):
+    try:
+        return JOB_STORE_BACKENDS[kind]()
+    except KeyError:
+        raise ValueError(f"Unknown JOB_STORE backend: {kind}") from None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """Process-wide JobStore shared by the queue and the checkpoints (thread-safe lazy init)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_job_store()
+    return _store
+
+
+# ---------------------------------------
+# QUEUE
+# ---------------------------------------
+
+class JobQueue:
+    """
+    Fixed pool of workers running `handler(job_id, payload)` for jobs in a JobStore.
+
+    `on_abandoned(job_id, error)` is called for each job failed because its
+    worker was lost too many times (the handler never got to report it).
+    """
+
+    def __init__(self, handler, store=None, workers=JOB_WORKERS, max_queued=MAX_QUEUED_JOBS,
+                 on_abandoned=None):
+        self.handler = handler
+        self.on_abandoned = on_abandoned
+        self.store = store or get_job_store()
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = threading.Condition()
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._avg_seconds = DEFAULT_JOB_SECONDS
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Requeue jobs orphaned by a previous process and start the workers (idempotent)."""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        self._requeue_expired()
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True).start()
+        threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+
+    # --- admission ---
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up (for the 429 hint)."""
+        queued = self.store.counts().get(QUEUED, 0)
+        return max(5, int(self._avg_seconds * (queued + 1) / self.workers))
+
+    def check_capacity(self):
+        """Raise QueueFull when the backlog is at the limit (cheap pre-check; submit() enforces it)."""
+        if self.store.counts().get(QUEUED, 0) >= self.max_queued:
+            raise QueueFull(self.retry_after())
+
+    def submit(self, job_id, payload):
+        """Persist a job; returns its queue position. Raises QueueFull when the backlog is full."""
+        if not self.store.add(job_id, payload, max_queued=self.max_queued):
+            raise QueueFull(self.retry_after())
+        with self._wakeup:
+            self._wakeup.notify()
+        return self.store.position(job_id) or 0
+
+    def stats(self):
+        counts = self.store.counts()
+        return {
+            "queued": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "avg_job_seconds": round(self._avg_seconds, 1),
+        }
+
+    # --- workers ---
+
+    def _worker(self):
+        while True:
+            try:
+                claimed = self.store.claim(self.worker_id)
+            except Exception as e:
+                print(f"⚠️  Job store error: {e}")
+                claimed = None
+            if claimed is None:
+                with self._wakeup:
+                    self._wakeup.wait(JOB_POLL_SECONDS)
+                continue
+            self._run(*claimed)
+
+    def _run(self, job_id, payload, attempt):
+        print(f"🚚 Job {job_id} started (attempt {attempt}, worker {self.worker_id})")
+        with self._running_lock:
+            self._running.add(job_id)
+        start = time.perf_counter()
+        try:
+            self.handler(job_id, payload)
+            state, error = DONE, None
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            state, error = FAILED, str(e)
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
+        elapsed = time.perf_counter() - start
+        self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+        self.store.finish(job_id, state, error)
+        # Checkpoints only serve to resume an interrupted run
+        self.store.clear_checkpoints(job_id)
+        print(f"🏁 Job {job_id} {state} in {elapsed:.1f}s")
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT_SECONDS)
+            with self._running_lock:
+                running = list(self._running)
+            try:
+                self.store.heartbeat(running)
+                # Pick up jobs orphaned by another process on this instance
+                if self._requeue_expired():
+                    with self._wakeup:
+                        self._wakeup.notify_all()
+            except Exception as e:
+                print(f"⚠️  Job heartbeat failed: {e}")
+
+    def _requeue_expired(self):
+        """Requeue orphaned jobs and report abandoned ones; returns the requeued ids."""
+        requeued, abandoned = self.store.requeue_expired(JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS)
+        if requeued:
+            print(f"♻️  Requeued {len(requeued)} interrupted job(s): {', '.join(requeued)}")
+        for job_id in abandoned:
+            print(f"🪦 Job {job_id} abandoned: {ABANDONED_ERROR}")
+            if self.on_abandoned is not None:
+                try:
+                    self.on_abandoned(job_id, ABANDONED_ERROR)
+                except Exception as e:
+                    print(f"⚠️  Could not report abandoned job {job_id}: {e}")
+        return requeued
@@ -0,0 +1,160 @@
+"""
+Incremental re-analysis of a resubmitted portfolio
+
+Every run records, per case study, a hash of the page's extracted text, the
+content hash of the screenshot Gemini scored, and the resulting analysis.
+The record is one JSON object in GCS at reanalysis/<hmac>.json, where the
+name is an HMAC-SHA256 of the canonical portfolio URL and the user under
+REANALYSIS_INDEX_SECRET. The bucket is public, so the name must not be
+derivable from the URL and user id alone. Without the secret no index is read
+or written and every run scores all projects. When the same user re-analyses the same
+portfolio with reanalyze on, a project whose extracted text is unchanged
+keeps its previous analysis instead of being scored again; new and changed
+projects go through Gemini as usual. Reused reports carry "reused": true
+and "reused_from".
+
+The decision rests on the text hash alone. The Gemini prompt is built from
+the scraped text (the screenshot only goes in as its URL), and screenshots
+are fresh lossy encodes whose bytes rarely repeat even for an identical
+page, so a byte-level screenshot match would almost never allow reuse. The
+screenshot hash is still compared and reported as "screenshot_changed".
+"""
+import hashlib
+import hmac
+import json
+import os
+import re
+from datetime import datetime
+from urllib.parse import urlparse
+
+from utils.gcs_utils import get_bucket
+from utils.helpers import canonicalize_url
+from utils.upload_queue import enqueue_json
+
+REANALYSIS_PREFIX = "reanalysis/"
+REANALYSIS_INDEX_VERSION = 1
+# Server-side key for index object names; must be the same on every instance
+REANALYSIS_INDEX_SECRET = os.environ.get("REANALYSIS_INDEX_SECRET", "").encode()
+# Screenshot URLs are content addressed: .../screenshots/cas/<sha256>.<ext>
+_CAS_DIGEST = re.compile(r"/screenshots/cas/([0-9a-f]{64})\.\w+$")
+
+
+_secret_warned = False
+
+
+def index_path(portfolio_url, user_id):
+    """GCS path of a portfolio/user run index, or None without REANALYSIS_INDEX_SECRET."""
+    global _secret_warned
+    if not REANALYSIS_INDEX_SECRET:
+        if not _secret_warned:
+            _secret_warned = True
+            print("⚠️ REANALYSIS_INDEX_SECRET not set, re-analysis indexes disabled.")
+        return None
+    key = f"{canonicalize_url(portfolio_url)}|{user_id}"
+    digest = hmac.new(REANALYSIS_INDEX_SECRET, key.encode('utf-8'), hashlib.sha256).hexdigest()
+    return f"{REANALYSIS_PREFIX}{digest}.json"
+
+
+def text_hash(scraped_data):
+    """sha256 of a scrape's extracted text, whitespace-normalised."""
+    text = (scraped_data or {}).get('text_content') or (scraped_data or {}).get('content') or ''
+    return hashlib.sha256(" ".join(text.split()).encode('utf-8')).hexdigest()
+
+
+def screenshot_digest(screenshot_url):
+    """Content hash encoded in a stored screenshot's URL, or None."""
+    match = _CAS_DIGEST.search(urlparse(screenshot_url or '').path)
+    return match.group(1) if match else None
+
+
+def load_run_index(portfolio_url, user_id):
+    """Index written by the user's last run on this portfolio, or None."""
+    path = index_path(portfolio_url, user_id)
+    if path is None:
+        return None
+    try:
+        blob = get_bucket().blob(path)
+        return json.loads(blob.download_as_bytes())
+    except Exception:
+        return None
+
+
+class RunIndex:
+    """Per-project hashes and analyses of one run; reuse lookups against the previous run."""
+
+    def __init__(self, portfolio_url, user_id, report_id=None, reuse=False):
+        self.portfolio_url = portfolio_url
+        self.user_id = user_id
+        self.report_id = report_id
+        self.reuse = reuse
+        # Loaded even without reuse: projects failing this run keep their last entry
+        self.previous = (load_run_index(portfolio_url, user_id) or {}) if user_id else {}
+        self.projects = {}
+        self.reused = []
+        if reuse and self.previous:
+            print(f"♻️ Re-analysis: {len(self.previous.get('projects', {}))} projects from "
+                  f"report {self.previous.get('report_id')}")
+
+    def reusable(self, link, text_digest, screenshot_url):
+        """
+        Previous entry for `link` (plus "screenshot_changed") if its text is
+        unchanged, else None.
+        """
+        if not self.reuse or not text_digest:
+            return None
+        entry = self.previous.get('projects', {}).get(canonicalize_url(link))
+        if not entry or not entry.get('analysis') or entry.get('text_hash') != text_digest:
+            return None
+        digest = screenshot_digest(screenshot_url)
+        return {**entry, "screenshot_changed": not digest or entry.get('screenshot_sha256') != digest}
+
+    def record(self, link, text_digest, screenshot_url, report, report_url, reused_from=None):
+        entry = {
+            "url": link,
+            "text_hash": text_digest,
+            "screenshot_sha256": screenshot_digest(screenshot_url),
+            "project_name": report.get("project_name"),
+            "analysis": report.get("analysis"),
+            "report_url": report_url,
+            "report_id": self.report_id,
+            "generated_at": report.get("generated_at"),
+        }
+        if reused_from:
+            # Keep pointing at the run that actually scored it
+            entry.update(reused_from)
+            self.reused.append(link)
+        self.projects[canonicalize_url(link)] = entry
+
+    def keep_previous(self, link):
+        """A project that failed this run keeps its last good entry."""
+        key = canonicalize_url(link)
+        entry = self.previous.get('projects', {}).get(key)
+        if entry and key not in self.projects:
+            self.projects[key] = entry
+
+    def publish(self, job=None):
+        path = index_path(self.portfolio_url, self.user_id) if self.user_id else None
+        if path is None:
+            return None
+        return enqueue_json(
+            {
+                "version": REANALYSIS_INDEX_VERSION,
+                "portfolio_url": self.portfolio_url,
+                "user_id": self.user_id,
+                "report_id": self.report_id,
+                "updated_at": datetime.now().isoformat(),
+                "projects": self.projects,
+            },
+            path,
+            job=job,
+            coalesce=True,
+        )
+
+
+def reused_from(entry):
+    """The "reused_from" block of a carried-forward report."""
+    return {
+        "report_id": entry.get("report_id"),
+        "report_url": entry.get("report_url"),
+        "generated_at": entry.get("generated_at"),
+    }
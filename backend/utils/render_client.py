@@ -0,0 +1,111 @@
+"""
+Client for the out-of-process render service
+
+Browser work (page renders, screenshots, browser-based portfolio scrapers)
+is named by an op in RENDER_OPS. run(op, ...) sends it to the render service
+(render_service.py) over a local multiprocessing connection when
+RENDER_SERVICE_ADDRESS is set, so Chromium never runs inside the web/job
+process. When the service is not configured or not reachable, the op runs
+in-process exactly as before; inside the service's own workers ops always
+run locally.
+
+The service unpickles what clients send, so connections are authenticated
+with RENDER_SERVICE_AUTHKEY. There is no default key: setting
+RENDER_SERVICE_ADDRESS without it fails at import (start.sh generates one).
+"""
+import importlib
+import os
+import threading
+import time
+from multiprocessing.connection import Client
+
+# "host:port" or a Unix socket path; empty = render in-process
+RENDER_SERVICE_ADDRESS = os.environ.get("RENDER_SERVICE_ADDRESS", "")
+RENDER_SERVICE_AUTHKEY = os.environ.get("RENDER_SERVICE_AUTHKEY", "").encode()
+RENDER_CALL_TIMEOUT = float(os.environ.get("RENDER_CALL_TIMEOUT", "300"))
+# After a failed connect, render in-process for this long before trying again
+RENDER_RECONNECT_SECONDS = 30
+IN_RENDER_WORKER = os.environ.get("RENDER_SERVICE_WORKER") == "1"
+
+if RENDER_SERVICE_ADDRESS and not RENDER_SERVICE_AUTHKEY:
+    raise RuntimeError("RENDER_SERVICE_AUTHKEY must be set when RENDER_SERVICE_ADDRESS is")
+
+# op name -> "module:function"; the service and the local fallback run the same callable
+RENDER_OPS = {
+    "render_page": "scrapers.tiered_fetch:render_page_pooled",
+    "designfolio_project": "analysis.casestudies:scrape_designfolio_with_context",
+    "portfolio_behance": "scrapers.behance:extract",
+    "portfolio_designfolio": "scrapers.designfolio:extract",
+    "portfolio_notion": "scrapers.notion:extract",
+    "screenshot": "analysis.screenshot:screenshot_op",
+    "screenshot_preview": "analysis.screenshot:preview_op",
+    "viewports": "analysis.screenshot:viewports_op",
+}
+
+
+class RenderError(Exception):
+    """The op failed in the service (exception, worker crash, timeout or memory limit)."""
+
+
+class RenderServiceUnavailable(Exception):
+    """The service is not configured or could not be reached."""
+
+
+def parse_address(value):
+    host, sep, port = value.rpartition(":")
+    if sep and port.isdigit() and "/" not in value:
+        return host or "127.0.0.1", int(port)
+    return value
+
+
+def resolve_op(op):
+    module_name, _, attr = RENDER_OPS[op].partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+_down_until = 0.0
+_down_lock = threading.Lock()
+
+
+def service_enabled():
+    return bool(RENDER_SERVICE_ADDRESS) and not IN_RENDER_WORKER and time.monotonic() >= _down_until
+
+
+def _mark_down(error):
+    global _down_until
+    with _down_lock:
+        _down_until = time.monotonic() + RENDER_RECONNECT_SECONDS
+    print(f"⚠️  Render service unreachable ({error}); rendering in-process for {RENDER_RECONNECT_SECONDS}s")
+
+
+def call(op, *args, timeout=RENDER_CALL_TIMEOUT, **kwargs):
+    """Run `op` in the render service; raises RenderServiceUnavailable or RenderError."""
+    if not service_enabled():
+        raise RenderServiceUnavailable(op)
+    try:
+        conn = Client(parse_address(RENDER_SERVICE_ADDRESS), authkey=RENDER_SERVICE_AUTHKEY)
+    except (OSError, EOFError) as e:
+        _mark_down(e)
+        raise RenderServiceUnavailable(str(e)) from e
+
+    try:
+        conn.send((op, args, kwargs, timeout))
+        # The service enforces `timeout` itself; leave it a margin to report back
+        if not conn.poll(timeout + 30):
+            raise RenderError(f"{op}: no reply from render service")
+        status, value = conn.recv()
+    except (OSError, EOFError) as e:
+        raise RenderError(f"{op}: connection lost ({e})") from e
+    finally:
+        conn.close()
+    if status != "ok":
+        raise RenderError(f"{op}: {value}")
+    return value
+
+
+def run(op, *args, **kwargs):
+    """Run `op` in the render service when available, otherwise in this process."""
+    try:
+        return call(op, *args, **kwargs)
+    except RenderServiceUnavailable:
+        return resolve_op(op)(*args, **kwargs)
@@ -0,0 +1,172 @@
+"""
+Per-job report manifest
+
+The pipeline keeps one compressed JSON object per job (`<job>/manifest.json`)
+holding the portfolio report and the already-normalised case-study summaries
+the frontend renders. It is rewritten after every completed project, so
+/reports can answer with a single object read instead of listing and
+downloading every report.
+"""
+import gzip
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+MANIFEST_CACHE_SIZE = 256
+# Manifests of running jobs change as projects finish; keep them briefly only.
+MANIFEST_CACHE_TTL_SECONDS = 5
+
+
+def normalize_case_study(content):
+    """Map a stored project report to the shape expected by the frontend."""
+    if not isinstance(content, dict):
+        return content
+    analysis = content.get("analysis", {}) or {}
+    scraped = content.get("scraped_data", {}) or {}
+    # Prefer project_name saved in report; fallback to title or URL
+    project_name = content.get("project_name") or scraped.get("title") or (content.get("url") or "").split("/")[-1]
+    return {
+        "type": "case_study",
+        "url": content.get("url"),
+        "project_name": project_name,
+        "category": "UX/UI",
+        # map snake_case to camelCase expected by frontend
+        "overallScore": analysis.get("overall_score", 0) or 0,
+        "phase_scores": analysis.get("phase_scores", []) or [],
+        "ux_keywords": analysis.get("ux_keywords", []) or [],
+        "improvements": analysis.get("improvements", []) or [],
+        "verdict": analysis.get("verdict", "") or "",
+        "summary": analysis.get("overall_feedback", "") or "",
+        "screenshot": content.get("screenshot"),
+        "screenshot_variants": content.get("screenshot_variants"),
+        "screenshots_by_viewport": content.get("screenshots_by_viewport"),
+        "aliases": content.get("aliases") or [],
+        "reused": bool(content.get("reused")),
+        "reused_from": content.get("reused_from"),
+    }
+
+
+def manifest_path(gcs_folder):
+    return f"{gcs_folder}{MANIFEST_NAME}"
+
+
+class ReportManifest:
+    """Incrementally built manifest for one job, published through the upload queue."""
+
+    def __init__(self, gcs_folder, report_id=None):
+        self.gcs_folder = gcs_folder
+        self.report_id = report_id
+        self._lock = threading.Lock()
+        self._portfolio = None
+        self._case_studies = OrderedDict()
+        self._status = "processing"
+
+    def set_portfolio(self, portfolio_report):
+        with self._lock:
+            portfolio = dict(portfolio_report)
+            portfolio.setdefault("type", "portfolio")
+            self._portfolio = portfolio
+        return self.publish()
+
+    def add_case_study(self, report, report_url=None):
+        """Add (or replace) the summary for one project report."""
+        summary = normalize_case_study(report)
+        if report_url:
+            summary["report_url"] = report_url
+        with self._lock:
+            self._case_studies[summary.get("url")] = summary
+        return self.publish()
+
+    def update_case_study(self, url, **fields):
+        """Patch fields of an existing summary (e.g. a replaced screenshot)."""
+        with self._lock:
+            summary = self._case_studies.get(url)
+            if summary is None:
+                return None
+            summary.update(fields)
+        return self.publish()
+
+    def mark_complete(self):
+        with self._lock:
+            self._status = "complete"
+        return self.publish()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "version": MANIFEST_VERSION,
+                "report_id": self.report_id,
+                "status": self._status,
+                "updated_at": datetime.now().isoformat(),
+                "portfolio": self._portfolio,
+                "case_studies": list(self._case_studies.values()),
+            }
+
+    def publish(self):
+        """Queue the current snapshot; older queued snapshots are skipped."""
+        from utils.upload_queue import enqueue_json
+        return enqueue_json(
+            self.to_dict(),
+            manifest_path(self.gcs_folder),
+            gzip=True,
+            job=self.gcs_folder,
+            coalesce=True,
+        )
+
+
+# ---------------------------------------
+# READ SIDE (Flask /reports)
+# ---------------------------------------
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(report_id):
+    with _cache_lock:
+        entry = _cache.get(report_id)
+        if entry is None:
+            return None
+        manifest, fetched_at = entry
+        if manifest.get("status") != "complete" and time.monotonic() - fetched_at > MANIFEST_CACHE_TTL_SECONDS:
+            _cache.pop(report_id, None)
+            return None
+        _cache.move_to_end(report_id)
+        return manifest
+
+
+def _cache_put(report_id, manifest):
+    with _cache_lock:
+        _cache[report_id] = (manifest, time.monotonic())
+        _cache.move_to_end(report_id)
+        while len(_cache) > MANIFEST_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def load_manifest(bucket, report_id):
+    """Return the job's manifest dict (LRU-cached) or None for legacy jobs."""
+    cached = _cache_get(report_id)
+    if cached is not None:
+        return cached
+
+    try:
+        from google.api_core.exceptions import NotFound
+    except ImportError:
+        NotFound = ()
+
+    try:
+        raw = bucket.blob(manifest_path(f"{report_id}/")).download_as_bytes()
+    except NotFound:
+        return None
+
+    # GCS normally decompresses on the fly; handle raw gzip defensively.
+    if raw[:2] == b"\x1f\x8b":
+        raw = gzip.decompress(raw)
+    manifest = json.loads(raw)
+    _cache_put(report_id, manifest)
+    return manifest
@@ -0,0 +1,75 @@
+"""
+SimHash fingerprints for near-duplicate case-study detection
+
+The same case study is often published twice (a Notion page and the
+personal site, a Behance mirror, a Medium cross-post). Their scraped text
+differs only in chrome and formatting, so a 64-bit SimHash over word
+shingles lands within a few bits; exact URL matching cannot see that.
+"""
+import hashlib
+import os
+import re
+import threading
+
+SIMHASH_BITS = 64
+SIMHASH_SHINGLE = 3
+# Max differing bits for two texts to count as the same case study
+SIMHASH_MAX_DISTANCE = int(os.environ.get("SIMHASH_MAX_DISTANCE", "3"))
+# Shorter texts (failed or near-empty scrapes) are never fingerprinted
+SIMHASH_MIN_TEXT = 500
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _shingles(text):
+    words = _WORD.findall(text.lower())
+    if len(words) < SIMHASH_SHINGLE:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + SIMHASH_SHINGLE]) for i in range(len(words) - SIMHASH_SHINGLE + 1)]
+
+
+def simhash(text):
+    """64-bit SimHash of `text`, or None when it is too short to compare."""
+    if not text or len(text) < SIMHASH_MIN_TEXT:
+        return None
+    weights = [0] * SIMHASH_BITS
+    for shingle in _shingles(text):
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class NearDuplicateIndex:
+    """Fingerprints seen so far in one job, each mapped to the key it was added with."""
+
+    def __init__(self, max_distance=SIMHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._entries = []
+        self._lock = threading.Lock()
+
+    def find(self, fingerprint):
+        """(key, distance) of the closest entry within max_distance, or None."""
+        if fingerprint is None:
+            return None
+        with self._lock:
+            best = None
+            for known, key in self._entries:
+                distance = hamming(fingerprint, known)
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (key, distance)
+            return best
+
+    def add(self, fingerprint, key):
+        if fingerprint is None:
+            return
+        with self._lock:
+            self._entries.append((fingerprint, key))
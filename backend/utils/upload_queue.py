@@ -0,0 +1,258 @@
+"""
+Background upload queue for GCS artifacts
+
+Uploads are taken off the pipeline's critical path: callers enqueue a payload
+and immediately get back the (deterministic) public URL. A small pool of worker
+threads drains a bounded queue, retrying transient failures with exponential
+backoff. Object names are decided by the caller before enqueueing, so a retry
+always rewrites the same object and is idempotent.
+
+Each upload is tagged with a job key (the job's GCS folder). flush_uploads(job)
+is the per-job barrier that must run before a job is marked complete; it
+runs once, at the end, and its stats (failures included) cover every upload
+of the job. upload_stats(job) is a non-blocking snapshot for progress reports.
+
+Uploads of the same path are coalesced by default: they are serialised (so
+an older version can never finish after a newer one and overwrite it) and a
+queued version that has already been superseded is skipped. Pass
+coalesce=False only for paths that are written exactly once.
+"""
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from utils.gcs_utils import upload_bytes_to_gcs, dumps_compact, save_debug_copy, public_url
+
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", "4"))
+UPLOAD_QUEUE_SIZE = int(os.environ.get("UPLOAD_QUEUE_SIZE", "64"))
+UPLOAD_MAX_ATTEMPTS = int(os.environ.get("UPLOAD_MAX_ATTEMPTS", "5"))
+UPLOAD_BACKOFF_SECONDS = float(os.environ.get("UPLOAD_BACKOFF_SECONDS", "0.5"))
+
+_TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def _is_transient(exc):
+    """Best-effort classification of retryable storage errors."""
+    code = getattr(exc, "code", None)
+    if code in _TRANSIENT_STATUS:
+        return True
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import requests
+        if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+    except ImportError:
+        pass
+    try:
+        from google.api_core import exceptions as gexc
+        # ServerError covers the 5xx family; 408 is matched by `code` above
+        if isinstance(exc, (gexc.ServerError, gexc.TooManyRequests)):
+            return True
+    except ImportError:
+        pass
+    return False
+
+
+class _JobState:
+    """Per-job counters guarded by the queue's condition variable."""
+
+    def __init__(self):
+        self.pending = 0
+        self.uploads = 0
+        self.bytes = 0
+        self.retries = 0
+        self.superseded = 0
+        self.failed = []
+        self.upload_seconds = 0.0
+
+    def as_stats(self):
+        return {
+            "uploads": self.uploads,
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "superseded": self.superseded,
+            "failed": len(self.failed),
+            "failed_paths": list(self.failed),
+            "pending": self.pending,
+            "upload_seconds": round(self.upload_seconds, 2),
+        }
+
+
+class UploadQueue:
+    """Bounded queue drained by a fixed pool of upload workers."""
+
+    def __init__(self, workers=UPLOAD_WORKERS, maxsize=UPLOAD_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._latest = {}
+        # path -> [lock, coalesced uploads of the path not finished yet]
+        self._path_locks = {}
+        self._seq = 0
+        self._threads = []
+        for i in range(max(1, workers)):
+            t = threading.Thread(target=self._worker, name=f"gcs-upload-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, data, gcs_path, content_type="application/octet-stream", gzip=False, job=None, coalesce=True):
+        """Enqueue an upload. Blocks only when the queue is full (backpressure)."""
+        future = Future()
+        with self._cond:
+            self._jobs.setdefault(job, _JobState()).pending += 1
+            seq = None
+            if coalesce:
+                self._seq += 1
+                seq = self._seq
+                self._latest[gcs_path] = seq
+                self._path_locks.setdefault(gcs_path, [threading.Lock(), 0])[1] += 1
+        self._queue.put((data, gcs_path, content_type, gzip, job, future, seq))
+        return future
+
+    def flush(self, job=None, timeout=None):
+        """Wait until every upload for `job` has finished; return its stats."""
+        start = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            state = self._jobs.setdefault(job, _JobState())
+            while state.pending > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            stats = state.as_stats()
+            stats["flush_wait_seconds"] = round(time.perf_counter() - start, 2)
+            if state.pending == 0:
+                self._jobs.pop(job, None)
+        return stats
+
+    def stats(self, job=None):
+        """`job`'s upload stats so far, without waiting or releasing its state."""
+        with self._cond:
+            state = self._jobs.get(job)
+            return (state or _JobState()).as_stats()
+
+    def pending(self, job=None):
+        """Number of `job`'s uploads not finished yet (non-blocking)."""
+        with self._cond:
+            state = self._jobs.get(job)
+            return state.pending if state else 0
+
+    def _worker(self):
+        while True:
+            task = self._queue.get()
+            seq = task[-1]
+            if seq is None:
+                self._run(task)
+            else:
+                with self._cond:
+                    path_lock = self._path_locks[task[1]]
+                with path_lock[0]:
+                    self._run(task)
+                with self._cond:
+                    path_lock[1] -= 1
+                    if path_lock[1] == 0:
+                        del self._path_locks[task[1]]
+            self._queue.task_done()
+
+    def _run(self, task):
+        data, gcs_path, content_type, gzip, job, future, seq = task
+        if seq is not None:
+            with self._cond:
+                latest = self._latest.get(gcs_path)
+                superseded = latest is not None and latest > seq
+                if superseded:
+                    state = self._jobs.setdefault(job, _JobState())
+                    state.pending -= 1
+                    state.superseded += 1
+                    self._cond.notify_all()
+            if superseded:
+                future.set_result(public_url(gcs_path))
+                return
+
+        started = time.perf_counter()
+        attempt = 0
+        error = None
+        while True:
+            attempt += 1
+            try:
+                url = upload_bytes_to_gcs(data, gcs_path, content_type=content_type, gzip=gzip)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                if attempt >= UPLOAD_MAX_ATTEMPTS or not _is_transient(e):
+                    break
+                delay = UPLOAD_BACKOFF_SECONDS * (2 ** (attempt - 1))
+                time.sleep(delay + random.uniform(0, delay / 2))
+        elapsed = time.perf_counter() - started
+
+        with self._cond:
+            state = self._jobs.setdefault(job, _JobState())
+            state.pending -= 1
+            state.upload_seconds += elapsed
+            state.retries += attempt - 1
+            if error is None:
+                state.uploads += 1
+                state.bytes += len(data)
+            else:
+                state.failed.append(gcs_path)
+            if seq is not None and self._latest.get(gcs_path) == seq:
+                self._latest.pop(gcs_path, None)
+            self._cond.notify_all()
+
+        if error is None:
+            future.set_result(url)
+        else:
+            print(f"❌ [GCS] Upload failed after {attempt} attempt(s): {gcs_path}: {error}")
+            future.set_exception(error)
+
+
+_upload_queue = None
+_upload_queue_lock = threading.Lock()
+
+
+def get_upload_queue():
+    global _upload_queue
+    if _upload_queue is None:
+        with _upload_queue_lock:
+            if _upload_queue is None:
+                _upload_queue = UploadQueue()
+    return _upload_queue
+
+
+def enqueue_upload(data, gcs_path, content_type="application/octet-stream", gzip=False, job=None, coalesce=True):
+    """Upload in the background; returns the object's public URL immediately."""
+    get_upload_queue().submit(data, gcs_path, content_type=content_type, gzip=gzip, job=job, coalesce=coalesce)
+    return public_url(gcs_path)
+
+
+def enqueue_json(obj, gcs_path, gzip=False, job=None, coalesce=True):
+    """Serialise compactly and upload in the background; returns the public URL."""
+    data = dumps_compact(obj)
+    save_debug_copy(os.path.basename(gcs_path), data)
+    return enqueue_upload(
+        data,
+        gcs_path,
+        content_type="application/json; charset=utf-8",
+        gzip=gzip,
+        job=job,
+        coalesce=coalesce,
+    )
+
+
+def pending_uploads(job=None):
+    return get_upload_queue().pending(job)
+
+
+def upload_stats(job=None):
+    return get_upload_queue().stats(job)
+
+
+def flush_uploads(job=None, timeout=None):
+    """Per-job barrier: block until all of the job's uploads are done."""
+    return get_upload_queue().flush(job, timeout=timeout)